@@ -0,0 +1,93 @@
+"""Compare the OpenAI curation request across image payload modes.
+
+Offline (default): builds the ``url``, ``inline`` and ``contact_sheet`` payloads for the
+local test images and prints build time, inline bytes and estimated input tokens.
+
+Live (``--live``, needs OPENAI_API_KEY): fetches the sighting images below, sends the real
+curation request in every mode and prints latency, billed input tokens and how well each
+mode's selection agrees with the ``url`` mode (Jaccard similarity).
+
+Usage:
+    cd curator && .venv/bin/python benchmarks/image_payload.py [--live] [runs]
+"""
+
+import asyncio
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import get_args
+
+import cv2
+from dotenv import load_dotenv
+from openai import OpenAI
+
+from curator.image_fetch import fetch_images
+from curator.image_payload import ImagePayload, build_image_inputs
+from curator.images import _SELECTION_FORMAT, _curation_message, _parse_selection
+
+_IMAGES = Path(__file__).parent.parent / "tests" / "images"
+_LIVE_URLS = [
+    "https://storage.googleapis.com/birds_of_vinca/images/25008423-63a1-4850-be20-97af3aa5c5c5.jpg",
+    "https://storage.googleapis.com/birds_of_vinca/images/902227fa-1440-4fc7-b44a-96c4dfb74a31.jpg",
+    "https://storage.googleapis.com/birds_of_vinca/images/a5ddeec0-54b9-41ae-8f5e-96011529f900.jpg",
+    "https://storage.googleapis.com/birds_of_vinca/images/0f4fdc0a-157a-4d27-b1e8-821645c50671.jpg",
+    "https://storage.googleapis.com/birds_of_vinca/images/c99da8d8-9471-40cd-9b6c-9ff3ac92020b.jpg",
+]
+
+
+def offline() -> None:
+    paths = sorted(_IMAGES.glob("*.jpg"))
+    urls = [f"https://example.com/{p.name}" for p in paths]
+    images = [cv2.imread(str(p)) for p in paths]
+
+    print(f"{len(images)} images from {_IMAGES}")
+    print(f"{'mode':<14} {'build ms':>9} {'inline KB':>10} {'est. tokens':>12}")
+    for payload in get_args(ImagePayload):
+        start = time.perf_counter()
+        inputs = build_image_inputs(urls, list(images), payload)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{payload:<14} {elapsed * 1000:>9.1f} {inputs.payload_bytes / 1024:>10.0f} "
+            f"{inputs.estimated_tokens:>12}"
+        )
+
+
+def live(runs: int) -> None:
+    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    images, report = asyncio.run(fetch_images(_LIVE_URLS))
+    print(report)
+
+    selections: dict[str, set[str]] = {}
+    print(f"{'mode':<14} {'median s':>9} {'input tokens':>13} {'kept':>5} {'agreement':>10}")
+    for payload in get_args(ImagePayload):
+        latencies, tokens = [], []
+        kept: set[str] = set()
+        for _ in range(runs):
+            message = _curation_message(_LIVE_URLS, images, payload)
+            start = time.perf_counter()
+            response = client.responses.create(
+                model="gpt-5", input=[message], text={"format": _SELECTION_FORMAT}
+            )
+            latencies.append(time.perf_counter() - start)
+            tokens.append(response.usage.input_tokens if response.usage else 0)
+            kept = set(_parse_selection(response.output_text, _LIVE_URLS))
+        selections[payload] = kept
+
+        baseline = selections["url"]
+        union = baseline | kept
+        agreement = len(baseline & kept) / len(union) if union else 1.0
+        print(
+            f"{payload:<14} {statistics.median(latencies):>9.2f} "
+            f"{statistics.median(tokens):>13.0f} {len(kept):>5} {agreement:>10.2f}"
+        )
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    args = [a for a in sys.argv[1:] if a != "--live"]
+    if "--live" in sys.argv[1:]:
+        live(int(args[0]) if args else 3)
+    else:
+        offline()
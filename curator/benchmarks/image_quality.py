@@ -0,0 +1,41 @@
+"""Score a folder of sighting images with the local quality stage.
+
+Prints each image's blur, exposure and foreground scores with the verdict, and how long
+scoring the batch took, to help tune ``QualityThresholds`` against real sightings.
+
+Usage:
+    cd curator && .venv/bin/python benchmarks/image_quality.py [folder]
+"""
+
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+from curator.image_quality import score_images
+
+
+def main(folder: Path) -> None:
+    paths = sorted(p for p in folder.iterdir() if p.suffix.lower() in {".jpg", ".jpeg", ".png"})
+    images = [cv2.imread(str(p)) for p in paths]
+    loaded = [(p, image) for p, image in zip(paths, images) if image is not None]
+
+    start = time.perf_counter()
+    scores = score_images([image for _, image in loaded])
+    elapsed = time.perf_counter() - start
+
+    print(f"{'image':<32} {'sharp':>7} {'bright':>6} {'clip':>5} {'fg':>5} {'subject':>8}  verdict")
+    for (path, _), score in zip(loaded, scores):
+        fg = f"{score.foreground_fraction:.2f}" if score.foreground_fraction is not None else "-"
+        subject = f"{score.subject_sharpness:.2f}" if score.subject_sharpness is not None else "-"
+        print(
+            f"{path.name:<32} {score.sharpness:>7.2f} {score.brightness:>6.0f} "
+            f"{score.clipped_fraction:>5.2f} {fg:>5} {subject:>8}  {score.verdict} ({score.reason})"
+        )
+    print(f"scored {len(loaded)} images in {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    default = Path(__file__).parent.parent / "tests" / "images"
+    main(Path(sys.argv[1]) if len(sys.argv) > 1 else default)
@@ -0,0 +1,88 @@
+"""Compare the motion detection strategies on the same clips.
+
+Prints each strategy's detection time and segments, and how far its segments are from
+the ``full`` ones. Without paths, two synthetic clips from ``video_engines.py`` are used:
+the usual 20 seconds, and a mostly quiet minute with the same two visits. Then the motion
+profile cache: the first and a repeated ``cached_motion_profile``, and segments recomputed
+from the profile for a range of thresholds.
+
+Usage:
+    cd curator && .venv/bin/python benchmarks/motion_detection.py [video.mp4 ...]
+"""
+
+import os
+import sys
+import tempfile
+import time
+from typing import get_args
+
+from video_engines import synthetic_clip
+
+from curator.motion import (
+    MERGE_GAP_SECONDS,
+    MIN_MOTION_AREA,
+    MotionDetection,
+    detect_motion_segments,
+    segments_from_profile,
+)
+from curator.motion_cache import cached_motion_profile
+
+
+def main(source: str) -> None:
+    print(os.path.basename(source))
+    results = {}
+    for detection in get_args(MotionDetection):
+        start = time.perf_counter()
+        segments, _fps = detect_motion_segments(source, detection)
+        elapsed = time.perf_counter() - start
+        results[detection] = segments
+        rounded = [(round(s, 2), round(e, 2)) for s, e in segments]
+        print(f"  {detection:<7} {elapsed:>6.2f}s  {rounded}")
+
+    full = results.pop("full")
+    for detection, segments in results.items():
+        if len(segments) != len(full):
+            print(f"  {detection}: segment count differs, {len(segments)} vs {len(full)}")
+            continue
+        deviation = max(
+            (max(abs(a - c), abs(b - d)) for (a, b), (c, d) in zip(segments, full)),
+            default=0.0,
+        )
+        print(f"  {detection}: max boundary deviation from full {deviation:.3f}s")
+
+
+def profile_cache(source: str) -> None:
+    start = time.perf_counter()
+    profile = cached_motion_profile(source)
+    detect = time.perf_counter() - start
+    start = time.perf_counter()
+    cached_motion_profile(source)
+    hit = time.perf_counter() - start
+
+    thresholds = [
+        (MIN_MOTION_AREA * area, MERGE_GAP_SECONDS * gap)
+        for area in (0.5, 1.0, 2.0)
+        for gap in (0.5, 1.0, 2.0)
+    ]
+    start = time.perf_counter()
+    for min_area, merge_gap in thresholds:
+        segments_from_profile(profile, min_area, merge_gap)
+    recompute = (time.perf_counter() - start) / len(thresholds)
+    print(
+        f"  profile cache: detect {detect:.2f}s, cached {hit * 1000:.1f}ms, "
+        f"segments for other thresholds {recompute * 1000:.2f}ms "
+        f"({len(profile.times)} frames analysed)"
+    )
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = sys.argv[1:]
+        if not sources:
+            for seconds in (20, 60):
+                sources.append(os.path.join(tmp, f"synthetic_{seconds}s.mp4"))
+                synthetic_clip(sources[-1], seconds=seconds)
+        os.environ["MOTION_CACHE_DIR"] = os.path.join(tmp, "motion-cache")
+        for source in sources:
+            main(source)
+            profile_cache(source)
@@ -0,0 +1,132 @@
+"""Deterministic synthetic feeder clips with known motion, for the video benchmarks.
+
+A static feeder scene with sensor noise, one or more bright "birds" moving through it
+during each visit, and optionally a slow lighting flicker. Frames are piped straight into
+ffmpeg and encoded as H.264 with a keyframe every two seconds and a silent audio track,
+like the camera uploads. The same scenario always renders the same clip.
+"""
+
+import math
+import subprocess
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from curator.video_ffmpeg import ffmpeg_exe
+
+Segment = tuple[float, float]
+_NOISE_FRAMES = 8
+
+
+@dataclass(frozen=True)
+class Scenario:
+    name: str
+    width: int
+    height: int
+    seconds: float
+    # ground truth: when something moves in front of the feeder
+    visits: tuple[Segment, ...]
+    birds: int = 1
+    # relative amplitude of the brightness swing, e.g. 0.05 for +-5%
+    flicker: float = 0.0
+    fps: int = 30
+    seed: int = 0
+
+    @property
+    def frames(self) -> int:
+        return int(self.seconds * self.fps)
+
+
+SCENARIOS = (
+    Scenario("480p-10s", 640, 480, 10, ((2, 5),)),
+    Scenario("720p-20s", 1280, 720, 20, ((4, 9), (13, 16))),
+    Scenario("720p-20s-flicker", 1280, 720, 20, ((4, 9), (13, 16)), flicker=0.05),
+    Scenario("1080p-60s-2birds", 1920, 1080, 60, ((10, 20), (40, 45)), birds=2),
+)
+
+
+def render(scenario: Scenario, path: str) -> None:
+    """Write ``scenario`` to ``path`` as an mp4."""
+    width, height = scenario.width, scenario.height
+    rng = np.random.default_rng(scenario.seed)
+    feeder = np.full((height, width, 3), 90, np.uint8)
+    perch = height * 5 // 7
+    cv2.rectangle(
+        feeder, (width // 13, perch), (width * 12 // 13, perch + height // 18), (40, 120, 40), -1
+    )
+    # a few noisy versions of the scene, cycled, are much cheaper than fresh noise per frame
+    backgrounds = [
+        np.clip(feeder + rng.integers(-3, 4, feeder.shape), 0, 255).astype(np.uint8)
+        for _ in range(_NOISE_FRAMES)
+    ]
+    # each bird's flight: starting height and speed across the frame
+    flights = [
+        (rng.uniform(0.15, 0.45) * height, rng.uniform(0.6, 1.2) * width / 5)
+        for _ in range(scenario.birds)
+    ]
+
+    encoder = subprocess.Popen(
+        [
+            ffmpeg_exe(),
+            "-y",
+            "-loglevel",
+            "error",
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "bgr24",
+            "-s",
+            f"{width}x{height}",
+            "-r",
+            str(scenario.fps),
+            "-i",
+            "pipe:0",
+            "-f",
+            "lavfi",
+            "-i",
+            "anullsrc=r=44100:cl=mono",
+            "-shortest",
+            "-c:v",
+            "libx264",
+            "-preset",
+            "veryfast",
+            "-pix_fmt",
+            "yuv420p",
+            "-g",
+            str(2 * scenario.fps),
+            "-c:a",
+            "aac",
+            path,
+        ],
+        stdin=subprocess.PIPE,
+    )
+    assert encoder.stdin is not None
+    # birds on a feeder camera are close, a good part of the frame
+    size = height // 3
+    for i in range(scenario.frames):
+        t = i / scenario.fps
+        frame = backgrounds[i % _NOISE_FRAMES].copy()
+        for start, end in scenario.visits:
+            if not start <= t < end:
+                continue
+            for n, (top, speed) in enumerate(flights):
+                x = int((t - start) * speed + n * size * 1.5) % (width - size)
+                y = int(top + math.sin(t * 3 + n) * size / 4)
+                cv2.ellipse(
+                    frame,
+                    (x + size // 2, y + size // 2),
+                    (size // 2, size // 3),
+                    0,
+                    0,
+                    360,
+                    (220, 220, 230),
+                    -1,
+                )
+        if scenario.flicker:
+            gain = 1 + scenario.flicker * math.sin(2 * math.pi * t / 3)
+            frame = cv2.convertScaleAbs(frame, alpha=gain)
+        encoder.stdin.write(frame.tobytes())
+    encoder.stdin.close()
+    if encoder.wait():
+        raise RuntimeError(f"rendering {scenario.name} failed")
@@ -0,0 +1,136 @@
+"""Time each phase of ``_curate_video`` on synthetic feeder clips with known motion.
+
+For every scenario in ``synthetic_clips.py`` (or the ones named on the command line) the
+clip is rendered, then each phase runs in a fresh worker process so its peak RSS can be
+read: CFR normalization (moviepy engine only), motion detection with each strategy, and
+the cut/encode of the detected segments. Prints wall time, frames per second, peak RSS
+of the worker and of its ffmpeg children, and how well the detected segments match the
+ground truth.
+
+Usage:
+    cd curator && .venv/bin/python benchmarks/video_curation.py [scenario ...]
+"""
+
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, get_args
+
+from synthetic_clips import SCENARIOS, Scenario, Segment, render
+
+from curator.motion import MotionDetection, detect_motion_segments
+from curator.video_ffmpeg import cut_segments, plan_cut, probe
+from curator.videos import _normalize_to_constant_frame_rate
+
+_context = multiprocessing.get_context("forkserver")
+
+
+def _measured(fn: Callable[..., Any], *args: Any) -> tuple[Any, float, float, float]:
+    """``fn(*args)``, its wall time, and peak RSS in MB of this process and its children."""
+    start = time.perf_counter()
+    result = fn(*args)
+    elapsed = time.perf_counter() - start
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return result, elapsed, own, children
+
+
+def measure(fn: Callable[..., Any], *args: Any) -> tuple[Any, float, float, float]:
+    with ProcessPoolExecutor(max_workers=1, mp_context=_context) as executor:
+        return executor.submit(_measured, fn, *args).result()
+
+
+def _normalize_copy(path: str) -> None:
+    copy = path + ".cfr.mp4"
+    shutil.copy(path, copy)
+    _normalize_to_constant_frame_rate(copy)
+    os.unlink(copy)
+
+
+def _cut(path: str, segments: list[Segment], fps: float) -> tuple[str, bool]:
+    video_probe = probe(path)
+    return (
+        cut_segments(path, segments, video_probe, fps),
+        plan_cut(segments, video_probe.keyframes)[1],
+    )
+
+
+def accuracy(detected: list[Segment], truth: tuple[Segment, ...]) -> str:
+    """Overlap with the ground truth as intersection over union, and the worst boundary
+    error when the segment counts agree."""
+    overlap = sum(
+        max(0.0, min(end, true_end) - max(start, true_start))
+        for start, end in detected
+        for true_start, true_end in truth
+    )
+    union = sum(end - start for start, end in detected) + sum(e - s for s, e in truth) - overlap
+    iou = overlap / union if union else 1.0
+    if len(detected) != len(truth):
+        return f"IoU {iou:.2f}, {len(detected)} segments for {len(truth)} visits"
+    error = max(
+        max(abs(start - true_start), abs(end - true_end))
+        for (start, end), (true_start, true_end) in zip(detected, truth)
+    )
+    return f"IoU {iou:.2f}, max boundary error {error:.2f}s"
+
+
+def row(phase: str, elapsed: float, frames: int, own: float, children: float, note: str) -> None:
+    print(
+        f"  {phase:<18} {elapsed:>7.2f}s {frames / elapsed:>8.0f} fps "
+        f"{own:>7.0f} MB {children:>7.0f} MB  {note}"
+    )
+
+
+def run(scenario: Scenario, directory: str) -> None:
+    path = os.path.join(directory, f"{scenario.name}.mp4")
+    start = time.perf_counter()
+    render(scenario, path)
+    print(
+        f"{scenario.name}: {scenario.width}x{scenario.height}, {scenario.seconds:g}s, "
+        f"visits {list(scenario.visits)} (rendered in {time.perf_counter() - start:.1f}s)"
+    )
+    print(f"  {'phase':<18} {'wall':>8} {'speed':>12} {'worker RSS':>10} {'ffmpeg RSS':>10}")
+
+    _, elapsed, own, children = measure(_normalize_copy, path)
+    row("cfr normalize", elapsed, scenario.frames, own, children, "moviepy engine only")
+
+    segments: list[Segment] = []
+    fps = float(scenario.fps)
+    for detection in get_args(MotionDetection):
+        (found, fps), elapsed, own, children = measure(detect_motion_segments, path, detection)
+        row(
+            f"detect {detection}",
+            elapsed,
+            scenario.frames,
+            own,
+            children,
+            accuracy(found, scenario.visits),
+        )
+        if detection == "fast":
+            segments = found
+
+    if not segments:
+        print("  no motion found, nothing to cut")
+        return
+    (output, stream_copy), elapsed, own, children = measure(_cut, path, segments, fps)
+    kept = int(sum(end - start for start, end in segments) * fps)
+    how = "stream copy" if stream_copy else "re-encode"
+    row("cut/encode", elapsed, kept, own, children, f"{kept} frames kept, {how}")
+    os.unlink(output)
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:]
+    unknown = set(names) - {scenario.name for scenario in SCENARIOS}
+    if unknown:
+        sys.exit(f"unknown scenarios {sorted(unknown)}; pick from {[s.name for s in SCENARIOS]}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for scenario in SCENARIOS:
+            if not names or scenario.name in names:
+                run(scenario, tmp)
@@ -0,0 +1,61 @@
+"""Encode throughput of the curated output against the number of parallel encode workers.
+
+Re-encodes one long segment of a clip (starting off a keyframe, so it can't be
+stream-copied) with 1, 2, 4, ... workers up to the core count, and prints wall time and
+seconds of video encoded per wall second. Without a path a one-minute synthetic clip from
+``video_engines.py`` is used.
+
+Usage:
+    cd curator && .venv/bin/python benchmarks/video_encoding.py [video.mp4] [preset] [crf]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+from video_engines import synthetic_clip
+
+from curator.video_ffmpeg import EncoderSettings, cut_segments, probe
+
+
+def worker_counts() -> list[int]:
+    cores = os.cpu_count() or 1
+    counts = [1]
+    while counts[-1] * 2 <= cores:
+        counts.append(counts[-1] * 2)
+    if counts[-1] != cores:
+        counts.append(cores)
+    return counts
+
+
+def run(source: str, preset: str, crf: int) -> None:
+    capture = cv2.VideoCapture(source)
+    fps = capture.get(cv2.CAP_PROP_FPS)
+    duration = capture.get(cv2.CAP_PROP_FRAME_COUNT) / fps
+    capture.release()
+    video_probe = probe(source)
+    segment = (0.7, duration - 0.5)
+    seconds = segment[1] - segment[0]
+
+    print(f"{os.cpu_count()} cores, {seconds:.1f}s of video, preset {preset}, crf {crf}")
+    print(f"{'workers':>7} {'wall s':>8} {'video s / wall s':>17}")
+    for workers in worker_counts():
+        encoder = EncoderSettings(preset=preset, crf=crf, workers=workers)
+        start = time.perf_counter()
+        output = cut_segments(source, [segment], video_probe, fps, encoder)
+        wall = time.perf_counter() - start
+        os.unlink(output)
+        print(f"{workers:>7} {wall:>8.2f} {seconds / wall:>17.2f}")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    preset = args[1] if len(args) > 1 else EncoderSettings.preset
+    crf = int(args[2]) if len(args) > 2 else EncoderSettings.crf
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args[0] if args else os.path.join(tmp, "synthetic.mp4")
+        if not args:
+            synthetic_clip(source, seconds=60)
+        run(source, preset, crf)
@@ -0,0 +1,66 @@
+"""Compare the single-pass ffmpeg video curation engine with the original moviepy one.
+
+Each engine curates a fresh copy of the same clip in a worker process, so the reported
+CPU time includes ffmpeg subprocesses. Without a path, a synthetic clip is generated: a
+static feeder with a "bird" moving through it twice (see ``synthetic_clips.py``).
+
+Usage:
+    cd curator && .venv/bin/python benchmarks/video_engines.py [video.mp4] [runs]
+"""
+
+import asyncio
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from typing import get_args
+
+import cv2
+from synthetic_clips import Scenario, render
+
+from curator.video_pool import VideoPool
+from curator.videos import VideoEngine, _curate_video
+
+
+def synthetic_clip(path: str, seconds: float = 20.0, fps: int = 30) -> None:
+    """The 720p scenario from ``synthetic_clips.py``, at any length."""
+    render(Scenario("synthetic", 1280, 720, seconds, ((4, 9), (13, 16)), fps=fps), path)
+
+
+async def run(source: str, runs: int) -> None:
+    pool = VideoPool(workers=1)
+    print(f"{'engine':<8} {'median wall s':>14} {'median CPU s':>13} {'output s':>9}")
+    for engine in get_args(VideoEngine):
+        walls, cpus = [], []
+        duration = 0.0
+        for _ in range(runs):
+            fd, copy = tempfile.mkstemp(suffix=".mp4")
+            os.close(fd)
+            shutil.copy(source, copy)
+            start = time.perf_counter()
+            output = await pool.run(_curate_video, copy, engine)
+            walls.append(time.perf_counter() - start)
+            cpus.append(pool.stats.last_cpu_seconds)
+            if output:
+                capture = cv2.VideoCapture(output)
+                duration = capture.get(cv2.CAP_PROP_FRAME_COUNT) / capture.get(cv2.CAP_PROP_FPS)
+                capture.release()
+                os.unlink(output)
+            os.unlink(copy)
+        print(
+            f"{engine:<8} {statistics.median(walls):>14.2f} {statistics.median(cpus):>13.2f} "
+            f"{duration:>9.2f}"
+        )
+
+
+if __name__ == "__main__":
+    os.environ.setdefault("APP_ENV", "prod")  # silence moviepy's progress bars
+    args = sys.argv[1:]
+    runs = int(args[1]) if len(args) > 1 else 3
+    with tempfile.TemporaryDirectory() as tmp:
+        source = args[0] if args else os.path.join(tmp, "synthetic.mp4")
+        if not args:
+            synthetic_clip(source)
+        asyncio.run(run(source, runs))
@@ -0,0 +1,109 @@
+"""Time to motion segments: download-then-detect vs detecting while the video streams in.
+
+The clip is served from a local HTTP server throttled to ``rate`` KB/s so the transfer
+takes a realistic share of the time. Both flows use fast motion detection. Without a path
+the synthetic clip from ``video_engines.py`` is used, remuxed with ``+faststart`` as
+streaming requires.
+
+Usage:
+    cd curator && .venv/bin/python benchmarks/video_streaming.py [video.mp4] [rate] [runs]
+"""
+
+import asyncio
+import functools
+import http.server
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from video_engines import synthetic_clip
+
+from curator.motion import detect_motion_segments
+from curator.video_ffmpeg import ffmpeg_exe
+from curator.video_stream import stream_motion_segments
+from curator.videos import download_video_to_tempdir
+
+
+class ThrottledHandler(http.server.SimpleHTTPRequestHandler):
+    rate = 256 * 1024  # bytes per second
+
+    def copyfile(self, source, outputfile):
+        chunk = self.rate // 20
+        while data := source.read(chunk):
+            outputfile.write(data)
+            time.sleep(0.05)
+
+    def log_message(self, *args):
+        pass
+
+
+def download_then_detect(url: str, path: str) -> int:
+    asyncio.run(download_video_to_tempdir(url))
+    segments, _ = detect_motion_segments(path, "fast")
+    return len(segments)
+
+
+def streamed(url: str, path: str) -> int:
+    segments, _ = stream_motion_segments(url, path)
+    return len(segments)
+
+
+def run(source: str, rate_kb: int, runs: int) -> None:
+    ThrottledHandler.rate = rate_kb * 1024
+    directory = os.path.dirname(os.path.abspath(source))
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(ThrottledHandler, directory=directory)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    name = os.path.basename(source)
+    url = f"http://127.0.0.1:{server.server_port}/{name}"
+    # where download_video_to_tempdir puts it
+    path = os.path.join(tempfile.gettempdir(), name)
+
+    size_kb = os.path.getsize(source) / 1024
+    print(f"{size_kb:.0f} KB at {rate_kb} KB/s, transfer alone ~{size_kb / rate_kb:.1f}s")
+    print(f"{'flow':<22} {'median time-to-segments s':>26} {'segments':>9}")
+    for label, flow in [("download then detect", download_then_detect), ("streamed", streamed)]:
+        times = []
+        count = 0
+        for _ in range(runs):
+            start = time.perf_counter()
+            count = flow(url, path)
+            times.append(time.perf_counter() - start)
+            os.unlink(path)
+        print(f"{label:<22} {statistics.median(times):>26.2f} {count:>9}")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    rate = int(args[1]) if len(args) > 1 else 256
+    runs = int(args[2]) if len(args) > 2 else 3
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, "served.mp4")
+        if args:
+            shutil.copy(args[0], source)
+        else:
+            synthetic_clip(os.path.join(tmp, "synthetic.mp4"))
+            subprocess.run(
+                [
+                    ffmpeg_exe(),
+                    "-y",
+                    "-loglevel",
+                    "error",
+                    "-i",
+                    os.path.join(tmp, "synthetic.mp4"),
+                    "-c",
+                    "copy",
+                    "-movflags",
+                    "+faststart",
+                    source,
+                ],
+                check=True,
+            )
+        run(source, rate, runs)
@@ -0,0 +1,74 @@
+"""Compare warm-request latency with and without the shared process runtime.
+
+"before" mimics the old request path: a fresh ``asyncio.run`` loop and a new
+``httpx.AsyncClient`` per request. "after" runs every request on the shared
+``bov_data.Runtime`` loop with one pooled client.
+
+Usage:
+    cd curator && .venv/bin/python benchmarks/warm_requests.py [url] [requests]
+"""
+
+import asyncio
+import statistics
+import sys
+import time
+
+import httpx
+from bov_data import Runtime
+
+_DEFAULT_URL = "https://geocoding-api.open-meteo.com/v1/search?name=80027&count=1"
+
+
+async def _request(client: httpx.AsyncClient, url: str) -> None:
+    response = await client.get(url)
+    response.raise_for_status()
+
+
+async def _cold_request(url: str) -> None:
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        await _request(client, url)
+
+
+def _before(url: str, n: int) -> list[float]:
+    timings = []
+    for _ in range(n):
+        start = time.perf_counter()
+        asyncio.run(_cold_request(url))
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _after(url: str, n: int) -> list[float]:
+    runtime = Runtime()
+    client = runtime.client("http", lambda: httpx.AsyncClient(timeout=30.0))
+    timings = []
+    try:
+        for _ in range(n):
+            start = time.perf_counter()
+            runtime.run(_request(client, url))
+            timings.append(time.perf_counter() - start)
+    finally:
+        runtime.close()
+    return timings
+
+
+def _report(label: str, timings: list[float]) -> None:
+    # the first request pays connection setup either way; warm latency is the rest
+    warm = sorted(timings[1:] or timings)
+    p90 = warm[int(0.9 * (len(warm) - 1))]
+    print(
+        f"{label:>6}: first {timings[0] * 1000:7.1f} ms  "
+        f"warm median {statistics.median(warm) * 1000:7.1f} ms  "
+        f"warm p90 {p90 * 1000:7.1f} ms"
+    )
+
+
+def main() -> None:
+    url = sys.argv[1] if len(sys.argv) > 1 else _DEFAULT_URL
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    _report("before", _before(url, n))
+    _report("after", _after(url, n))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,37 @@
+"""Backfill weather on existing sightings.
+
+Fetches sightings that have no weather yet (or every sighting with --recompute),
+looks their weather up in bulk, and writes the results back in one bulk update.
+
+Usage:
+    cd curator && .venv/bin/python src/curator/backfill_weather.py [--recompute]
+"""
+
+import asyncio
+import os
+import sys
+
+from bov_data import DB, MongoClient
+from dotenv import load_dotenv
+
+from curator.weather import backfill_weather
+
+
+async def main(recompute: bool = False) -> None:
+    db: DB = MongoClient(os.environ["MONGODB_URI"])
+    sightings = await db.fetch_sightings(without_weather=not recompute)
+    print(f"Found {len(sightings)} sightings to backfill")
+
+    updated = await backfill_weather(sightings, db=db)
+    print(f"Looked up weather for {len(updated)} sightings")
+
+    weather_by_id = {s._id: s.weather for s in updated if s._id and s.weather}
+    modified = await db.update_sightings_weather(weather_by_id)
+    print(f"Updated {modified} documents")
+
+    await db.close()
+
+
+if __name__ == "__main__":
+    load_dotenv()
+    asyncio.run(main(recompute="--recompute" in sys.argv[1:]))
@@ -1,16 +1,21 @@
 """Backpost existing sightings to Instagram.
 
 Fetches sightings that have GCS media (images or videos) but no Instagram post
-URLs yet, posts them to Instagram, and updates the MongoDB documents.
+URLs yet, posts them to Instagram, and updates the MongoDB documents. Several sightings
+are posted at once; the Graph API scheduler holds calls back to what the account's rate
+limits allow, so a long backfill runs as fast as it may without failing on them. Unless
+INSTAGRAM_CALLS_PER_HOUR and INSTAGRAM_PUBLISHES_PER_DAY say otherwise, the backfill also
+keeps to a budget of its own, leaving room for the sightings imported meanwhile.
 
 Usage:
-    cd curator && .venv/bin/python backpost_instagram.py
+    cd curator && .venv/bin/python backpost_instagram.py [count]
 """
 
 import asyncio
 import os
-import tempfile
+import sys
 
+import httpx
 import pymongo
 import requests
 from bov_data import Sighting
@@ -18,8 +23,15 @@ from bson.objectid import ObjectId
 from dotenv import load_dotenv
 
 from curator.instagram import post_sighting
+from curator.rate_limits import graph_api_scheduler
+from curator.workspace import WorkspaceManager
 
 _GCS_BASE = "https://storage.googleapis.com/birds_of_vinca"
+# sightings posted at the same time; the scheduler decides how fast their calls go out
+_BACKPOST_CONCURRENCY = 4
+# the backfill's own budget per account, when the environment doesn't set one
+_BACKPOST_CALLS_PER_HOUR = 200
+_BACKPOST_PUBLISHES_PER_DAY = 25
 
 
 def _to_https_url(path: str) -> str:
@@ -31,7 +43,7 @@ def _to_https_url(path: str) -> str:
     return f"{_GCS_BASE}/{path}"
 
 
-async def _load_sightings(mongo_client: pymongo.AsyncMongoClient) -> list[dict]:
+async def _load_sightings(mongo_client: pymongo.AsyncMongoClient, count: int) -> list[dict]:
     db = mongo_client.get_database()
 
     cursor = await db.sightings.aggregate(
@@ -42,7 +54,7 @@ async def _load_sightings(mongo_client: pymongo.AsyncMongoClient) -> list[dict]:
                     "media.instagram_video_post_url": {"$exists": False},
                 }
             },
-            {"$sample": {"size": 1}},
+            {"$sample": {"size": count}},
         ]
     )
     docs = await cursor.to_list()
@@ -56,35 +68,36 @@ def _doc_to_sighting(doc: dict) -> tuple[ObjectId, Sighting]:
     return (original_id, sighting)
 
 
-async def _post_sighting_to_instagram(sighting: Sighting) -> tuple[str | None, str | None]:
+async def _post_sighting_to_instagram(
+    sighting: Sighting, manager: WorkspaceManager, client: httpx.AsyncClient
+) -> tuple[str | None, str | None]:
     image_urls = [_to_https_url(p) for p in (sighting.media.images if sighting.media else [])]
 
-    tmp_path: str | None = None
-    video_path: str | None = None
-    try:
+    async with manager.workspace("backpost") as workspace:
+        video_path: str | None = None
         if sighting.media and sighting.media.videos:
             video_url = _to_https_url(sighting.media.videos[0])
             print(f"  Downloading video: {video_url}")
-            resp = requests.get(video_url, stream=True, timeout=60)
-            resp.raise_for_status()
-            with tempfile.NamedTemporaryFile(suffix=".mp4", delete=False) as tmp:
-                for chunk in resp.iter_content(chunk_size=65536):
-                    tmp.write(chunk)
-                tmp_path = tmp.name
-            video_path = tmp_path
+            video_path = workspace.file("video.mp4")
+            await asyncio.to_thread(_download, video_url, video_path)
 
         print("Posting to Instagram... ")
         try:
-            image_permalink, video_permalink = await post_sighting(sighting, image_urls, video_path)
+            image_permalink, video_permalink = await post_sighting(
+                sighting, image_urls, video_path, client=client
+            )
         except RuntimeError as e:
             print(e)
             raise
 
         return (image_permalink, video_permalink)
 
-    finally:
-        if tmp_path and os.path.exists(tmp_path):
-            os.unlink(tmp_path)
+
+def _download(url: str, file_path: str) -> None:
+    resp = requests.get(url, stream=True, timeout=60)
+    resp.raise_for_status()
+    with open(file_path, "wb") as tmp:
+        tmp.writelines(resp.iter_content(chunk_size=65536))
 
 
 async def _update_sighting_document(
@@ -106,25 +119,52 @@ async def _update_sighting_document(
     )
 
 
-async def main() -> None:
-    mongo_client: pymongo.AsyncMongoClient = pymongo.AsyncMongoClient(os.environ["MONGODB_URI"])
-    docs = await _load_sightings(mongo_client)
-    print(f"Found {len(docs)} sightings to backpost")
-
-    for doc in docs:
+async def _backpost(
+    mongo_client: pymongo.AsyncMongoClient,
+    doc: dict,
+    workspaces: WorkspaceManager,
+    client: httpx.AsyncClient,
+    slots: asyncio.Semaphore,
+) -> None:
+    async with slots:
         original_id, sighting = _doc_to_sighting(doc)
         print(f"\nSighting {sighting.bb_id} ({sighting.created_at})")
 
-        image_permalink, video_permalink = await _post_sighting_to_instagram(sighting)
+        image_permalink, video_permalink = await _post_sighting_to_instagram(
+            sighting, workspaces, client
+        )
         print(f"  image post: {image_permalink}")
         print(f"  video post: {video_permalink}")
 
         await _update_sighting_document(mongo_client, original_id, image_permalink, video_permalink)
         print(f"  Updated document {original_id}")
+        budget = graph_api_scheduler().utilisation(os.environ["INSTAGRAM_ACCOUNT_ID"])
+        print(f"  Rate limit budget: {budget}")
+
+
+async def main(count: int = 1) -> None:
+    mongo_client: pymongo.AsyncMongoClient = pymongo.AsyncMongoClient(os.environ["MONGODB_URI"])
+    docs = await _load_sightings(mongo_client, count)
+    print(f"Found {len(docs)} sightings to backpost")
+    workspaces = WorkspaceManager()
+    slots = asyncio.Semaphore(_BACKPOST_CONCURRENCY)
+    scheduler = graph_api_scheduler()
+    scheduler.calls_per_hour = scheduler.calls_per_hour or _BACKPOST_CALLS_PER_HOUR
+    scheduler.publishes_per_day = scheduler.publishes_per_day or _BACKPOST_PUBLISHES_PER_DAY
+
+    async with httpx.AsyncClient(timeout=30.0) as client:
+        results = await asyncio.gather(
+            *(_backpost(mongo_client, doc, workspaces, client, slots) for doc in docs),
+            return_exceptions=True,
+        )
+    failed = [result for result in results if isinstance(result, BaseException)]
+    for error in failed:
+        print(f"backpost failed: {error!r}")
+    print(f"Posted {len(docs) - len(failed)} of {len(docs)}; {scheduler.stats}")
 
     await mongo_client.close()
 
 
 if __name__ == "__main__":
     load_dotenv()
-    asyncio.run(main())
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 1))
@@ -0,0 +1,137 @@
+"""Local near-duplicate detection for sighting images.
+
+Bird Buddy bursts contain several almost identical frames. Hashing them locally and
+collapsing near-duplicates before the OpenAI call saves the tokens and latency the model
+would spend looking at the same picture twice.
+"""
+
+import math
+from dataclasses import dataclass, field
+from typing import Literal
+
+import cv2
+import numpy as np
+
+HashMethod = Literal["dhash", "phash"]
+
+# out of 64 bits; burst frames of a perched bird land well under this, new poses well over
+NEAR_DUPLICATE_MAX_DISTANCE = 10
+
+# OpenAI image input accounting: images are scaled to fit 2048x2048, then so the short
+# side is at most 768, and cost a base amount plus a fixed amount per 512px tile.
+_IMAGE_BASE_TOKENS = 70
+_IMAGE_TILE_TOKENS = 140
+
+
+@dataclass
+class DedupReport:
+    total: int
+    kept: int
+    clusters: list[list[int]] = field(default_factory=list)
+    tokens_saved: int = 0
+
+    @property
+    def images_saved(self) -> int:
+        return self.total - self.kept
+
+    def __str__(self) -> str:
+        return (
+            f"image dedup: kept {self.kept}/{self.total} images, "
+            f"saved {self.images_saved} images (~{self.tokens_saved} input tokens)"
+        )
+
+
+def perceptual_hash(image: np.ndarray, method: HashMethod = "dhash") -> int:
+    """64-bit perceptual hash of a BGR or grayscale image."""
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+
+    if method == "dhash":
+        # compare each pixel with its right neighbour on a 9x8 thumbnail
+        small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+        bits = small[:, 1:] > small[:, :-1]
+    else:
+        # compare low-frequency DCT coefficients against their median
+        small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+        low = cv2.dct(small)[:8, :8]
+        bits = low > np.median(low[1:, 1:])
+
+    return int.from_bytes(np.packbits(bits.flatten()).tobytes(), "big")
+
+
+def hamming_distances(hashes: list[int]) -> np.ndarray:
+    """Pairwise Hamming distance matrix for a list of 64-bit hashes."""
+    values = np.array(hashes, dtype=np.uint64)
+    xor = values[:, None] ^ values[None, :]
+    bits = np.unpackbits(xor.view(np.uint8), axis=-1)
+    distances: np.ndarray = bits.reshape(len(values), len(values), 64).sum(axis=-1)
+    return distances
+
+
+def cluster_near_duplicates(
+    hashes: list[int], max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE
+) -> list[list[int]]:
+    """Group indexes of near-duplicate hashes, preserving input order.
+
+    Each image joins the first cluster whose representative (its first member) is within
+    ``max_distance`` bits, otherwise it starts a new cluster.
+    """
+    if not hashes:
+        return []
+
+    distances = hamming_distances(hashes)
+    clusters: list[list[int]] = []
+    for i in range(len(hashes)):
+        for cluster in clusters:
+            if distances[cluster[0], i] <= max_distance:
+                cluster.append(i)
+                break
+        else:
+            clusters.append([i])
+    return clusters
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Approximate input tokens OpenAI bills for one image at ``detail: auto``/``high``."""
+    scale = min(1.0, 2048 / max(width, height))
+    scale *= min(1.0, 768 / (min(width, height) * scale))
+    tiles = math.ceil(width * scale / 512) * math.ceil(height * scale / 512)
+    return _IMAGE_BASE_TOKENS + _IMAGE_TILE_TOKENS * tiles
+
+
+def collapse_near_duplicates(
+    urls: list[str],
+    images: list[np.ndarray | None],
+    max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE,
+    method: HashMethod = "dhash",
+    prefer: list[float] | None = None,
+) -> tuple[list[str], DedupReport]:
+    """Keep one image per near-duplicate cluster.
+
+    ``images[i]`` is the decoded ``urls[i]``, or None if it couldn't be fetched. Images that
+    couldn't be fetched are always kept so the model still gets to judge them. By default
+    the first image of a cluster is kept; with ``prefer`` (one score per url), the
+    highest-scoring one is.
+    """
+    decoded = [(i, image) for i, image in enumerate(images) if image is not None]
+    hashes = [perceptual_hash(image, method) for _, image in decoded]
+    clusters = [
+        [decoded[j][0] for j in cluster]
+        for cluster in cluster_near_duplicates(hashes, max_distance)
+    ]
+
+    dropped: set[int] = set()
+    for cluster in clusters:
+        best = max(cluster, key=lambda i: prefer[i]) if prefer is not None else cluster[0]
+        dropped.update(i for i in cluster if i != best)
+    kept = [url for i, url in enumerate(urls) if i not in dropped]
+
+    tokens_saved = 0
+    for i in dropped:
+        image = images[i]
+        assert image is not None
+        tokens_saved += estimate_image_tokens(image.shape[1], image.shape[0])
+
+    report = DedupReport(
+        total=len(urls), kept=len(kept), clusters=clusters, tokens_saved=tokens_saved
+    )
+    return kept, report
@@ -0,0 +1,117 @@
+"""Download and decode a sighting's images once for every local analysis stage.
+
+All images are fetched concurrently over one pooled client and each is decoded exactly once.
+The decoded arrays are marked read-only and handed to the quality, dedup and payload stages
+as-is, so they share one copy instead of each stage re-fetching or copying the frames. Each
+image's share of the sighting's memory budget is reserved from its header before decoding,
+so frames that don't fit are never decoded at all.
+"""
+
+import asyncio
+import io
+import time
+from dataclasses import dataclass
+
+import cv2
+import httpx
+import numpy as np
+from PIL import Image
+
+# decoded pixels held per sighting; a 12MP frame is ~36MB, Bird Buddy frames are far smaller
+MAX_SIGHTING_BYTES = 256 * 1024 * 1024
+_MAX_CONCURRENT_DOWNLOADS = 8
+
+
+@dataclass
+class FetchReport:
+    total: int
+    decoded: int = 0
+    downloaded_bytes: int = 0
+    decoded_bytes: int = 0
+    over_budget: int = 0
+    seconds: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"image fetch: decoded {self.decoded}/{self.total} images "
+            f"({self.downloaded_bytes / 1e6:.1f} MB downloaded, "
+            f"{self.decoded_bytes / 1e6:.1f} MB decoded, {self.over_budget} over budget) "
+            f"in {self.seconds:.2f}s"
+        )
+
+
+async def fetch_images(
+    urls: list[str],
+    http: httpx.AsyncClient | None = None,
+    max_bytes: int = MAX_SIGHTING_BYTES,
+) -> tuple[list[np.ndarray | None], FetchReport]:
+    """Fetch and decode ``urls`` concurrently.
+
+    Entries are None where the fetch or decode failed, or where keeping the decoded frame
+    would push the sighting past ``max_bytes``; callers treat those like any image they
+    couldn't look at. Returned arrays are read-only because every stage shares them.
+    """
+    if http is None:
+        async with httpx.AsyncClient(timeout=30.0, follow_redirects=True) as new_http:
+            return await fetch_images(urls, new_http, max_bytes)
+
+    report = FetchReport(total=len(urls))
+    semaphore = asyncio.Semaphore(_MAX_CONCURRENT_DOWNLOADS)
+    start = time.perf_counter()
+
+    async def fetch_one(url: str) -> np.ndarray | None:
+        async with semaphore:
+            try:
+                response = await http.get(url)
+                response.raise_for_status()
+            except httpx.HTTPError as e:
+                print(f"could not fetch image {url}: {e}")
+                return None
+
+        content = response.content
+        report.downloaded_bytes += len(content)
+        try:
+            reserved = _decoded_size(content)
+        except Image.DecompressionBombError:
+            reserved = max_bytes + 1
+        if reserved is not None:
+            if report.decoded_bytes + reserved > max_bytes:
+                report.over_budget += 1
+                return None
+            report.decoded_bytes += reserved
+
+        # frombuffer wraps the response bytes without copying them
+        image = await asyncio.to_thread(
+            cv2.imdecode, np.frombuffer(content, np.uint8), cv2.IMREAD_COLOR
+        )
+        del content, response
+        if image is None:
+            report.decoded_bytes -= reserved or 0
+            print(f"could not decode image {url}")
+            return None
+        if reserved is None:
+            # a header PIL can't read; charged once decoded instead
+            if report.decoded_bytes + image.nbytes > max_bytes:
+                report.over_budget += 1
+                return None
+            reserved = 0
+        report.decoded_bytes += image.nbytes - reserved
+
+        report.decoded += 1
+        image.setflags(write=False)
+        return image
+
+    images = list(await asyncio.gather(*(fetch_one(url) for url in urls)))
+    report.seconds = time.perf_counter() - start
+    return images, report
+
+
+def _decoded_size(content: bytes) -> int | None:
+    """Bytes ``content`` takes decoded to BGR, from its header alone, or None if PIL can't
+    read the header."""
+    try:
+        with Image.open(io.BytesIO(content)) as header:
+            width, height = header.size
+    except (OSError, ValueError):
+        return None
+    return int(width) * int(height) * 3
@@ -0,0 +1,139 @@
+"""Image inputs for the OpenAI curation request.
+
+``url`` hands the model the full-size GCS URLs to fetch itself. ``inline`` sends each frame
+downscaled and re-encoded as a data URL, so the model neither waits on GCS nor bills tiles
+for pixels it doesn't need. ``contact_sheet`` tiles every frame into one labelled image,
+which costs a handful of tiles for the whole sighting.
+"""
+
+import base64
+import math
+import os
+from dataclasses import dataclass, field
+from typing import Literal, cast, get_args
+
+import cv2
+import numpy as np
+from openai.types.responses import ResponseInputImageParam
+
+from curator.image_dedup import estimate_image_tokens
+
+ImagePayload = Literal["url", "inline", "contact_sheet"]
+
+# one 512px tile per frame is the cheapest size the model still bills at full detail
+INLINE_MAX_EDGE = 512
+CONTACT_SHEET_CELL = 384
+_JPEG_QUALITY = 80
+
+
+@dataclass
+class ImageInputs:
+    content: list[ResponseInputImageParam] = field(default_factory=list)
+    # extra prompt text explaining how the images map to the numbered url list
+    note: str = ""
+    estimated_tokens: int = 0
+    # bytes of inline image data in the request; zero for urls
+    payload_bytes: int = 0
+
+
+def payload_from_env() -> ImagePayload:
+    """The payload mode set by ``IMAGE_PAYLOAD``, defaulting to ``url``."""
+    payload = os.getenv("IMAGE_PAYLOAD", "url")
+    if payload not in get_args(ImagePayload):
+        raise ValueError(f"Unknown IMAGE_PAYLOAD {payload!r}")
+    return cast(ImagePayload, payload)
+
+
+def downscale(image: np.ndarray, max_edge: int) -> np.ndarray:
+    """Shrink ``image`` so its longest edge is at most ``max_edge``."""
+    height, width = image.shape[:2]
+    scale = max_edge / max(height, width)
+    if scale >= 1.0:
+        return image
+    size = (round(width * scale), round(height * scale))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def encode_data_url(image: np.ndarray, quality: int = _JPEG_QUALITY) -> str:
+    ok, encoded = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise ValueError("Could not encode image")
+    return "data:image/jpeg;base64," + base64.b64encode(encoded.tobytes()).decode("ascii")
+
+
+def contact_sheet(
+    images: list[np.ndarray], labels: list[str], cell: int = CONTACT_SHEET_CELL
+) -> np.ndarray:
+    """Tile ``images`` into a near-square grid, each letterboxed into a ``cell`` square and
+    labelled in its top-left corner."""
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+    sheet = np.zeros((rows * cell, columns * cell, 3), np.uint8)
+
+    for n, (image, label) in enumerate(zip(images, labels)):
+        tile = downscale(image, cell)
+        height, width = tile.shape[:2]
+        top = (n // columns) * cell + (cell - height) // 2
+        left = (n % columns) * cell + (cell - width) // 2
+        sheet[top : top + height, left : left + width] = tile
+
+        origin = ((n % columns) * cell + 8, (n // columns) * cell + 36)
+        for color, thickness in (((0, 0, 0), 6), ((255, 255, 255), 2)):
+            cv2.putText(
+                sheet, label, origin, cv2.FONT_HERSHEY_SIMPLEX, 1.2, color, thickness, cv2.LINE_AA
+            )
+    return sheet
+
+
+def build_image_inputs(
+    urls: list[str],
+    images: list[np.ndarray | None] | None,
+    payload: ImagePayload = "url",
+    max_edge: int = INLINE_MAX_EDGE,
+) -> ImageInputs:
+    """Image content items for ``urls`` in the requested ``payload`` mode.
+
+    ``images[i]`` is the decoded ``urls[i]``. Frames that weren't decoded are always sent by
+    url, after the inline or contact-sheet images.
+    """
+    if images is None:
+        images = [None] * len(urls)
+    decoded = [(n, image) for n, image in enumerate(images) if image is not None]
+    if payload == "url" or not decoded:
+        return _url_inputs(urls, images)
+
+    inputs = ImageInputs()
+    if payload == "inline":
+        for _, image in decoded:
+            small = downscale(image, max_edge)
+            data_url = encode_data_url(small)
+            inputs.content.append({"type": "input_image", "detail": "auto", "image_url": data_url})
+            inputs.estimated_tokens += estimate_image_tokens(small.shape[1], small.shape[0])
+            inputs.payload_bytes += len(data_url)
+    else:
+        sheet = contact_sheet([image for _, image in decoded], [str(n + 1) for n, _ in decoded])
+        data_url = encode_data_url(sheet)
+        inputs.content.append({"type": "input_image", "detail": "auto", "image_url": data_url})
+        inputs.estimated_tokens += estimate_image_tokens(sheet.shape[1], sheet.shape[0])
+        inputs.payload_bytes += len(data_url)
+        inputs.note = (
+            "The images are tiled into one contact sheet; each tile is labelled with its "
+            "number from the list above. "
+        )
+
+    missing = [n for n, image in enumerate(images) if image is None]
+    if missing:
+        numbers = ", ".join(str(n + 1) for n in missing)
+        inputs.note += f"Images {numbers} are attached separately at the end, in order. "
+        for n in missing:
+            inputs.content.append({"type": "input_image", "detail": "auto", "image_url": urls[n]})
+    return inputs
+
+
+def _url_inputs(urls: list[str], images: list[np.ndarray | None]) -> ImageInputs:
+    inputs = ImageInputs()
+    for url, image in zip(urls, images):
+        inputs.content.append({"type": "input_image", "detail": "auto", "image_url": url})
+        if image is not None:
+            inputs.estimated_tokens += estimate_image_tokens(image.shape[1], image.shape[0])
+    return inputs
@@ -0,0 +1,202 @@
+"""Local quality scoring for sighting images.
+
+Cheap checks that run on every frame of a sighting before the OpenAI call: a blur score,
+exposure checks, and a foreground heuristic that compares each frame with the feeder
+background. Obvious rejects are dropped, and frames that clearly show something crisp in
+front of a known empty feeder are accepted without asking the model.
+
+Blur is judged per tile as the ratio of fine detail (Laplacian) to coarser detail
+(difference of Gaussians), which does not depend on contrast, and a frame is only as sharp
+as its softest textured tiles. The feeder's background is usually pine needles in focus, so
+a whole-frame measure would rate a frame with a soft bird in front of them as sharp.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Literal
+
+import cv2
+import numpy as np
+
+Verdict = Literal["reject", "accept", "uncertain"]
+
+# frames are scored on a downscaled copy; a soft subject in front of a sharp background
+# stops showing much below this size
+_WORK_MAX_EDGE = 1024
+# blur is measured per square tile of this many pixels of the working copy
+_TILE = 48
+# tiles with less contrast or coarse detail than this (gray levels) are flat, such as sky,
+# the tray, or the halo the coarse band leaves next to a strong edge
+_MIN_TILE_CONTRAST = 4.0
+_MIN_TILE_DETAIL = 3.0
+# a frame is as sharp as this percentile of its textured tiles
+_SOFTEST_PERCENTILE = 10.0
+# the batch median only approximates the empty feeder once there are a few frames
+_MIN_FRAMES_FOR_BACKGROUND = 3
+
+
+@dataclass(frozen=True)
+class QualityThresholds:
+    # sharpness (fine to coarse detail) below which a frame is out of focus; calibrated
+    # with benchmarks/image_quality.py on tests/images, where the blurry frames score at
+    # most 0.9 and the sharp ones at least 1.15
+    min_sharpness: float = 1.0
+    # mean gray level outside this range is too dark or washed out
+    min_brightness: float = 35.0
+    max_brightness: float = 225.0
+    # share of pixels crushed to black or blown out to white
+    max_clipped_fraction: float = 0.5
+    # gray-level difference from the background that counts as foreground
+    foreground_diff: int = 30
+    # against a known empty-feeder background, less foreground than this means no bird
+    min_foreground_fraction: float = 0.02
+    # a confident accept needs a sizeable subject that is itself clearly sharp
+    accept_foreground_fraction: float = 0.05
+    accept_subject_sharpness: float = 1.2
+
+
+DEFAULT_THRESHOLDS = QualityThresholds()
+
+
+@dataclass
+class QualityScore:
+    sharpness: float
+    brightness: float
+    clipped_fraction: float
+    foreground_fraction: float | None
+    subject_sharpness: float | None
+    verdict: Verdict
+    reason: str
+
+
+def score_images(
+    images: list[np.ndarray],
+    thresholds: QualityThresholds = DEFAULT_THRESHOLDS,
+    background: np.ndarray | None = None,
+) -> list[QualityScore]:
+    """Score a sighting's frames as a batch.
+
+    Only with an explicit ``background`` (an empty-feeder frame) is a frame ever accepted,
+    or rejected for barely differing from it. Without one, the per-pixel median of the
+    batch stands in for the background to report foreground; it may contain a bird that
+    never moved, so the frames it is compared with stay uncertain.
+    """
+    if not images:
+        return []
+
+    grays = [_work_gray(image) for image in images]
+    smoothed = [cv2.GaussianBlur(gray, (5, 5), 0) for gray in grays]
+
+    reference: np.ndarray | None = None
+    if background is not None:
+        reference = cv2.GaussianBlur(_work_gray(background, like=grays[0]), (5, 5), 0)
+    elif len(grays) >= _MIN_FRAMES_FOR_BACKGROUND and _same_shape(grays):
+        reference = np.median(np.stack(smoothed), axis=0).astype(np.uint8)
+
+    return [
+        _score(gray, blurred, reference, background is not None, thresholds)
+        for gray, blurred in zip(grays, smoothed)
+    ]
+
+
+def _score(
+    gray: np.ndarray,
+    blurred: np.ndarray,
+    reference: np.ndarray | None,
+    reference_is_empty: bool,
+    thresholds: QualityThresholds,
+) -> QualityScore:
+    contrast, fine, coarse = _detail(gray)
+    textured = (contrast > _MIN_TILE_CONTRAST) & (coarse > _MIN_TILE_DETAIL)
+    sharpness = _softest_ratio(fine, coarse, textured)
+    if sharpness is None:
+        # nothing in the frame has enough detail to look blurry
+        sharpness = math.inf
+    brightness = float(gray.mean())
+    clipped_fraction = float(np.count_nonzero((gray <= 5) | (gray >= 250)) / gray.size)
+
+    foreground_fraction: float | None = None
+    subject_sharpness: float | None = None
+    if reference is not None and reference.shape == blurred.shape:
+        mask = cv2.absdiff(blurred, reference) > thresholds.foreground_diff
+        mask = cv2.morphologyEx(
+            mask.astype(np.uint8), cv2.MORPH_OPEN, np.ones((5, 5), np.uint8)
+        ).astype(bool)
+        foreground_fraction = float(np.count_nonzero(mask) / mask.size)
+        subject_sharpness = _softest_ratio(
+            fine, coarse, textured & (_tiles(mask).mean(axis=(1, 3)) >= 0.5)
+        )
+
+    def verdict(v: Verdict, reason: str) -> QualityScore:
+        return QualityScore(
+            sharpness=sharpness,
+            brightness=brightness,
+            clipped_fraction=clipped_fraction,
+            foreground_fraction=foreground_fraction,
+            subject_sharpness=subject_sharpness,
+            verdict=v,
+            reason=reason,
+        )
+
+    if sharpness < thresholds.min_sharpness:
+        return verdict("reject", "blurry")
+    if not thresholds.min_brightness <= brightness <= thresholds.max_brightness:
+        return verdict("reject", "exposure")
+    if clipped_fraction > thresholds.max_clipped_fraction:
+        return verdict("reject", "exposure")
+    if foreground_fraction is None:
+        return verdict("uncertain", "no background")
+    if not reference_is_empty:
+        return verdict("uncertain", "no empty feeder")
+    if foreground_fraction < thresholds.min_foreground_fraction:
+        return verdict("reject", "no foreground")
+    if (
+        foreground_fraction >= thresholds.accept_foreground_fraction
+        and subject_sharpness is not None
+        and subject_sharpness >= thresholds.accept_subject_sharpness
+    ):
+        return verdict("accept", "sharp subject")
+    return verdict("uncertain", "soft subject")
+
+
+def _detail(gray: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Per-tile standard deviation of ``gray`` and of its fine and coarse detail."""
+    # sensor noise and JPEG artifacts would otherwise count as fine detail
+    image = cv2.bilateralFilter(gray, 5, 25, 5).astype(np.float32)
+    fine = cv2.Laplacian(image, cv2.CV_32F)
+    coarse = cv2.GaussianBlur(image, (0, 0), 1.5) - cv2.GaussianBlur(image, (0, 0), 6.0)
+    return (
+        _tiles(image).std(axis=(1, 3)),
+        _tiles(fine).std(axis=(1, 3)),
+        _tiles(coarse).std(axis=(1, 3)),
+    )
+
+
+def _softest_ratio(fine: np.ndarray, coarse: np.ndarray, tiles: np.ndarray) -> float | None:
+    """Fine to coarse detail of the softest of the selected ``tiles``, None if there are
+    none."""
+    if not tiles.any():
+        return None
+    return float(np.percentile(fine[tiles] / coarse[tiles], _SOFTEST_PERCENTILE))
+
+
+def _tiles(array: np.ndarray) -> np.ndarray:
+    rows, cols = array.shape[0] // _TILE, array.shape[1] // _TILE
+    return array[: rows * _TILE, : cols * _TILE].reshape(rows, _TILE, cols, _TILE)
+
+
+def _work_gray(image: np.ndarray, like: np.ndarray | None = None) -> np.ndarray:
+    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if image.ndim == 3 else image
+    if like is not None:
+        size = (like.shape[1], like.shape[0])
+    else:
+        height, width = gray.shape
+        scale = min(1.0, _WORK_MAX_EDGE / max(height, width))
+        size = (round(width * scale), round(height * scale))
+    if size == (gray.shape[1], gray.shape[0]):
+        return gray
+    return cv2.resize(gray, size, interpolation=cv2.INTER_AREA)
+
+
+def _same_shape(arrays: list[np.ndarray]) -> bool:
+    return all(a.shape == arrays[0].shape for a in arrays)
@@ -1,53 +1,212 @@
 from __future__ import annotations
 
 import asyncio
+import json
 import os
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from typing import TypeVar
 
+import httpx
+import numpy as np
+from bov_data import get_runtime
 from dotenv import load_dotenv
-from openai import OpenAI
-from openai.types.responses import EasyInputMessageParam, ResponseInputImageParam
+from openai import AsyncOpenAI
+from openai.types.responses import (
+    EasyInputMessageParam,
+    Response,
+    ResponseFormatTextJSONSchemaConfigParam,
+)
 
+from curator.image_dedup import collapse_near_duplicates
+from curator.image_fetch import fetch_images
+from curator.image_payload import ImagePayload, build_image_inputs
+from curator.image_quality import DEFAULT_THRESHOLDS, QualityThresholds, score_images
 
-async def curate_images(urls: list[str]) -> list[str]:
+T = TypeVar("T")
+
+# past this the sighting is posted with the locally curated images rather than waiting on
+CURATION_TIMEOUT_SECONDS = 120.0
+# hedging doubles the cost of slow requests, so it is off unless a caller opts in
+CURATION_HEDGE_AFTER_SECONDS: float | None = None
+
+_SELECTION_FORMAT: ResponseFormatTextJSONSchemaConfigParam = {
+    "type": "json_schema",
+    "name": "image_selection",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {"keep": {"type": "array", "items": {"type": "integer"}}},
+        "required": ["keep"],
+        "additionalProperties": False,
+    },
+}
+
+
+async def curate_images(
+    urls: list[str],
+    client: AsyncOpenAI | None = None,
+    http: httpx.AsyncClient | None = None,
+    thresholds: QualityThresholds = DEFAULT_THRESHOLDS,
+    payload: ImagePayload = "url",
+    background: np.ndarray | None = None,
+) -> list[str]:
+    """Pick which of a sighting's images to post.
+
+    Frames that are obviously blurry or badly exposed are dropped locally. The model is
+    only skipped when every remaining frame shows a sharp subject against ``background``,
+    a frame of the empty feeder; without one it always decides.
+    """
     if not urls:
         return []
 
-    return await _curate_and_dedup(urls)
+    images, fetch_report = await fetch_images(urls, http)
+    print(fetch_report)
+
+    # drop frames that are obviously blurry or badly exposed before spending tokens on them
+    decoded = [(url, image) for url, image in zip(urls, images) if image is not None]
+    scores = await asyncio.to_thread(
+        score_images, [image for _, image in decoded], thresholds, background
+    )
+    score_by_url = {url: score for (url, _), score in zip(decoded, scores)}
+    rejected = [url for url, score in score_by_url.items() if score.verdict == "reject"]
+    if rejected:
+        reasons = Counter(score_by_url[url].reason for url in rejected)
+        print(f"image quality: rejected {len(rejected)}/{len(urls)} images ({dict(reasons)})")
+    kept = [i for i, url in enumerate(urls) if url not in rejected]
+    urls, images = [urls[i] for i in kept], [images[i] for i in kept]
+    if not urls:
+        return []
+
+    image_by_url = dict(zip(urls, images))
+
+    # collapse burst near-duplicates locally so the model only sees distinct frames,
+    # keeping the sharpest frame of each burst
+    sharpness = [score_by_url[url].sharpness if url in score_by_url else 0.0 for url in urls]
+    urls, report = collapse_near_duplicates(urls, images, prefer=sharpness)
+    print(report)
+
+    # every remaining frame is a crisp subject in front of the empty feeder: nothing for the
+    # model to decide
+    if all(url in score_by_url and score_by_url[url].verdict == "accept" for url in urls):
+        print(f"image quality: accepted {len(urls)} images locally, skipping model")
+        return urls
+
+    kept_images = [image_by_url[url] for url in urls]
+    return await _curate_and_dedup(urls, client, images=kept_images, payload=payload)
+
+
+def _openai_client() -> AsyncOpenAI:
+    """The process-wide OpenAI client, so warm instances reuse its connection pool."""
+    return get_runtime().client("openai", lambda: AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY")))
 
 
-async def _curate_and_dedup(urls: list[str]) -> list[str]:
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+async def _curate_and_dedup(
+    urls: list[str],
+    client: AsyncOpenAI | None = None,
+    images: list[np.ndarray | None] | None = None,
+    payload: ImagePayload = "url",
+    timeout: float = CURATION_TIMEOUT_SECONDS,
+    hedge_after: float | None = CURATION_HEDGE_AFTER_SECONDS,
+) -> list[str]:
+    """Ask the model which of ``urls`` to keep.
 
+    If the model hasn't answered within ``timeout`` the locally curated ``urls`` are kept
+    as they are. With ``hedge_after``, a second identical request is sent when the first is
+    still outstanding after that many seconds, and whichever answers first wins.
+    """
+    if client is None:
+        client = _openai_client()
+    openai_client = client
+
+    message = await asyncio.to_thread(_curation_message, urls, images, payload)
+
+    async def create() -> Response:
+        return await openai_client.responses.create(
+            model="gpt-5",
+            input=[message],
+            text={"format": _SELECTION_FORMAT},
+            timeout=timeout,
+        )
+
+    try:
+        response = await asyncio.wait_for(_hedged(create, hedge_after), timeout)
+    except asyncio.TimeoutError:
+        print(f"image curation: no answer after {timeout}s, keeping {len(urls)} images")
+        return urls
+
+    return _parse_selection(response.output_text, urls)
+
+
+async def _hedged(call: Callable[[], Awaitable[T]], hedge_after: float | None) -> T:
+    """Await ``call()``, starting a second attempt if the first takes over ``hedge_after``
+    seconds. Returns the first successful result and cancels whatever is still running."""
+    first = asyncio.ensure_future(call())
+    if hedge_after is None:
+        return await first
+
+    pending: set[asyncio.Future[T]] = {first}
+    try:
+        done, pending = await asyncio.wait(pending, timeout=hedge_after)
+        if not done:
+            print(f"image curation: no answer after {hedge_after}s, sending hedged request")
+            pending.add(asyncio.ensure_future(call()))
+
+        error: BaseException | None = None
+        while True:
+            for task in done:
+                error = task.exception()
+                if error is None:
+                    return task.result()
+            if not pending:
+                assert error is not None
+                raise error
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+def _parse_selection(output_text: str, urls: list[str]) -> list[str]:
+    """Map the model's 1-based image numbers back to urls, in list order.
+
+    An answer that isn't the expected JSON keeps the locally curated ``urls``, as when the
+    model doesn't answer in time.
+    """
+    try:
+        keep = json.loads(output_text)["keep"]
+        numbers = sorted({n for n in keep if isinstance(n, int) and 1 <= n <= len(urls)})
+    except (json.JSONDecodeError, KeyError, TypeError) as e:
+        print(f"image curation: unreadable answer ({e!r}), keeping {len(urls)} images")
+        return urls
+    return [urls[n - 1] for n in numbers]
+
+
+def _curation_message(
+    urls: list[str],
+    images: list[np.ndarray | None] | None = None,
+    payload: ImagePayload = "url",
+) -> EasyInputMessageParam:
+    """The curation prompt with the images attached in ``payload`` mode."""
     numbered_urls = "\n".join(f"{i + 1}. {url}" for i, url in enumerate(urls))
-    image_contents: list[ResponseInputImageParam] = [
-        {"type": "input_image", "detail": "auto", "image_url": url} for url in urls
-    ]
-    message: EasyInputMessageParam = {
+    inputs = build_image_inputs(urls, images, payload)
+    return {
         "role": "user",
         "content": [
             {
                 "type": "input_text",
                 "text": (
                     f"Here are the image URLs in order:\n{numbered_urls}\n\n"
+                    f"{inputs.note}"
                     "From this group of input images: "
                     "1. ignore images that are out of focus or do not clearly show a bird or squirrel "
                     "2. remove images that are very similar to each other "
-                    "3. respond with a list of the remaining image urls from the list above, one per line"
+                    "3. respond with the numbers of the remaining images from the list above"
                 ),
             },
-            *image_contents,
+            *inputs.content,
         ],
     }
-    response = client.responses.create(
-        model="gpt-5",
-        input=[message],
-    )
-
-    return [
-        line.strip()
-        for line in response.output_text.splitlines()
-        if line.strip().startswith("http")
-    ]
 
 
 async def main() -> None:
@@ -1,22 +1,73 @@
 import asyncio
+import contextlib
 import json
 import os
+import time
+import weakref
+from collections.abc import AsyncIterator, Coroutine
+from dataclasses import dataclass
+from typing import Any
 
 import httpx
 from bov_data import Sighting
 
+from curator.rate_limits import graph_api_scheduler, is_rate_limit_error
+
 _GRAPH_API_BASE = "https://graph.facebook.com/v21.0"
 _MAX_CAROUSEL_ITEMS = 10
-_VIDEO_POLL_INTERVAL_SECONDS = 5
+# carousel child containers created at the same time
+_MAX_CONCURRENT_CHILDREN = 4
 _VIDEO_POLL_TIMEOUT_SECONDS = 120
+# container status checks: the first wait once a check finds a container still processing,
+# how much longer each following wait gets, and the longest one
+_POLL_FIRST_INTERVAL_SECONDS = 0.5
+_POLL_BACKOFF = 1.5
+_POLL_MAX_INTERVAL_SECONDS = 10.0
+# most ids the Graph API takes in one ?ids= request
+_MAX_POLL_BATCH = 50
+# times a call rejected for rate limiting is made again
+_RATE_LIMIT_RETRIES = 3
+# bytes sent per video upload request, unless INSTAGRAM_UPLOAD_CHUNK_MB says otherwise
+UPLOAD_CHUNK_BYTES = 8 * 1024 * 1024
+# tries in a row an upload request gets before the upload fails, and the first wait between
+_UPLOAD_ATTEMPTS = 4
+_UPLOAD_RETRY_SECONDS = 1.0
+# how much of the file is read into memory at a time while sending it
+_UPLOAD_READ_BYTES = 256 * 1024
+
+
+@dataclass
+class UploadStats:
+    uploads: int = 0
+    failed: int = 0
+    # requests that failed and were resumed from what Instagram had received
+    resumes: int = 0
+    bytes_sent: int = 0
+    seconds: float = 0.0
+    last_bytes_per_second: float = 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.bytes_sent / self.seconds if self.seconds else 0.0
+
+
+_upload_stats = UploadStats()
+
+
+def upload_stats() -> UploadStats:
+    """Video upload counters and throughput since process start."""
+    return _upload_stats
 
 
 async def post_sighting(
-    sighting: Sighting, image_urls: list[str], video_path: str | None
+    sighting: Sighting,
+    image_urls: list[str],
+    video_path: str | None,
+    client: httpx.AsyncClient | None = None,
 ) -> tuple[str | None, str | None]:
     """Post sighting to Instagram. Returns (image_post_url, video_post_url).
 
-    Images and video are posted as separate posts when both are present.
+    Images and video are posted as separate posts, concurrently, when both are present.
     Images: single image post or carousel.
     Video: regular video post.
     """
@@ -25,29 +76,62 @@ async def post_sighting(
     image_enabled = os.environ["INSTAGRAM_POST_PICS_ENABLED"] == "true"
     caption = _build_caption(sighting)
 
-    async with httpx.AsyncClient(timeout=30.0) as client:
-        image_permalink: str | None = None
-        video_permalink: str | None = None
-
-        if image_enabled and image_urls:
-            try:
-                image_permalink = await _post_sighting_image(
-                    client, ig_user_id, token, image_urls, caption
-                )
-            except RuntimeError as e:
-                if not is_ig_spam(e):
-                    raise
+    if client is None:
+        async with httpx.AsyncClient(timeout=30.0) as new_client:
+            return await _post_sighting(
+                new_client,
+                ig_user_id,
+                token,
+                image_urls if image_enabled else [],
+                video_path,
+                caption,
+            )
+    return await _post_sighting(
+        client, ig_user_id, token, image_urls if image_enabled else [], video_path, caption
+    )
 
-        if video_path is not None:
-            try:
-                video_permalink = await _post_sighting_video(
-                    client, ig_user_id, token, video_path, caption
-                )
-            except RuntimeError as e:
-                if not is_ig_spam(e):
-                    raise
 
-    return image_permalink, video_permalink
+async def _post_sighting(
+    client: httpx.AsyncClient,
+    ig_user_id: str,
+    token: str,
+    image_urls: list[str],
+    video_path: str | None,
+    caption: str,
+) -> tuple[str | None, str | None]:
+    """The image and video posts run at the same time; most of either is spent waiting for
+    Instagram to process the media. Each one tolerates the spam error on its own, and when
+    one fails the other still finishes before the error is raised."""
+    posts: dict[str, Coroutine[Any, Any, str]] = {}
+    if image_urls:
+        posts["image"] = _post_sighting_image(client, ig_user_id, token, image_urls, caption)
+    if video_path is not None:
+        posts["video"] = _post_sighting_video(client, ig_user_id, token, video_path, caption)
+
+    results = await asyncio.gather(
+        *(_unless_spam(post) for post in posts.values()), return_exceptions=True
+    )
+    permalinks = {
+        kind: result
+        for kind, result in zip(posts, results)
+        if not isinstance(result, BaseException)
+    }
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        posted = {kind: permalink for kind, permalink in permalinks.items() if permalink}
+        if posted:
+            print(f"posted {posted} before another post failed")
+        raise errors[0]
+    return permalinks.get("image"), permalinks.get("video")
+
+
+async def _unless_spam(post: Coroutine[Any, Any, str]) -> str | None:
+    try:
+        return await post
+    except RuntimeError as e:
+        if not is_ig_spam(e):
+            raise
+        return None
 
 
 def _build_caption(sighting: Sighting) -> str:
@@ -86,7 +170,7 @@ async def _post_sighting_video(
     client: httpx.AsyncClient, ig_user_id: str, token: str, video_path: str, caption: str
 ) -> str:
     media_id = await _post_reel(client, ig_user_id, token, video_path, caption)
-    return await _get_permalink(client, token, media_id)
+    return await _get_permalink(client, ig_user_id, token, media_id)
 
 
 async def _post_sighting_image(
@@ -98,13 +182,16 @@ async def _post_sighting_image(
         media_id = await _post_carousel(
             client, ig_user_id, token, image_urls[:_MAX_CAROUSEL_ITEMS], caption
         )
-    return await _get_permalink(client, token, media_id)
+    return await _get_permalink(client, ig_user_id, token, media_id)
 
 
 async def _post_single_image(
     client: httpx.AsyncClient, ig_user_id: str, token: str, image_url: str, caption: str
 ) -> str:
-    resp = await client.post(
+    resp = await _graph_request(
+        client,
+        ig_user_id,
+        "POST",
         f"{_GRAPH_API_BASE}/{ig_user_id}/media",
         params={"access_token": token},
         json={"image_url": image_url, "caption": caption},
@@ -121,18 +208,12 @@ async def _post_carousel(
     image_urls: list[str],
     caption: str,
 ) -> str:
-    child_ids = []
+    child_ids = await _create_carousel_children(client, ig_user_id, token, image_urls)
 
-    for url in image_urls:
-        resp = await client.post(
-            f"{_GRAPH_API_BASE}/{ig_user_id}/media",
-            params={"access_token": token},
-            json={"image_url": url, "is_carousel_item": True},
-        )
-        resp.raise_for_status()
-        child_ids.append(resp.json()["id"])
-
-    resp = await client.post(
+    resp = await _graph_request(
+        client,
+        ig_user_id,
+        "POST",
         f"{_GRAPH_API_BASE}/{ig_user_id}/media",
         params={"access_token": token},
         json={
@@ -143,10 +224,52 @@ async def _post_carousel(
     )
     resp.raise_for_status()
     container_id = resp.json()["id"]
-    await _poll_until_finished(client, token, container_id)
+    await _poll_until_finished(client, ig_user_id, token, container_id, "carousel")
     return await _publish(client, ig_user_id, token, container_id)
 
 
+async def _create_carousel_children(
+    client: httpx.AsyncClient, ig_user_id: str, token: str, image_urls: list[str]
+) -> list[str]:
+    """Create a child container for each image, a few at a time. Returns their ids in the
+    order of ``image_urls``.
+
+    Containers can't be deleted through the API, unpublished ones expire after a day. So
+    once a creation fails no more are started; the error is raised when the ones already
+    in flight have finished, and the containers they created are logged.
+    """
+    semaphore = asyncio.Semaphore(_MAX_CONCURRENT_CHILDREN)
+    failed = asyncio.Event()
+
+    async def create_one(url: str) -> str | None:
+        async with semaphore:
+            if failed.is_set():
+                return None
+            try:
+                resp = await _graph_request(
+                    client,
+                    ig_user_id,
+                    "POST",
+                    f"{_GRAPH_API_BASE}/{ig_user_id}/media",
+                    params={"access_token": token},
+                    json={"image_url": url, "is_carousel_item": True},
+                )
+                resp.raise_for_status()
+                return str(resp.json()["id"])
+            except (httpx.HTTPError, KeyError, ValueError):
+                failed.set()
+                raise
+
+    results = await asyncio.gather(*(create_one(url) for url in image_urls), return_exceptions=True)
+    child_ids = [result for result in results if isinstance(result, str)]
+    errors = [result for result in results if isinstance(result, BaseException)]
+    if errors:
+        if child_ids:
+            print(f"carousel abandoned, unpublished child containers left to expire: {child_ids}")
+        raise errors[0]
+    return child_ids
+
+
 async def _post_reel(
     client: httpx.AsyncClient,
     ig_user_id: str,
@@ -170,15 +293,16 @@ async def _upload_video_container(
     caption: str = "",
 ) -> str:
     """Upload a video via resumable upload. Returns the container ID once FINISHED."""
-    file_size = os.path.getsize(video_path)
-
     payload: dict = {"media_type": media_type, "upload_type": "resumable"}
     if is_carousel_item:
         payload["is_carousel_item"] = True
     if caption:
         payload["caption"] = caption
 
-    resp = await client.post(
+    resp = await _graph_request(
+        client,
+        ig_user_id,
+        "POST",
         f"{_GRAPH_API_BASE}/{ig_user_id}/media",
         params={"access_token": token},
         json=payload,
@@ -189,55 +313,353 @@ async def _upload_video_container(
     container_id: str = data["id"]
     upload_uri: str = data["uri"]
 
-    with open(video_path, "rb") as f:
-        video_bytes = f.read()
+    await _upload_video(client, ig_user_id, token, upload_uri, container_id, video_path)
+    await _poll_until_finished(client, ig_user_id, token, container_id)
+    return container_id
 
-    upload_resp = await client.post(
-        upload_uri,
-        headers={
-            "Authorization": f"OAuth {token}",
-            "offset": "0",
-            "file_size": str(file_size),
-            "Content-Type": "video/mp4",
-        },
-        content=video_bytes,
+
+async def _upload_video(
+    client: httpx.AsyncClient,
+    ig_user_id: str,
+    token: str,
+    upload_uri: str,
+    container_id: str,
+    video_path: str,
+) -> None:
+    """Send the file to ``upload_uri`` in chunks, streamed from disk.
+
+    Each request says where its bytes start with the ``offset`` header. When one fails the
+    upload carries on from what Instagram says it received, so a dropped connection costs
+    at most the chunk in flight, not the whole file.
+    """
+    file_size = os.path.getsize(video_path)
+    chunk_size = _upload_chunk_bytes()
+    offset = 0
+    failures = 0
+    start = time.perf_counter()
+    while offset < file_size:
+        length = min(chunk_size, file_size - offset)
+        try:
+            resp = await client.post(
+                upload_uri,
+                headers={
+                    "Authorization": f"OAuth {token}",
+                    "offset": str(offset),
+                    "file_size": str(file_size),
+                    "Content-Type": "video/mp4",
+                    "Content-Length": str(length),
+                },
+                content=_read_file(video_path, offset, length),
+            )
+            if resp.status_code < 500:
+                resp.raise_for_status()
+                offset += length
+                failures = 0
+                _upload_stats.bytes_sent += length
+                continue
+            error = f"{resp.status_code}: {resp.text}"
+        except httpx.TransportError as e:
+            error = repr(e)
+
+        failures += 1
+        if failures >= _UPLOAD_ATTEMPTS:
+            _upload_stats.failed += 1
+            raise RuntimeError(f"video upload failed at byte {offset} of {file_size}: {error}")
+        await asyncio.sleep(_UPLOAD_RETRY_SECONDS * 2 ** (failures - 1))
+        offset = await _uploaded_bytes(client, ig_user_id, token, container_id, offset)
+        _upload_stats.resumes += 1
+        print(f"video upload interrupted ({error}), resuming at byte {offset}")
+
+    seconds = time.perf_counter() - start
+    _upload_stats.uploads += 1
+    _upload_stats.seconds += seconds
+    _upload_stats.last_bytes_per_second = file_size / seconds if seconds else 0.0
+    print(
+        f"uploaded {file_size / 1e6:.1f} MB in {seconds:.1f}s "
+        f"({_upload_stats.last_bytes_per_second / 1e6:.1f} MB/s)"
     )
-    upload_resp.raise_for_status()
 
-    await _poll_until_finished(client, token, container_id)
-    return container_id
 
+def _upload_chunk_bytes() -> int:
+    chunk_mb = os.getenv("INSTAGRAM_UPLOAD_CHUNK_MB")
+    return int(float(chunk_mb) * 1024 * 1024) if chunk_mb else UPLOAD_CHUNK_BYTES
 
-async def _poll_until_finished(client: httpx.AsyncClient, token: str, container_id: str) -> None:
-    """Poll a media container until its status_code is FINISHED."""
-    elapsed = 0
-    while elapsed < _VIDEO_POLL_TIMEOUT_SECONDS:
-        await asyncio.sleep(_VIDEO_POLL_INTERVAL_SECONDS)
-        elapsed += _VIDEO_POLL_INTERVAL_SECONDS
 
-        status_resp = await client.get(
+async def _read_file(path: str, offset: int, length: int) -> AsyncIterator[bytes]:
+    f = await asyncio.to_thread(open, path, "rb")
+    try:
+        f.seek(offset)
+        while length > 0:
+            data = await asyncio.to_thread(f.read, min(_UPLOAD_READ_BYTES, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+
+async def _uploaded_bytes(
+    client: httpx.AsyncClient, ig_user_id: str, token: str, container_id: str, default: int
+) -> int:
+    """How much of the upload Instagram has received, or ``default`` if it can't say."""
+    try:
+        resp = await _graph_request(
+            client,
+            ig_user_id,
+            "GET",
             f"{_GRAPH_API_BASE}/{container_id}",
-            params={"fields": "status_code", "access_token": token},
+            params={"fields": "video_status", "access_token": token},
+        )
+        resp.raise_for_status()
+        return int(resp.json()["video_status"]["uploading_phase"]["bytes_transferred"])
+    except (httpx.HTTPError, KeyError, TypeError, ValueError):
+        return default
+
+
+async def _poll_until_finished(
+    client: httpx.AsyncClient,
+    ig_user_id: str,
+    token: str,
+    container_id: str,
+    kind: str = "video",
+) -> None:
+    """Wait until a media container's status_code is FINISHED."""
+    await _container_poller(client).wait(ig_user_id, token, container_id, kind)
+
+
+# how long containers of each kind took to finish, averaged over recent ones
+_processing_seconds: dict[str, float] = {}
+_pollers: weakref.WeakKeyDictionary[httpx.AsyncClient, "ContainerPoller"] = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _container_poller(client: httpx.AsyncClient) -> "ContainerPoller":
+    poller = _pollers.get(client)
+    if poller is None:
+        poller = _pollers[client] = ContainerPoller(client)
+    return poller
+
+
+@dataclass
+class _Waiter:
+    ig_user_id: str
+    token: str
+    kind: str
+    future: asyncio.Future[None]
+    started: float
+    next_check: float
+    interval: float
+    # pushed back while the account is paused for rate limiting, which isn't processing time
+    deadline: float = float("inf")
+
+
+class ContainerPoller:
+    """Waits for media containers to finish processing.
+
+    A container is checked as soon as it is handed over, then at growing intervals, except
+    that the first waits jump to about when its kind of media has been finishing lately.
+    Containers that are due at the same time, from any post using the same client, are
+    checked with one request. Status checks are cheap and are not held back by the
+    scheduler, except while Meta has the account paused; that pause doesn't count against
+    the deadline.
+    """
+
+    def __init__(self, client: httpx.AsyncClient):
+        # weak, since the pollers of live clients are looked up by the client
+        self._client = weakref.ref(client)
+        self.requests = 0
+        self._waiting: dict[str, _Waiter] = {}
+        self._wake = asyncio.Event()
+        self._task: asyncio.Task[None] | None = None
+
+    async def wait(
+        self,
+        ig_user_id: str,
+        token: str,
+        container_id: str,
+        kind: str = "video",
+        timeout: float = _VIDEO_POLL_TIMEOUT_SECONDS,
+    ) -> None:
+        """Return once the container is FINISHED; raise if it errors or takes too long."""
+        now = time.monotonic()
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        self._waiting[container_id] = _Waiter(
+            ig_user_id, token, kind, future, now, now, _POLL_FIRST_INTERVAL_SECONDS, now + timeout
         )
-        status_resp.raise_for_status()
-        status_code = status_resp.json().get("status_code")
+        self._wake.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        try:
+            await future
+        finally:
+            self._waiting.pop(container_id, None)
+
+    async def _run(self) -> None:
+        try:
+            await self._poll()
+        except Exception as e:  # noqa: BLE001 - handed to the posts waiting on the poller
+            for container_id in list(self._waiting):
+                self._settle(container_id, e)
+
+    async def _poll(self) -> None:
+        while True:
+            pending = {
+                container_id: waiter
+                for container_id, waiter in self._waiting.items()
+                if not waiter.future.done()
+            }
+            if not pending:
+                return
+            now = time.monotonic()
+            scheduler = graph_api_scheduler()
+            due: dict[tuple[str, str], list[str]] = {}
+            for container_id, waiter in pending.items():
+                if waiter.deadline <= now:
+                    self._settle(
+                        container_id,
+                        TimeoutError(
+                            f"Container {container_id} did not finish processing within "
+                            f"{waiter.deadline - waiter.started:.0f}s"
+                        ),
+                    )
+                elif waiter.next_check <= now:
+                    paused = scheduler.paused_seconds(waiter.ig_user_id)
+                    if paused:
+                        waiter.next_check = now + paused
+                        waiter.deadline += paused
+                    else:
+                        due.setdefault((waiter.ig_user_id, waiter.token), []).append(container_id)
+            if not due:
+                # sleep until the next check or deadline, or a new container comes in
+                self._wake.clear()
+                waiters = [waiter for waiter in pending.values() if not waiter.future.done()]
+                if not waiters:
+                    continue
+                delay = min(min(w.next_check, w.deadline) for w in waiters) - now
+                with contextlib.suppress(asyncio.TimeoutError):
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                continue
+            for (ig_user_id, token), container_ids in due.items():
+                for i in range(0, len(container_ids), _MAX_POLL_BATCH):
+                    batch = container_ids[i : i + _MAX_POLL_BATCH]
+                    await self._check(ig_user_id, token, batch)
+
+    async def _check(self, ig_user_id: str, token: str, container_ids: list[str]) -> None:
+        client = self._client()
+        if client is None:
+            for container_id in container_ids:
+                self._settle(container_id, RuntimeError("HTTP client closed while polling"))
+            return
+        self.requests += 1
+        if len(container_ids) == 1:
+            url = f"{_GRAPH_API_BASE}/{container_ids[0]}"
+            params = {"fields": "status_code", "access_token": token}
+        else:
+            url = f"{_GRAPH_API_BASE}/"
+            params = {
+                "ids": ",".join(container_ids),
+                "fields": "status_code",
+                "access_token": token,
+            }
+        try:
+            resp = await _graph_request(client, ig_user_id, "GET", url, paced=False, params=params)
+            if resp.is_error and is_rate_limit_error(resp):
+                # checked again once the account's pause is over
+                for container_id in container_ids:
+                    if container_id in self._waiting:
+                        self._waiting[container_id].next_check = time.monotonic()
+                return
+            resp.raise_for_status()
+            statuses = resp.json() if len(container_ids) > 1 else {container_ids[0]: resp.json()}
+            status_codes = {
+                container_id: statuses.get(container_id, {}).get("status_code")
+                for container_id in container_ids
+            }
+        except Exception as e:  # noqa: BLE001 - handed to the posts waiting on these containers
+            for container_id in container_ids:
+                self._settle(container_id, e)
+            return
 
-        if status_code == "FINISHED":
+        now = time.monotonic()
+        for container_id, status_code in status_codes.items():
+            waiter = self._waiting.get(container_id)
+            if waiter is None or waiter.future.done():
+                continue
+            if status_code == "FINISHED":
+                _observe_processing(waiter.kind, now - waiter.started)
+                self._settle(container_id)
+            elif status_code == "ERROR":
+                self._settle(
+                    container_id,
+                    RuntimeError(f"Instagram media processing failed for container {container_id}"),
+                )
+            else:
+                waiter.next_check = now + _next_wait(waiter, now)
+
+    def _settle(self, container_id: str, error: BaseException | None = None) -> None:
+        waiter = self._waiting.pop(container_id, None)
+        if waiter is None or waiter.future.done():
             return
-        if status_code == "ERROR":
-            raise RuntimeError(f"Instagram media processing failed for container {container_id}")
+        if error is None:
+            waiter.future.set_result(None)
+        else:
+            waiter.future.set_exception(error)
 
-    raise TimeoutError(
-        f"Container {container_id} did not finish processing within "
-        f"{_VIDEO_POLL_TIMEOUT_SECONDS}s"
-    )
+
+def _next_wait(waiter: _Waiter, now: float) -> float:
+    expected = _processing_seconds.get(waiter.kind)
+    elapsed = now - waiter.started
+    if expected is not None and elapsed + waiter.interval < expected:
+        return min(expected - elapsed, _POLL_MAX_INTERVAL_SECONDS)
+    wait = waiter.interval
+    waiter.interval = min(waiter.interval * _POLL_BACKOFF, _POLL_MAX_INTERVAL_SECONDS)
+    return wait
+
+
+def _observe_processing(kind: str, seconds: float) -> None:
+    previous = _processing_seconds.get(kind)
+    _processing_seconds[kind] = seconds if previous is None else 0.7 * previous + 0.3 * seconds
+
+
+async def _graph_request(
+    client: httpx.AsyncClient,
+    ig_user_id: str,
+    method: str,
+    url: str,
+    publish: bool = False,
+    paced: bool = True,
+    **kwargs: Any,
+) -> httpx.Response:
+    """A Graph API call made when the account's rate limit budget allows. A call rejected
+    for rate limiting waits until access is expected back and goes out again.
+
+    An unpaced call goes out right away and is returned whatever the outcome; the scheduler
+    only takes in the usage it reports.
+    """
+    scheduler = graph_api_scheduler()
+    attempts = 0
+    while True:
+        if paced:
+            await scheduler.acquire(ig_user_id, publish)
+        resp = await client.request(method, url, **kwargs)
+        attempts += 1
+        limited = scheduler.observe(ig_user_id, resp)
+        if not paced or not limited or attempts > _RATE_LIMIT_RETRIES:
+            return resp
+        print(f"Graph API rate limit reached for account {ig_user_id}, waiting to retry")
 
 
 async def _publish(
     client: httpx.AsyncClient, ig_user_id: str, token: str, container_id: str
 ) -> str:
-    resp = await client.post(
+    resp = await _graph_request(
+        client,
+        ig_user_id,
+        "POST",
         f"{_GRAPH_API_BASE}/{ig_user_id}/media_publish",
+        publish=True,
         params={"access_token": token},
         json={"creation_id": container_id},
     )
@@ -246,8 +668,13 @@ async def _publish(
     return str(resp.json()["id"])
 
 
-async def _get_permalink(client: httpx.AsyncClient, token: str, media_id: str) -> str:
-    resp = await client.get(
+async def _get_permalink(
+    client: httpx.AsyncClient, ig_user_id: str, token: str, media_id: str
+) -> str:
+    resp = await _graph_request(
+        client,
+        ig_user_id,
+        "GET",
         f"{_GRAPH_API_BASE}/{media_id}",
         params={"fields": "permalink", "access_token": token},
     )
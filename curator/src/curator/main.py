@@ -3,18 +3,21 @@ import os
 from datetime import datetime, timedelta, timezone
 
 import functions_framework
+import httpx
 import sentry_sdk
-from bov_data import DB, MongoClient, Sighting, Weather
+from bov_data import DB, MongoClient, Runtime, Sighting, Weather, get_runtime
 from dotenv import load_dotenv
 from flask import Request
 from markupsafe import escape
 from sentry_sdk.integrations.asyncio import enable_asyncio_integration
 from sentry_sdk.integrations.gcp import GcpIntegration
 
+from curator.image_payload import payload_from_env
 from curator.images import curate_images
 from curator.instagram import post_sighting
-from curator.videos import curate_videos
+from curator.videos import curate_videos, workspace_reserve_bytes
 from curator.weather import get_weather
+from curator.workspace import workspaces
 
 if os.getenv("APP_ENV") == "prod":
     sentry_sdk.init(
@@ -33,14 +36,27 @@ def import_sighting(request: Request) -> str:
     if not json:
         return "request missing json body"
 
-    sentry_sdk.set_context("sighting", json)
     sighting = Sighting(**json)
-    return asyncio.run(main(sighting))
+    return _runtime().run(_import(sighting, json))
+
+
+def _runtime() -> Runtime:
+    return get_runtime(setup=enable_asyncio_integration)
+
+
+async def _import(sighting: Sighting, context: dict) -> str:
+    # runs on the runtime's loop thread, so the request thread's scope doesn't reach it
+    with sentry_sdk.isolation_scope():
+        sentry_sdk.set_context("sighting", context)
+        return await main(sighting)
 
 
 async def main(sighting: Sighting) -> str:
-    enable_asyncio_integration()
-    db: DB = MongoClient(os.environ["MONGODB_URI"])
+    runtime = _runtime()
+    db: DB = runtime.client("mongo", lambda: MongoClient(os.environ["MONGODB_URI"]))
+    http: httpx.AsyncClient = runtime.client(
+        "http", lambda: httpx.AsyncClient(timeout=30.0, follow_redirects=True)
+    )
 
     sighting_exists = await db.exists_sighting(sighting.bb_id)
     if sighting_exists:
@@ -51,15 +67,28 @@ async def main(sighting: Sighting) -> str:
         return "sighting not imported: too many squirrels"
 
     assert sighting.created_at is not None, "sighting must have a created_at"
-    weather = await get_weather(sighting.location_zip, sighting.created_at)
+    coordinates = (
+        (sighting.latitude, sighting.longitude)
+        if sighting.latitude is not None and sighting.longitude is not None
+        else None
+    )
+    weather = await get_weather(
+        sighting.location_zip, sighting.created_at, client=http, db=db, coordinates=coordinates
+    )
     sighting.weather = Weather(**weather)
 
     assert sighting.media is not None, "sighting must have media"
-    image_urls, video_path = await asyncio.gather(
-        curate_images(sighting.media.images), curate_videos(sighting.media.videos)
-    )
-
-    image_permalink, video_permalink = await post_sighting(sighting, image_urls, video_path)
+    # the curated video lives in the workspace until it has been posted
+    reserve_bytes = workspace_reserve_bytes(sighting.media.videos)
+    async with workspaces().workspace("sighting", reserve_bytes) as workspace:
+        image_urls, video_path = await asyncio.gather(
+            curate_images(sighting.media.images, http=http, payload=payload_from_env()),
+            curate_videos(sighting.media.videos, client=http, workspace=workspace),
+        )
+
+        image_permalink, video_permalink = await post_sighting(
+            sighting, image_urls, video_path, client=http
+        )
 
     # TODO: once we post all the videos to IG, we can get rid of these fields from DB altogether
     sighting.media.images = []
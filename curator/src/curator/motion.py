@@ -0,0 +1,422 @@
+"""Motion detection for sighting videos.
+
+Finds the time ranges where something moves in front of the feeder. ``full`` runs the
+detector on every full-resolution frame. ``fast`` runs it on downscaled grayscale frames
+and skips ahead while nothing is moving; ``MotionTracker`` is that detector fed one frame
+at a time, so frames can come from a file or from a stream that is still downloading.
+``packets`` first reads the compressed frame sizes, which grow when the picture changes,
+and only decodes the stretches whose bitrate stands out for ``fast`` to check.
+
+Every strategy records a ``MotionProfile``, the largest moving area of each frame it
+analysed, and segments are derived from that; ``segments_from_profile`` redoes it for other
+thresholds in milliseconds, without decoding the video again.
+"""
+
+import itertools
+import os
+from dataclasses import dataclass
+from typing import Literal, cast, get_args
+
+import cv2
+import numpy as np
+
+from curator.video_ffmpeg import packet_sizes
+
+MotionDetection = Literal["fast", "full", "packets"]
+Segment = tuple[float, float]
+
+# ---------------- CONFIG ----------------
+FRAME_SKIP = 1
+MERGE_GAP_SECONDS = 1.5
+MIN_MOTION_AREA = 8000
+NO_MOTION_FRAMES_REQUIRED = 5  # 3–10 is typical
+# fast detection: analysis width, and every how many frames to look while nothing moves
+FAST_WIDTH = 320
+FAST_STILL_STEP = 6
+# packets detection: longest window, how far above the quiet bitrate a window has to be
+# before it is decoded (false alarms only cost decoding time, misses lose the bird), and
+# how much earlier decoding starts
+ACTIVITY_WINDOW_SECONDS = 2.0
+ACTIVE_BITRATE_RATIO = 1.05
+ACTIVITY_PREROLL_SECONDS = 1.0
+# ----------------------------------------
+_MOG2_HISTORY = 500
+
+
+@dataclass(frozen=True, eq=False)
+class MotionProfile:
+    """The largest moving area, in source pixels, of every analysed frame.
+
+    Frames come in runs, stretches analysed in one go with a fresh background model;
+    ``runs`` holds the index of each run's first frame.
+    """
+
+    fps: float
+    times: np.ndarray
+    areas: np.ndarray
+    runs: np.ndarray
+
+    @classmethod
+    def concat(cls, fps: float, profiles: list["MotionProfile"]) -> "MotionProfile":
+        """One profile of the runs of ``profiles``, in order."""
+        offsets = np.cumsum([0] + [len(profile.times) for profile in profiles[:-1]])
+        return cls(
+            fps,
+            np.concatenate([np.zeros(0)] + [profile.times for profile in profiles]),
+            np.concatenate([np.zeros(0)] + [profile.areas for profile in profiles]),
+            np.concatenate(
+                [np.zeros(0, np.int64)]
+                + [profile.runs + offset for profile, offset in zip(profiles, offsets)]
+            ),
+        )
+
+
+def detection_from_env() -> MotionDetection:
+    """The strategy set by ``MOTION_DETECTION``, defaulting to ``fast``."""
+    detection = os.getenv("MOTION_DETECTION") or "fast"
+    if detection not in get_args(MotionDetection):
+        raise ValueError(f"Unknown MOTION_DETECTION {detection!r}")
+    return cast(MotionDetection, detection)
+
+
+def detect_motion_segments(
+    file_path: str, detection: MotionDetection = "fast"
+) -> tuple[list[Segment], float]:
+    """Motion segments in seconds, with close segments merged, and the video's frame rate."""
+    profile = motion_profile(file_path, detection)
+    return segments_from_profile(profile), profile.fps
+
+
+def motion_profile(file_path: str, detection: MotionDetection = "fast") -> MotionProfile:
+    """Decode ``file_path`` and record how much moves in it.
+
+    Frame times come from the container timestamps, so variable frame rate sources don't
+    need converting first.
+    """
+    cap = cv2.VideoCapture(file_path)
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    try:
+        if detection == "full":
+            return _full_motion_profile(cap, fps)
+        if detection == "packets":
+            return _packet_motion_profile(file_path, cap, fps)
+        return _fast_motion_profile(cap, fps)
+    finally:
+        cap.release()
+
+
+def segments_from_profile(
+    profile: MotionProfile,
+    min_area: float = MIN_MOTION_AREA,
+    merge_gap: float = MERGE_GAP_SECONDS,
+) -> list[Segment]:
+    """Merged motion segments where the largest moving area reaches ``min_area``.
+
+    With other thresholds than the defaults the result is the same as detecting again,
+    except that ``fast`` only sampled every ``FAST_STILL_STEP``th frame where nothing moved
+    enough for the defaults, so a start found there may be up to a step early.
+    """
+    bounds = [*profile.runs.tolist(), len(profile.times)]
+    segments: list[Segment] = []
+    for first, end in itertools.pairwise(bounds):
+        segmenter = _Segmenter(profile.fps, min_area)
+        for time_sec, area in zip(
+            profile.times[first:end].tolist(), profile.areas[first:end].tolist()
+        ):
+            segmenter.add(time_sec, area)
+        segments += segmenter.segments()
+    return merge_segments(segments, merge_gap)
+
+
+def merge_segments(segments: list[Segment], merge_gap: float = MERGE_GAP_SECONDS) -> list[Segment]:
+    """Join segments separated by at most ``merge_gap`` seconds."""
+    merged: list[Segment] = []
+    for start, end in segments:
+        if merged and start - merged[-1][1] <= merge_gap:
+            merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def active_spans(packets: list[tuple[float, int, bool]]) -> list[Segment]:
+    """Time ranges worth decoding, from ``(time, bytes, keyframe)`` packets.
+
+    Windows run from one keyframe to the next (cut at ``ACTIVITY_WINDOW_SECONDS``), so each
+    has the same mix of frame types; keyframes themselves are left out since their size
+    says nothing about motion. A window is active when its mean packet size is
+    ``ACTIVE_BITRATE_RATIO`` above the clip's quiet level, the lower quartile of windows.
+    Spans start ``ACTIVITY_PREROLL_SECONDS`` early so the detector sees the background
+    before the subject arrives.
+    """
+    windows: list[tuple[float, float, list[int]]] = []
+    for time_sec, size, key in sorted(packets):
+        if not windows or key or time_sec - windows[-1][0] >= ACTIVITY_WINDOW_SECONDS:
+            windows.append((time_sec, time_sec, []))
+        start, _, sizes = windows[-1]
+        if not key:
+            sizes.append(size)
+        windows[-1] = (start, time_sec, sizes)
+    means = [(start, end, sum(sizes) / len(sizes)) for start, end, sizes in windows if sizes]
+    if not means:
+        return []
+    quiet = float(np.percentile([mean for _, _, mean in means], 25))
+
+    spans: list[Segment] = []
+    for start, end, mean in means:
+        if mean < quiet * ACTIVE_BITRATE_RATIO:
+            continue
+        start = max(0.0, start - ACTIVITY_PREROLL_SECONDS)
+        if spans and start <= spans[-1][1]:
+            spans[-1] = (spans[-1][0], end)
+        else:
+            spans.append((start, end))
+    return spans
+
+
+def fast_size(width: int, height: int) -> tuple[int, int]:
+    """Frame size the fast detector analyses for a ``width`` x ``height`` source."""
+    scale = min(1.0, FAST_WIDTH / width)
+    return round(width * scale), round(height * scale)
+
+
+class MotionTracker:
+    """The fast detector, fed downscaled grayscale frames in order.
+
+    While nothing moves only every ``FAST_STILL_STEP``th frame needs analysing
+    (``wants_frame``); once motion is seen every frame is analysed until the segment ends,
+    so segment ends are as precise as the full mode and starts are at most one step early.
+    """
+
+    def __init__(self, fps: float, source_width: int, analysed_width: int):
+        self.fps = fps
+        # analysed pixels per source pixel
+        self._area_scale = (analysed_width / source_width) ** 2
+        self._bg_subtractor = cv2.createBackgroundSubtractorMOG2(
+            history=_MOG2_HISTORY, varThreshold=50, detectShadows=True
+        )
+        self._kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+        self._segmenter = _Segmenter(fps)
+        self._times: list[float] = []
+        self._areas: list[float] = []
+        self._frames_seen = 0
+        self._frames_since_analysis = 0
+
+    def wants_frame(self) -> bool:
+        """Whether the next frame should be passed to ``analyse``; call ``skip`` if not."""
+        return self.in_motion or self._frames_since_analysis >= (FAST_STILL_STEP - 1)
+
+    @property
+    def in_motion(self) -> bool:
+        return self._segmenter.in_motion
+
+    def skip(self, time_sec: float) -> None:
+        self._frames_seen += 1
+        self._frames_since_analysis += 1
+
+    def analyse(self, time_sec: float, gray: np.ndarray) -> None:
+        self._frames_seen += 1
+        self._frames_since_analysis += 1
+
+        blur = cv2.GaussianBlur(gray, (3, 3), 0)
+        # learn as much from one frame as the full mode would from all the skipped ones,
+        # otherwise a bird that left keeps being part of the background model
+        # (MOG2's default rate is 1 / min(2 * frames seen, history))
+        learning_rate = min(
+            1.0, self._frames_since_analysis / min(2 * self._frames_seen, _MOG2_HISTORY)
+        )
+        fg_mask = self._bg_subtractor.apply(blur, learningRate=learning_rate)
+        self._frames_since_analysis = 0
+        fg_mask = cv2.threshold(fg_mask, 200, 255, cv2.THRESH_BINARY)[1]
+        fg_mask = cv2.dilate(fg_mask, self._kernel)
+
+        # largest blob in one vectorized pass instead of a Python loop over contours; holes
+        # are filled first because contourArea measures everything inside the outline, and
+        # a bird that stays put often only shows up as its moving edges
+        count, _, stats, _ = cv2.connectedComponentsWithStats(_fill_holes(fg_mask), connectivity=8)
+        largest = float(stats[1:, cv2.CC_STAT_AREA].max()) if count > 1 else 0.0
+        area = largest / self._area_scale
+
+        self._times.append(time_sec)
+        self._areas.append(area)
+        self._segmenter.add(time_sec, area)
+
+    def segments(self) -> list[Segment]:
+        """Segments so far, closing one still in progress at the last frame; not merged."""
+        return self._segmenter.segments()
+
+    def profile(self) -> MotionProfile:
+        """The frames analysed so far, as one run."""
+        return MotionProfile(
+            self.fps,
+            np.array(self._times, np.float64),
+            np.array(self._areas, np.float64),
+            np.zeros(1 if self._times else 0, np.int64),
+        )
+
+
+class _Segmenter:
+    """Opens a segment at the first frame whose largest moving area reaches ``min_area``
+    and closes it after ``NO_MOTION_FRAMES_REQUIRED`` analysed frames without."""
+
+    def __init__(self, fps: float, min_area: float = MIN_MOTION_AREA):
+        self.fps = fps
+        self.min_area = min_area
+        self._segments: list[Segment] = []
+        self._current_start: float | None = None
+        self._last_motion_time = 0.0
+        self._previous_time: float | None = None
+        self._no_motion_frames = 0
+
+    @property
+    def in_motion(self) -> bool:
+        return self._current_start is not None
+
+    def add(self, time_sec: float, area: float) -> None:
+        if area >= self.min_area:
+            self._no_motion_frames = 0
+            self._last_motion_time = time_sec
+            if self._current_start is None:
+                # motion began somewhere since the last analysed frame
+                self._current_start = (
+                    time_sec if self._previous_time is None else self._previous_time + 1 / self.fps
+                )
+        else:
+            self._no_motion_frames += 1
+            if (
+                self._current_start is not None
+                and self._no_motion_frames >= NO_MOTION_FRAMES_REQUIRED
+            ):
+                self._segments.append((self._current_start, self._last_motion_time))
+                self._current_start = None
+
+        self._previous_time = time_sec
+
+    def segments(self) -> list[Segment]:
+        # every frame is analysed while in motion, so the last one analysed is the last one
+        segments = list(self._segments)
+        if self._current_start is not None and self._previous_time is not None:
+            segments.append((self._current_start, self._previous_time + 1 / self.fps))
+        return segments
+
+
+def _full_motion_profile(cap: cv2.VideoCapture, fps: float) -> MotionProfile:
+    bg_subtractor = cv2.createBackgroundSubtractorMOG2(
+        history=_MOG2_HISTORY, varThreshold=50, detectShadows=True
+    )
+
+    times = []
+    areas = []
+    frame_idx = 0
+
+    while cap.isOpened():
+        ret, frame = cap.read()
+        if not ret:
+            break
+        time_sec = cap.get(cv2.CAP_PROP_POS_MSEC) / 1000
+
+        if frame_idx % FRAME_SKIP == 0:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            blur = cv2.GaussianBlur(gray, (5, 5), 0)
+
+            fg_mask = bg_subtractor.apply(blur)
+
+            # Clean up noise
+            fg_mask = cv2.threshold(fg_mask, 200, 255, cv2.THRESH_BINARY)[1]
+            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+            fg_mask = cv2.dilate(fg_mask, kernel, iterations=2)
+
+            contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+            times.append(time_sec)
+            areas.append(max((cv2.contourArea(cnt) for cnt in contours), default=0.0))
+
+        frame_idx += 1
+
+    return MotionProfile(
+        fps,
+        np.array(times, np.float64),
+        np.array(areas, np.float64),
+        np.zeros(1 if times else 0, np.int64),
+    )
+
+
+def _fast_motion_profile(
+    cap: cv2.VideoCapture, fps: float, until: float | None = None
+) -> MotionProfile:
+    """From the current position to the end, or to ``until`` seconds unless motion is still
+    going on there. Frames the tracker skips are only grabbed, never converted or resized."""
+    tracker: MotionTracker | None = None
+    size = (0, 0)
+
+    while cap.isOpened():
+        if (
+            until is not None
+            and cap.get(cv2.CAP_PROP_POS_MSEC) / 1000 >= until
+            and not (tracker and tracker.in_motion)
+        ):
+            break
+        if tracker is not None and not tracker.wants_frame():
+            if not cap.grab():
+                break
+            tracker.skip(cap.get(cv2.CAP_PROP_POS_MSEC) / 1000)
+            continue
+
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if tracker is None:
+            height, width = frame.shape[:2]
+            size = fast_size(width, height)
+            tracker = MotionTracker(fps, width, size[0])
+
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        tracker.analyse(
+            cap.get(cv2.CAP_PROP_POS_MSEC) / 1000, cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        )
+
+    return tracker.profile() if tracker is not None else MotionProfile.concat(fps, [])
+
+
+def _packet_motion_profile(file_path: str, cap: cv2.VideoCapture, fps: float) -> MotionProfile:
+    packets = packet_sizes(file_path)
+    spans = active_spans(packets)
+    duration = max((time_sec for time_sec, _, _ in packets), default=0.0)
+    if sum(end - start for start, end in spans) >= duration * 0.8:
+        # little to skip, or no quiet level to compare with
+        return _fast_motion_profile(cap, fps)
+
+    # the quiet level is only meaningful if the quietest stretch really is still; in a clip
+    # that is busy throughout, every window looks alike
+    quietest = _quietest_gap(spans, duration)
+    cap.set(cv2.CAP_PROP_POS_MSEC, quietest[0] * 1000)
+    if segments_from_profile(_fast_motion_profile(cap, fps, until=quietest[1])):
+        cap.set(cv2.CAP_PROP_POS_MSEC, 0)
+        return _fast_motion_profile(cap, fps)
+
+    profiles = []
+    for start, end in spans:
+        cap.set(cv2.CAP_PROP_POS_MSEC, start * 1000)
+        profiles.append(_fast_motion_profile(cap, fps, until=end))
+    return MotionProfile.concat(fps, profiles)
+
+
+def _quietest_gap(spans: list[Segment], duration: float) -> Segment:
+    """The longest stretch outside ``spans``, at most a few seconds of it."""
+    gaps = []
+    previous_end = 0.0
+    for start, end in [*spans, (duration, duration)]:
+        if start > previous_end:
+            gaps.append((previous_end, start))
+        previous_end = max(previous_end, end)
+    start, end = max(gaps, key=lambda gap: gap[1] - gap[0])
+    return start, min(end, start + 2 * ACTIVITY_WINDOW_SECONDS)
+
+
+def _fill_holes(mask: np.ndarray) -> np.ndarray:
+    outside = cv2.copyMakeBorder(mask, 1, 1, 1, 1, cv2.BORDER_CONSTANT, value=0)
+    cv2.floodFill(outside, None, (0, 0), 255)
+    # whatever the flood from the border didn't reach is enclosed by foreground
+    holes = cv2.bitwise_not(outside)[1:-1, 1:-1]
+    filled: np.ndarray = cv2.bitwise_or(mask, holes)
+    return filled
@@ -0,0 +1,105 @@
+"""Motion profiles of videos already analysed, kept on disk.
+
+Detecting motion decodes the whole video, while turning its ``MotionProfile`` into segments
+takes milliseconds. Profiles are stored under the SHA-256 of the video and the detection
+strategy, so curating the same upload again, after a failed post or with other thresholds,
+skips the decode. Each is a few kilobytes of compressed ``.npz``; beyond
+``MOTION_CACHE_MAX_ENTRIES`` the least recently used are dropped.
+"""
+
+import hashlib
+import os
+import tempfile
+import zipfile
+
+import numpy as np
+
+from curator.motion import MotionDetection, MotionProfile, motion_profile
+
+MOTION_CACHE_MAX_ENTRIES = 500
+# bump when a change to detection changes what a profile holds
+_PROFILE_VERSION = 1
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def cache_dir() -> str:
+    """``MOTION_CACHE_DIR``, or a directory in the system temp dir."""
+    return os.getenv("MOTION_CACHE_DIR") or os.path.join(
+        tempfile.gettempdir(), "curator-motion-profiles"
+    )
+
+
+def video_hash(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        while chunk := f.read(_HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_motion_profile(
+    file_path: str, detection: MotionDetection = "fast", file_hash: str | None = None
+) -> MotionProfile:
+    """``motion_profile``, from the cache when this video was analysed the same way before.
+    ``file_hash`` saves hashing the file again when the caller already has it."""
+    path = _profile_path(file_hash or video_hash(file_path), detection)
+    profile = _load(path)
+    if profile is None:
+        profile = motion_profile(file_path, detection)
+        _save(path, profile)
+    return profile
+
+
+def save_motion_profile(file_hash: str, detection: MotionDetection, profile: MotionProfile) -> None:
+    """Cache a profile found some other way, such as while the video downloaded."""
+    _save(_profile_path(file_hash, detection), profile)
+
+
+def _profile_path(file_hash: str, detection: MotionDetection) -> str:
+    return os.path.join(cache_dir(), f"{file_hash}-{detection}-v{_PROFILE_VERSION}.npz")
+
+
+def _load(path: str) -> MotionProfile | None:
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            profile = MotionProfile(float(data["fps"]), data["times"], data["areas"], data["runs"])
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile) as e:
+        print(f"Ignoring unreadable motion profile {path}: {e}")
+        return None
+    return profile
+
+
+def _save(path: str, profile: MotionProfile) -> None:
+    directory = os.path.dirname(path)
+    try:
+        os.makedirs(directory, exist_ok=True)
+        # written aside and renamed, so a concurrent job never reads half a file
+        fd, temp_path = tempfile.mkstemp(suffix=".npz.tmp", dir=directory)
+        with os.fdopen(fd, "wb") as f:
+            np.savez_compressed(
+                f, fps=profile.fps, times=profile.times, areas=profile.areas, runs=profile.runs
+            )
+        os.replace(temp_path, path)
+    except OSError as e:
+        print(f"Could not cache motion profile {path}: {e}")
+        return
+    _prune(directory)
+
+
+def _prune(directory: str) -> None:
+    entries = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".npz"):
+            try:
+                entries.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass
+    entries.sort()
+    for _, path in entries[: max(0, len(entries) - MOTION_CACHE_MAX_ENTRIES)]:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,265 @@
+"""Pace Instagram Graph API calls to stay inside Meta's rate limits.
+
+Responses report usage in percent of Meta's limits, for the app in ``X-App-Usage`` and for
+the account in ``X-Business-Use-Case-Usage``. Since Meta counts across every instance, those
+headers drive the pacing: as usage climbs an account's calls are spaced further apart, and
+near the limit, or once a call is rejected for rate limiting, they stop until Meta expects
+access back. Calls wait their turn instead of failing.
+
+A long-running process such as a backfill can also hold itself to a budget of its own: with
+``INSTAGRAM_CALLS_PER_HOUR`` or ``INSTAGRAM_PUBLISHES_PER_DAY`` set, or the limits passed in,
+the account gets token buckets of calls and publishes as well.
+"""
+
+import asyncio
+import json
+import os
+import time
+from dataclasses import dataclass
+
+import httpx
+from bov_data import get_runtime
+
+# how many calls may go out back to back when a calls-per-hour budget is set (a sighting
+# with a full carousel and a reel takes about 30)
+CALL_BURST = 50
+# reported usage, in percent, from which calls are spaced out, and at which they stop
+USAGE_SLOW_PERCENT = 75
+USAGE_PAUSE_PERCENT = 95
+# time between calls just short of the pause, growing from none at the slow-down
+_MAX_CALL_SPACING_SECONDS = 10.0
+# how long to stop when Meta doesn't say when access comes back
+_DEFAULT_PAUSE_SECONDS = 60.0
+# reported usage covers the last hour, so an old report counts for less and less
+_USAGE_WINDOW_SECONDS = 3600.0
+# Graph API error codes for rate limiting; code 4 with subcode 2207051 is the spam error
+_RATE_LIMIT_CODES = {4, 17, 32, 613, 80002}
+_SPAM_SUBCODE = 2207051
+
+
+@dataclass
+class _Bucket:
+    capacity: float
+    per_second: float
+    tokens: float
+    updated: float
+
+    def refill(self, now: float) -> None:
+        elapsed = now - self.updated
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.per_second)
+        self.updated = now
+
+    def wait_seconds(self) -> float:
+        """How long until a token is free."""
+        return max(0.0, (1 - self.tokens) / self.per_second)
+
+
+@dataclass
+class _Account:
+    # only when the process keeps a budget of its own
+    calls: _Bucket | None
+    publishes: _Bucket | None
+    usage_percent: float = 0.0
+    usage_reported: float = 0.0
+    paused_until: float = 0.0
+    last_call: float = float("-inf")
+
+    def usage(self, now: float) -> float:
+        age = now - self.usage_reported
+        return self.usage_percent * max(0.0, 1 - age / _USAGE_WINDOW_SECONDS)
+
+
+@dataclass
+class SchedulerStats:
+    calls: int = 0
+    # calls that had to wait for their turn, and for how long altogether
+    waited: int = 0
+    waited_seconds: float = 0.0
+    # calls Meta rejected for rate limiting
+    rate_limited: int = 0
+
+
+class GraphApiScheduler:
+    def __init__(
+        self,
+        calls_per_hour: float | None = None,
+        publishes_per_day: float | None = None,
+        call_burst: float = CALL_BURST,
+    ):
+        calls_env = os.getenv("INSTAGRAM_CALLS_PER_HOUR")
+        publishes_env = os.getenv("INSTAGRAM_PUBLISHES_PER_DAY")
+        self.calls_per_hour = calls_per_hour or (float(calls_env) if calls_env else None)
+        self.publishes_per_day = publishes_per_day or (
+            float(publishes_env) if publishes_env else None
+        )
+        self.call_burst = call_burst
+        self.stats = SchedulerStats()
+        self._accounts: dict[str, _Account] = {}
+        self._queues: dict[tuple[str, str], tuple[asyncio.AbstractEventLoop, asyncio.Lock]] = {}
+
+    async def acquire(self, account: str, publish: bool = False) -> None:
+        """Wait until ``account`` may make a call, in the order callers arrived."""
+        waited = 0.0
+        if publish and self.publishes_per_day:
+            # publishes line up on their own, so one waiting for the daily limit doesn't
+            # hold up the status checks of posts in flight
+            async with self._queue(account, "publishes"):
+                waited += await self._take(account, publish=True)
+        async with self._queue(account, "calls"):
+            waited += await self._take(account, publish=False)
+
+        self.stats.calls += 1
+        if waited:
+            self.stats.waited += 1
+            self.stats.waited_seconds += waited
+
+    def observe(self, account: str, response: httpx.Response) -> bool:
+        """Take in the usage a response reports. Returns whether the call was rejected for
+        rate limiting, in which case the account stops until access is expected back."""
+        budget = self._account(account)
+        now = time.monotonic()
+        app_usage = _max_usage(_json_header(response, "x-app-usage"))
+        account_usage, regain_seconds = _business_usage(
+            _json_header(response, "x-business-use-case-usage")
+        )
+        reported = [usage for usage in (app_usage, account_usage) if usage is not None]
+        if reported:
+            budget.usage_percent = max(reported)
+            budget.usage_reported = now
+
+        limited = response.is_error and is_rate_limit_error(response)
+        if limited:
+            self.stats.rate_limited += 1
+        if limited or budget.usage(now) >= USAGE_PAUSE_PERCENT or regain_seconds:
+            pause = regain_seconds or _DEFAULT_PAUSE_SECONDS
+            budget.paused_until = max(budget.paused_until, now + pause)
+        return limited
+
+    def paused_seconds(self, account: str) -> float:
+        """How long the account's calls are still stopped for."""
+        return max(0.0, self._account(account).paused_until - time.monotonic())
+
+    def utilisation(self, account: str) -> dict:
+        """How much of the account's budget is in use: the share of each bucket spent (None
+        without a budget of its own), the usage Meta last reported in percent, and how long
+        calls are still paused."""
+        budget = self._account(account)
+        now = time.monotonic()
+        spent = {}
+        for name, bucket in (("calls", budget.calls), ("publishes", budget.publishes)):
+            if bucket is not None:
+                bucket.refill(now)
+            spent[name] = None if bucket is None else 1 - bucket.tokens / bucket.capacity
+        return {
+            **spent,
+            "reported_usage_percent": budget.usage(now),
+            "paused_seconds": self.paused_seconds(account),
+        }
+
+    def _account(self, account: str) -> _Account:
+        if account not in self._accounts:
+            now = time.monotonic()
+            calls = publishes = None
+            if self.calls_per_hour:
+                calls = _Bucket(self.call_burst, self.calls_per_hour / 3600, self.call_burst, now)
+            if self.publishes_per_day:
+                publishes = _Bucket(
+                    self.publishes_per_day,
+                    self.publishes_per_day / 86400,
+                    self.publishes_per_day,
+                    now,
+                )
+            self._accounts[account] = _Account(calls, publishes)
+        return self._accounts[account]
+
+    async def _take(self, account: str, publish: bool) -> float:
+        """Wait for the account's turn to call, or to publish, and take it. Returns the
+        seconds waited."""
+        budget = self._account(account)
+        waited = 0.0
+        while True:
+            now = time.monotonic()
+            if publish:
+                bucket, wait = budget.publishes, 0.0
+            else:
+                bucket = budget.calls
+                spacing = _call_spacing(budget.usage(now))
+                wait = max(budget.paused_until, budget.last_call + spacing) - now
+            if bucket is not None:
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_seconds())
+            if wait <= 0:
+                if bucket is not None:
+                    bucket.tokens -= 1
+                if not publish:
+                    budget.last_call = now
+                return waited
+            waited += wait
+            await asyncio.sleep(wait)
+
+    def _queue(self, account: str, bucket: str) -> asyncio.Lock:
+        # asyncio primitives belong to one loop; scripts and tests may use several
+        loop = asyncio.get_running_loop()
+        queue = self._queues.get((account, bucket))
+        if queue is None or queue[0] is not loop:
+            queue = self._queues[(account, bucket)] = (loop, asyncio.Lock())
+        return queue[1]
+
+
+def graph_api_scheduler() -> GraphApiScheduler:
+    """The process-wide Graph API scheduler."""
+    return get_runtime().client("graph_api_scheduler", GraphApiScheduler)
+
+
+def _call_spacing(usage_percent: float) -> float:
+    """Seconds between an account's calls at ``usage_percent`` of Meta's limits."""
+    if usage_percent <= USAGE_SLOW_PERCENT:
+        return 0.0
+    share = (usage_percent - USAGE_SLOW_PERCENT) / (USAGE_PAUSE_PERCENT - USAGE_SLOW_PERCENT)
+    return _MAX_CALL_SPACING_SECONDS * min(1.0, share)
+
+
+def _json_header(response: httpx.Response, name: str) -> object:
+    try:
+        return json.loads(response.headers.get(name, "null"))
+    except ValueError:
+        return None
+
+
+def _max_usage(usage: object) -> float | None:
+    """The highest of the percentages in a usage object such as ``{"call_count": 28, ...}``."""
+    if not isinstance(usage, dict):
+        return None
+    percentages = [
+        float(value)
+        for key, value in usage.items()
+        if key in ("call_count", "total_time", "total_cputime", "acc_id_util_pct")
+        and isinstance(value, int | float)
+    ]
+    return max(percentages, default=None)
+
+
+def _business_usage(usage: object) -> tuple[float | None, float]:
+    """Highest usage in ``X-Business-Use-Case-Usage``, and the seconds until access comes
+    back (zero unless the account is being throttled)."""
+    if not isinstance(usage, dict):
+        return None, 0.0
+    entries = [
+        entry for entries in usage.values() if isinstance(entries, list) for entry in entries
+    ]
+    percentages = [p for p in (_max_usage(entry) for entry in entries) if p is not None]
+    regain_minutes = [
+        float(entry.get("estimated_time_to_regain_access") or 0)
+        for entry in entries
+        if isinstance(entry, dict)
+    ]
+    return max(percentages, default=None), 60 * max(regain_minutes, default=0.0)
+
+
+def is_rate_limit_error(response: httpx.Response) -> bool:
+    try:
+        error = response.json().get("error", {})
+    except (ValueError, AttributeError):
+        return response.status_code == 429
+    code, subcode = error.get("code"), error.get("error_subcode")
+    return response.status_code == 429 or (code in _RATE_LIMIT_CODES and subcode != _SPAM_SUBCODE)
@@ -0,0 +1,385 @@
+"""Cut motion segments out of a video with a single ffmpeg pass.
+
+When every segment starts on (or just after) a keyframe the segments are stream-copied
+through the concat demuxer, which costs no encode at all. Otherwise they are trimmed and
+concatenated in one filter graph and encoded once, or, with several encode workers, split
+into chunks that are encoded side by side and then joined without re-encoding the video.
+"""
+
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+import imageio_ffmpeg
+
+from curator.video_pool import default_workers
+
+# a segment may start up to this much earlier than detected so it lands on a keyframe
+KEYFRAME_SNAP_SECONDS = 0.5
+# parallel encoding never makes chunks shorter than this
+MIN_CHUNK_SECONDS = 2.0
+
+
+@dataclass
+class VideoProbe:
+    keyframes: list[float] = field(default_factory=list)
+    has_audio: bool = False
+    width: int = 0
+    height: int = 0
+    fps: float = 0.0
+
+
+@dataclass(frozen=True)
+class EncoderSettings:
+    preset: str = "medium"
+    crf: int = 23
+    # libx264 threads per encode; 0 gives a single pass the job's cores and splits them
+    # evenly between chunk workers (libx264's own 0 would take every core on the host)
+    threads: int = 0
+    # chunks encoded at once; 1 encodes everything in a single pass
+    workers: int = 1
+
+    def threads_per_worker(self) -> int:
+        return self.threads or max(1, job_cpus() // self.workers)
+
+    def single_pass_threads(self) -> int:
+        return self.threads or job_cpus()
+
+
+def job_cpus() -> int:
+    """The cores one video job may use, with the video pool running its jobs side by side."""
+    return max(1, (os.cpu_count() or 1) // default_workers())
+
+
+def encoder_from_env() -> EncoderSettings:
+    """Settings from ``VIDEO_PRESET``, ``VIDEO_CRF``, ``VIDEO_ENCODE_THREADS`` and
+    ``VIDEO_ENCODE_WORKERS``, the last defaulting to one worker per core of the job."""
+    defaults = EncoderSettings()
+    return EncoderSettings(
+        preset=os.getenv("VIDEO_PRESET") or defaults.preset,
+        crf=int(os.getenv("VIDEO_CRF") or defaults.crf),
+        threads=int(os.getenv("VIDEO_ENCODE_THREADS") or defaults.threads),
+        workers=int(os.getenv("VIDEO_ENCODE_WORKERS") or job_cpus()),
+    )
+
+
+def ffmpeg_exe() -> str:
+    """ffmpeg from PATH, or the binary bundled with imageio-ffmpeg (a moviepy dependency)."""
+    return shutil.which("ffmpeg") or imageio_ffmpeg.get_ffmpeg_exe()
+
+
+def probe(file_path: str) -> VideoProbe:
+    """Keyframe timestamps and whether there is an audio stream, decoding keyframes only."""
+    result = subprocess.run(
+        [
+            ffmpeg_exe(),
+            "-hide_banner",
+            "-skip_frame",
+            "nokey",
+            "-i",
+            file_path,
+            "-map",
+            "0:v:0",
+            "-vf",
+            "showinfo",
+            "-f",
+            "null",
+            "-",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    keyframes = [float(t) for t in re.findall(r"pts_time:([\d.]+)", result.stderr)]
+    has_audio = re.search(r"Stream #0:\d+.*: Audio:", result.stderr) is not None
+    video = re.search(r"Stream #0:\d+.*: Video: .*?, (\d+)x(\d+).*?, ([\d.]+) fps", result.stderr)
+    return VideoProbe(
+        keyframes=keyframes,
+        has_audio=has_audio,
+        width=int(video.group(1)) if video else 0,
+        height=int(video.group(2)) if video else 0,
+        fps=float(video.group(3)) if video else 0.0,
+    )
+
+
+def packet_sizes(file_path: str) -> list[tuple[float, int, bool]]:
+    """``(time, bytes, keyframe)`` for every video packet, without decoding anything."""
+    result = subprocess.run(
+        [
+            ffmpeg_exe(),
+            "-hide_banner",
+            "-loglevel",
+            "error",
+            "-i",
+            file_path,
+            "-map",
+            "0:v:0",
+            "-c",
+            "copy",
+            "-f",
+            "framecrc",
+            "-",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    time_base = re.search(r"^#tb 0: (\d+)/(\d+)", result.stdout, re.MULTILINE)
+    scale = int(time_base.group(1)) / int(time_base.group(2)) if time_base else 1.0
+    return [
+        _framecrc_packet(line, scale)
+        for line in result.stdout.splitlines()
+        if not line.startswith("#")
+    ]
+
+
+def _framecrc_packet(line: str, scale: float) -> tuple[float, int, bool]:
+    """``(time, bytes, keyframe)`` from a framecrc line: stream, dts, pts, duration, size,
+    crc, then optionally ``F=flags`` (left out when just "key") and ``S=side data``."""
+    fields = [f.strip() for f in line.split(",")]
+    flags = next((f.removeprefix("F=") for f in fields[6:] if f.startswith("F=")), None)
+    key = flags is None or bool(int(flags, 16) & 1)
+    return int(fields[2]) * scale, int(fields[4]), key
+
+
+def plan_cut(
+    segments: list[tuple[float, float]],
+    keyframes: list[float],
+    snap: float = KEYFRAME_SNAP_SECONDS,
+) -> tuple[list[tuple[float, float]], bool]:
+    """Snap segment starts back to keyframes where possible.
+
+    Returns the segments to cut and whether they can all be stream-copied, i.e. whether
+    every start could be moved back onto a keyframe by at most ``snap`` seconds.
+    """
+    snapped = []
+    for start, end in segments:
+        earlier = [k for k in keyframes if start - snap <= k <= start]
+        if not earlier:
+            return segments, False
+        snapped.append((max(earlier), end))
+    return snapped, True
+
+
+def plan_chunks(
+    segments: list[tuple[float, float]], workers: int, min_chunk: float = MIN_CHUNK_SECONDS
+) -> list[tuple[float, float]]:
+    """Split ``segments`` into pieces of about equal length, ideally one per worker."""
+    total = sum(end - start for start, end in segments)
+    length = max(min_chunk, total / workers)
+    chunks = []
+    for start, end in segments:
+        pieces = max(1, round((end - start) / length))
+        step = (end - start) / pieces
+        chunks += [(start + n * step, start + (n + 1) * step) for n in range(pieces)]
+    return chunks
+
+
+def cut_segments(
+    file_path: str,
+    segments: list[tuple[float, float]],
+    video_probe: VideoProbe,
+    fps: float,
+    encoder: EncoderSettings | None = None,
+) -> str:
+    """Write ``segments`` of ``file_path`` back to back into a new mp4 next to it and
+    return its path.
+
+    ``encoder`` only matters when the segments have to be re-encoded; it is read from the
+    environment if omitted.
+    """
+    segments, stream_copy = plan_cut(segments, video_probe.keyframes)
+    encoder = encoder or encoder_from_env()
+    chunks = plan_chunks(segments, encoder.workers)
+    fd, output_path = tempfile.mkstemp(suffix=".mp4", dir=_directory_of(file_path))
+    os.close(fd)
+
+    try:
+        if stream_copy:
+            _concat_copy(file_path, segments, output_path)
+        elif encoder.workers > 1 and len(chunks) > 1:
+            _encode_chunks(file_path, chunks, video_probe.has_audio, fps, encoder, output_path)
+        else:
+            _trim_and_encode(file_path, segments, video_probe.has_audio, fps, encoder, output_path)
+    except Exception:
+        os.unlink(output_path)
+        raise
+    return output_path
+
+
+def join_clips(paths: list[str], encoder: EncoderSettings | None = None) -> str:
+    """Play ``paths`` back to back in a new mp4, at the size and frame rate of the first.
+
+    Clips of another size are scaled to fit and padded. Audio is kept only if every clip
+    has some. Returns the path of the new file, which is next to the first clip.
+    """
+    probes = [probe(path) for path in paths]
+    first = probes[0]
+    has_audio = all(video_probe.has_audio for video_probe in probes)
+    fps = first.fps or 30.0
+
+    filters = []
+    outputs = []
+    for n in range(len(paths)):
+        filters.append(
+            f"[{n}:v]scale={first.width}:{first.height}:force_original_aspect_ratio=decrease,"
+            f"pad={first.width}:{first.height}:(ow-iw)/2:(oh-ih)/2,setsar=1,fps={fps:g}[v{n}]"
+        )
+        outputs.append(f"[v{n}]")
+        if has_audio:
+            outputs.append(f"[{n}:a]")
+    audio = 1 if has_audio else 0
+    filters.append(
+        f"{''.join(outputs)}concat=n={len(paths)}:v=1:a={audio}[v]" + ("[a]" if has_audio else "")
+    )
+
+    fd, output_path = tempfile.mkstemp(suffix=".mp4", dir=_directory_of(paths[0]))
+    os.close(fd)
+    encoder = encoder or encoder_from_env()
+    args = [arg for path in paths for arg in ("-i", path)]
+    args += ["-filter_complex", ";".join(filters), "-map", "[v]"]
+    if has_audio:
+        args += ["-map", "[a]", "-c:a", "aac"]
+    try:
+        _run(
+            args
+            + _x264_args(encoder, encoder.single_pass_threads(), fps)
+            + ["-movflags", "+faststart", output_path]
+        )
+    except Exception:
+        os.unlink(output_path)
+        raise
+    return output_path
+
+
+def _concat_copy(file_path: str, segments: list[tuple[float, float]], output_path: str) -> None:
+    fd, list_path = tempfile.mkstemp(suffix=".txt", dir=_directory_of(output_path))
+    source = _concat_quote(file_path)
+    with os.fdopen(fd, "w") as f:
+        for start, end in segments:
+            f.write(f"file '{source}'\ninpoint {start:.3f}\noutpoint {end:.3f}\n")
+
+    try:
+        _run(
+            [
+                "-f",
+                "concat",
+                "-safe",
+                "0",
+                "-i",
+                list_path,
+                "-c",
+                "copy",
+                "-movflags",
+                "+faststart",
+                output_path,
+            ]
+        )
+    finally:
+        os.unlink(list_path)
+
+
+def _directory_of(file_path: str) -> str:
+    # intermediate and output files go next to the source, in the job's workspace
+    return os.path.dirname(os.path.abspath(file_path))
+
+
+def _concat_quote(file_path: str) -> str:
+    return os.path.abspath(file_path).replace("'", r"'\''")
+
+
+def _encode_chunks(
+    file_path: str,
+    chunks: list[tuple[float, float]],
+    has_audio: bool,
+    fps: float,
+    encoder: EncoderSettings,
+    output_path: str,
+) -> None:
+    """Encode ``chunks`` in parallel ffmpeg processes, then join them.
+
+    The joined video stream is copied, not re-encoded; audio travels as PCM inside the
+    chunks and is encoded to AAC once at the end, so there are no encoder gaps between them.
+    """
+    directory = tempfile.mkdtemp(dir=_directory_of(output_path))
+    paths = [os.path.join(directory, f"chunk{n:04d}.mov") for n in range(len(chunks))]
+    list_path = os.path.join(directory, "chunks.txt")
+
+    def encode(chunk: tuple[float, float], path: str) -> None:
+        start, end = chunk
+        args = ["-ss", f"{start:.3f}", "-i", file_path, "-t", f"{end - start:.3f}"]
+        args += ["-map", "0:v:0"] + (["-map", "0:a:0", "-c:a", "pcm_s16le"] if has_audio else [])
+        _run(args + _x264_args(encoder, encoder.threads_per_worker(), fps) + [path])
+
+    try:
+        with ThreadPoolExecutor(max_workers=encoder.workers) as executor:
+            # list() surfaces the first failed chunk
+            list(executor.map(encode, chunks, paths))
+        with open(list_path, "w") as f:
+            f.writelines(f"file '{_concat_quote(path)}'\n" for path in paths)
+
+        args = ["-f", "concat", "-safe", "0", "-i", list_path, "-c:v", "copy"]
+        if has_audio:
+            args += ["-c:a", "aac"]
+        _run(args + ["-movflags", "+faststart", output_path])
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _trim_and_encode(
+    file_path: str,
+    segments: list[tuple[float, float]],
+    has_audio: bool,
+    fps: float,
+    encoder: EncoderSettings,
+    output_path: str,
+) -> None:
+    filters = []
+    outputs = []
+    for n, (start, end) in enumerate(segments):
+        filters.append(f"[0:v]trim=start={start:.3f}:end={end:.3f},setpts=PTS-STARTPTS[v{n}]")
+        outputs.append(f"[v{n}]")
+        if has_audio:
+            filters.append(f"[0:a]atrim=start={start:.3f}:end={end:.3f},asetpts=PTS-STARTPTS[a{n}]")
+            outputs.append(f"[a{n}]")
+    audio = 1 if has_audio else 0
+    filters.append(
+        f"{''.join(outputs)}concat=n={len(segments)}:v=1:a={audio}[v]"
+        + ("[a]" if has_audio else "")
+    )
+
+    args = ["-i", file_path, "-filter_complex", ";".join(filters), "-map", "[v]"]
+    if has_audio:
+        args += ["-map", "[a]", "-c:a", "aac"]
+    args += _x264_args(encoder, encoder.single_pass_threads(), fps)
+    _run(args + ["-movflags", "+faststart", output_path])
+
+
+def _x264_args(encoder: EncoderSettings, threads: int, fps: float) -> list[str]:
+    return [
+        "-c:v",
+        "libx264",
+        "-preset",
+        encoder.preset,
+        "-crf",
+        str(encoder.crf),
+        "-threads",
+        str(threads),
+        "-r",
+        f"{fps:g}",
+        "-vsync",
+        "cfr",
+    ]
+
+
+def _run(args: list[str]) -> None:
+    subprocess.run(
+        [ffmpeg_exe(), "-y", "-loglevel", "error", *args],
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+    )
@@ -0,0 +1,203 @@
+"""Run CPU-heavy video work outside the event loop.
+
+``_curate_video`` spends its time in ffmpeg, OpenCV's per-frame loop and the moviepy encode.
+Each job runs in its own process forked from a forkserver that has already imported the
+video stack, so starting a job is cheap. A job that overruns its deadline, or whose caller
+is cancelled, is killed outright instead of running on in the background, along with the
+ffmpeg processes it started: each job leads its own process group.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import resource
+import signal
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from multiprocessing.process import BaseProcess
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+# longest a single video job may run before it is killed
+VIDEO_JOB_TIMEOUT_SECONDS = 300.0
+# how long close() waits for each killed worker to be reaped
+_REAP_TIMEOUT_SECONDS = 5.0
+
+_context = multiprocessing.get_context("forkserver")
+_context.set_forkserver_preload(["curator.videos"])
+
+
+def default_workers() -> int:
+    """``VIDEO_WORKERS``, or half the CPUs since ffmpeg and moviepy use several threads each."""
+    return int(os.getenv("VIDEO_WORKERS", max(1, (os.cpu_count() or 2) // 2)))
+
+
+@dataclass
+class VideoPoolStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    cancelled: int = 0
+    # CPU time of finished jobs, including their ffmpeg subprocesses
+    cpu_seconds: float = 0.0
+    last_cpu_seconds: float = 0.0
+
+
+class VideoPool:
+    """At most ``workers`` jobs run at once; the rest wait in a queue."""
+
+    def __init__(
+        self, workers: int | None = None, timeout: float | None = VIDEO_JOB_TIMEOUT_SECONDS
+    ):
+        self.workers = workers or default_workers()
+        self.timeout = timeout
+        self.stats = VideoPoolStats()
+        self._queued = 0
+        self._processes: set[BaseProcess] = set()
+        self._slots: tuple[asyncio.AbstractEventLoop, asyncio.Semaphore] | None = None
+
+    @property
+    def queue_depth(self) -> int:
+        """Jobs waiting for a free worker."""
+        return self._queued
+
+    @property
+    def running(self) -> int:
+        return len(self._processes)
+
+    async def run(self, fn: Callable[..., T], *args: Any, timeout: float | None = None) -> T:
+        """Run ``fn(*args)`` in a worker process and return its result.
+
+        ``fn`` and its arguments must be picklable. Raises ``TimeoutError`` if the job
+        runs past ``timeout`` (the pool default if omitted), and re-raises whatever ``fn``
+        raised.
+        """
+        slots = self._semaphore()
+        self.stats.submitted += 1
+        self._queued += 1
+        try:
+            await slots.acquire()
+        except asyncio.CancelledError:
+            self.stats.cancelled += 1
+            raise
+        finally:
+            self._queued -= 1
+
+        try:
+            return await self._run_in_process(
+                fn, args, self.timeout if timeout is None else timeout
+            )
+        finally:
+            slots.release()
+
+    def close(self) -> None:
+        """Kill any running jobs."""
+        for process in list(self._processes):
+            _kill(process)
+            process.join(_REAP_TIMEOUT_SECONDS)
+        self._processes.clear()
+
+    def _semaphore(self) -> asyncio.Semaphore:
+        # asyncio primitives belong to one loop; tests and scripts may use several
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots[0] is not loop:
+            self._slots = (loop, asyncio.Semaphore(self.workers))
+        return self._slots[1]
+
+    async def _run_in_process(
+        self, fn: Callable[..., T], args: tuple[Any, ...], timeout: float | None
+    ) -> T:
+        receiver, sender = _context.Pipe(duplex=False)
+        process = _context.Process(target=_run_job, args=(sender, fn, args), daemon=True)
+        start = time.perf_counter()
+        process.start()
+        sender.close()
+        self._processes.add(process)
+
+        try:
+            await asyncio.wait_for(_readable(receiver), timeout)
+            try:
+                status, value, cpu_seconds = receiver.recv()
+            except EOFError:
+                await _reap(process)
+                raise RuntimeError(
+                    f"{fn.__name__} worker exited with code {process.exitcode}"
+                ) from None
+        except asyncio.TimeoutError:
+            self.stats.timed_out += 1
+            raise TimeoutError(f"{fn.__name__} did not finish within {timeout}s") from None
+        except asyncio.CancelledError:
+            self.stats.cancelled += 1
+            raise
+        finally:
+            await _reap(process)
+            receiver.close()
+            self._processes.discard(process)
+
+        self.stats.cpu_seconds += cpu_seconds
+        self.stats.last_cpu_seconds = cpu_seconds
+        print(
+            f"video pool: {fn.__name__} used {cpu_seconds:.1f}s CPU in "
+            f"{time.perf_counter() - start:.1f}s (queue depth {self.queue_depth})"
+        )
+        if status == "error":
+            self.stats.failed += 1
+            raise value
+        self.stats.completed += 1
+        result: T = value
+        return result
+
+
+def _kill(process: BaseProcess) -> None:
+    """Kill a job's process group, so its subprocesses go with it."""
+    # once reaped, the worker's pid may be reused; until then it names the group
+    if process.pid is not None and process.exitcode is None:
+        try:
+            os.killpg(process.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            # the worker has not called setpgrp yet, so it has no group or subprocesses
+            process.kill()
+
+
+async def _reap(process: BaseProcess) -> None:
+    """Kill a job and wait for its worker to exit without blocking the event loop."""
+    _kill(process)
+    await asyncio.to_thread(process.join)
+
+
+async def _readable(connection: Connection) -> None:
+    loop = asyncio.get_running_loop()
+    ready = loop.create_future()
+    fd = connection.fileno()
+
+    def on_readable() -> None:
+        if not ready.done():
+            ready.set_result(None)
+
+    loop.add_reader(fd, on_readable)
+    try:
+        await ready
+    finally:
+        loop.remove_reader(fd)
+
+
+def _run_job(connection: Connection, fn: Callable[..., Any], args: tuple[Any, ...]) -> None:
+    """Worker entry point: run the job and send back its outcome and CPU time."""
+    os.setpgrp()
+    start = time.process_time()
+    try:
+        outcome: tuple[str, Any] = ("ok", fn(*args))
+    except Exception as e:  # noqa: BLE001 - forwarded to the caller
+        outcome = ("error", e)
+
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu_seconds = time.process_time() - start + children.ru_utime + children.ru_stime
+    try:
+        connection.send((*outcome, cpu_seconds))
+    except Exception as e:  # noqa: BLE001 - the result or exception couldn't be pickled
+        connection.send(("error", RuntimeError(f"{fn.__name__}: {e}"), cpu_seconds))
+    connection.close()
@@ -0,0 +1,188 @@
+"""Detect motion while a sighting video is still downloading.
+
+The response body is written to the spool file (still needed for the final cut) and, at
+the same time, piped into ffmpeg, which decodes it to small grayscale frames for the fast
+motion detector. Segment detection then overlaps the network transfer instead of waiting
+for it.
+
+An mp4 can only be decoded from a pipe when its index (the ``moov`` atom) comes before the
+media data. When it doesn't, ffmpeg gives up without a frame and the spooled file is
+analysed once the download completes, exactly as without streaming. Either way the profile
+ends up in the motion-profile cache, under the hash taken of the bytes as they arrived.
+"""
+
+import contextlib
+import dataclasses
+import hashlib
+import re
+import subprocess
+import threading
+from typing import IO
+
+import httpx
+import numpy as np
+
+from curator.motion import FAST_WIDTH, MotionTracker, Segment, segments_from_profile
+from curator.motion_cache import cached_motion_profile, save_motion_profile
+from curator.video_ffmpeg import ffmpeg_exe
+
+# streamed frames carry no timestamps, so they are resampled to a known rate
+STREAM_FPS = 30
+_CHUNK_SIZE = 64 * 1024
+
+
+def stream_motion_segments(
+    url: str,
+    file_path: str,
+    timeout: float = 30.0,
+    max_size_mb: int | None = 500,
+) -> tuple[list[Segment], float]:
+    """Download ``url`` to ``file_path`` while detecting motion in it.
+
+    Returns the same as ``detect_motion_segments``: merged motion segments in seconds and
+    the video's frame rate.
+    """
+    decoder = subprocess.Popen(
+        [
+            ffmpeg_exe(),
+            "-hide_banner",
+            "-nostats",
+            "-i",
+            "pipe:0",
+            "-map",
+            "0:v:0",
+            "-vf",
+            f"fps={STREAM_FPS},scale='min({FAST_WIDTH},iw)':-2:flags=area,format=gray",
+            "-f",
+            "rawvideo",
+            "pipe:1",
+        ],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    assert decoder.stdin and decoder.stdout and decoder.stderr
+
+    errors: list[Exception] = []
+    digest = hashlib.sha256()
+    download = threading.Thread(
+        target=_download,
+        args=(url, file_path, decoder.stdin, timeout, max_size_mb, digest, errors),
+        daemon=True,
+    )
+    download.start()
+
+    tracker = None
+    frames = 0
+    fps = float(STREAM_FPS)
+    try:
+        header = _read_header(decoder.stderr)
+        # keep draining the log so ffmpeg never blocks writing to it
+        threading.Thread(target=decoder.stderr.read, daemon=True).start()
+        sizes = _stream_sizes(header)
+        if sizes is not None:
+            source_width, (width, height), source_fps = sizes
+            fps = source_fps or fps
+            tracker = MotionTracker(STREAM_FPS, source_width, width)
+            frames = _track(decoder.stdout, tracker, width, height)
+    finally:
+        # unread frames would fill the pipe and stall ffmpeg, and with it the download
+        decoder.stdout.close()
+        download.join()
+        decoder.wait()
+
+    if errors:
+        raise errors[0]
+    file_hash = digest.hexdigest()
+    if tracker is None or frames == 0:
+        print("video stream: could not decode while downloading, analysing the file instead")
+        profile = cached_motion_profile(file_path, "fast", file_hash)
+        return segments_from_profile(profile), profile.fps
+    profile = dataclasses.replace(tracker.profile(), fps=fps)
+    save_motion_profile(file_hash, "fast", profile)
+    return segments_from_profile(profile), fps
+
+
+def _stream_sizes(header: str) -> tuple[int, tuple[int, int], float | None] | None:
+    """The source video's width, the size of the frames ffmpeg writes and the source frame
+    rate, from its log; None if it never got as far as describing its output."""
+    inputs, output_seen, output = header.partition("Output #0")
+    video = r"Stream #0:\d+.*: Video: .*?, (\d+)x(\d+)"
+    source = re.search(video, inputs)
+    scaled = re.search(video, output)
+    if not output_seen or source is None or scaled is None:
+        return None
+    source_fps = re.search(r"Stream #0:\d+.*: Video: .*?, ([\d.]+) fps", inputs)
+    return (
+        int(source.group(1)),
+        (int(scaled.group(1)), int(scaled.group(2))),
+        float(source_fps.group(1)) if source_fps else None,
+    )
+
+
+def _download(
+    url: str,
+    file_path: str,
+    decoder: IO[bytes],
+    timeout: float,
+    max_size_mb: int | None,
+    digest: "hashlib._Hash",
+    errors: list[Exception],
+) -> None:
+    """Write the body to ``file_path`` and ``decoder``, hashing it into ``digest``; runs on
+    its own thread."""
+    try:
+        with httpx.stream("GET", url, timeout=timeout, follow_redirects=True) as response:
+            response.raise_for_status()
+
+            content_length = response.headers.get("Content-Length")
+            if content_length and max_size_mb:
+                size_mb = int(content_length) / (1024 * 1024)
+                if size_mb > max_size_mb:
+                    raise ValueError(f"Video too large ({size_mb:.2f} MB > {max_size_mb} MB)")
+
+            with open(file_path, "wb") as f:
+                decoding = True
+                for chunk in response.iter_bytes(chunk_size=_CHUNK_SIZE):
+                    f.write(chunk)
+                    digest.update(chunk)
+                    if decoding:
+                        try:
+                            decoder.write(chunk)
+                        except BrokenPipeError:
+                            # the decoder gave up; the file is still needed
+                            decoding = False
+    except Exception as e:  # noqa: BLE001 - raised on the calling thread
+        errors.append(e)
+    finally:
+        with contextlib.suppress(BrokenPipeError):
+            decoder.close()
+
+
+def _read_header(log: IO[bytes]) -> str:
+    """ffmpeg's log up to and including the output stream description."""
+    lines = []
+    output_seen = False
+    for raw in log:
+        line = raw.decode(errors="replace")
+        lines.append(line)
+        if line.startswith("Output #0"):
+            output_seen = True
+        elif output_seen and "Video:" in line:
+            break
+    return "".join(lines)
+
+
+def _track(frames: IO[bytes], tracker: MotionTracker, width: int, height: int) -> int:
+    """Feed raw grayscale frames to ``tracker`` until the decoder stops. Returns the count."""
+    count = 0
+    while True:
+        frame = frames.read(width * height)
+        if len(frame) < width * height:
+            return count
+        time_sec = count / STREAM_FPS
+        if tracker.wants_frame():
+            tracker.analyse(time_sec, np.frombuffer(frame, np.uint8).reshape(height, width))
+        else:
+            tracker.skip(time_sec)
+        count += 1
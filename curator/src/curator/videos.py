@@ -1,35 +1,125 @@
 import asyncio
+import contextlib
 import os
 import shutil
 import subprocess
 import tempfile
-from typing import Optional
+from typing import Literal, Optional
 from urllib.parse import unquote, urlparse
 
-import cv2
 import httpx
+from bov_data import get_runtime
 from moviepy import VideoFileClip, concatenate_videoclips
 
+from curator.motion import MotionDetection, Segment, detection_from_env, segments_from_profile
+from curator.motion_cache import cached_motion_profile
+from curator.video_ffmpeg import cut_segments, ffmpeg_exe, join_clips, probe
+from curator.video_pool import VideoPool
+from curator.video_stream import stream_motion_segments
+from curator.workspace import Workspace
 
-async def curate_videos(urls: list[str]) -> str | None:
+VideoEngine = Literal["ffmpeg", "moviepy"]
+
+
+# source videos of one sighting on disk at once; each is deleted as soon as it is curated
+MAX_CONCURRENT_VIDEOS = 2
+# largest source video downloaded
+MAX_VIDEO_SIZE_MB = 500
+
+
+def workspace_reserve_bytes(urls: list[str]) -> int:
+    """Temp space to reserve for curating ``urls``: the most source videos on disk at once,
+    at the largest size downloaded. Cuts keep only the motion, so they are a fraction of
+    that; a sighting without videos needs none."""
+    return min(len(urls), MAX_CONCURRENT_VIDEOS) * MAX_VIDEO_SIZE_MB * 1024 * 1024
+
+
+async def curate_videos(
+    urls: list[str],
+    client: httpx.AsyncClient | None = None,
+    pool: VideoPool | None = None,
+    workspace: Workspace | None = None,
+) -> str | None:
+    """Keep the motion in each of a sighting's videos and join it into one clip.
+
+    Videos are downloaded and analysed concurrently, sharing the worker pool with every
+    other sighting; at most ``MAX_CONCURRENT_VIDEOS`` of them are on disk at a time. A video
+    that fails to download or curate, or times out, is logged and left out; if the join
+    fails, the first clip is returned on its own. All files, the returned one included, are
+    written to ``workspace`` if given, otherwise to the temp directory.
+    """
     if not urls:
         return None
 
-    # fairly certain there is only ever one video even though it comes in a list
-    url = urls[0]
+    # ffmpeg, OpenCV and moviepy would otherwise hold the event loop for the whole job
+    pool = pool or _video_pool()
+    slots = asyncio.Semaphore(MAX_CONCURRENT_VIDEOS)
+    outputs = await asyncio.gather(
+        *(_curate_one(url, client, pool, slots, workspace) for url in urls)
+    )
+    clips = [output for output in outputs if output]
+    if len(clips) <= 1:
+        return clips[0] if clips else None
 
-    file_path, _file_name, _content_type = await download_video_to_tempdir(url)
-    return _curate_video(file_path)
+    try:
+        return await pool.run(join_clips, clips)
+    except Exception as e:
+        print(f"video join failed, keeping the first video: {e!r}")
+        return clips.pop(0)
+    finally:
+        for clip in clips:
+            _remove(clip, workspace)
+
+
+async def _curate_one(
+    url: str,
+    client: httpx.AsyncClient | None,
+    pool: VideoPool,
+    slots: asyncio.Semaphore,
+    workspace: Workspace | None,
+) -> str | None:
+    async with slots:
+        try:
+            file_path = _download_path(url, workspace)
+        except ValueError as e:
+            print(f"video curation skipped for {url}: {e}")
+            return None
+        try:
+            if os.getenv("VIDEO_STREAMING") == "true":
+                # the worker downloads the video itself, detecting motion as the bytes arrive
+                return await pool.run(_curate_streamed_video, url, file_path)
+            await _download(url, file_path, client)
+            return await pool.run(_curate_video, file_path, "ffmpeg", detection_from_env())
+        except Exception as e:  # noqa: BLE001 - the sighting's other videos still get posted
+            print(f"video curation skipped for {url}: {e!r}")
+            return None
+        finally:
+            _remove(file_path, workspace)
+
+
+def _remove(path: str, workspace: Workspace | None) -> None:
+    if workspace is not None:
+        workspace.remove(path)
+    else:
+        with contextlib.suppress(FileNotFoundError):
+            os.unlink(path)
+
+
+def _video_pool() -> VideoPool:
+    """The process-wide video worker pool."""
+    return get_runtime().client("video_pool", VideoPool)
 
 
 def _normalize_to_constant_frame_rate(input_path: str, fps: int = 30) -> None:
     """Convert a video to constant frame rate (CFR) in-place using ffmpeg."""
-    fd, temp_path = tempfile.mkstemp(suffix=".mp4")
+    fd, temp_path = tempfile.mkstemp(
+        suffix=".mp4", dir=os.path.dirname(os.path.abspath(input_path))
+    )
     os.close(fd)
 
     try:
         cmd = [
-            "ffmpeg",
+            ffmpeg_exe(),
             "-y",
             "-i",
             input_path,
@@ -48,98 +138,52 @@ def _normalize_to_constant_frame_rate(input_path: str, fps: int = 30) -> None:
         raise
 
 
-def _curate_video(file_path: str) -> str | None:
-    # ---------------- CONFIG ----------------
-    FRAME_SKIP = 1
-    MERGE_GAP_SECONDS = 1.5
-    MIN_MOTION_AREA = 8000
-    NO_MOTION_FRAMES_REQUIRED = 5  # 3–10 is typical
-    # ----------------------------------------
-
-    _normalize_to_constant_frame_rate(file_path)
-
-    cap = cv2.VideoCapture(file_path)
-    fps = cap.get(cv2.CAP_PROP_FPS)
-
-    bg_subtractor = cv2.createBackgroundSubtractorMOG2(
-        history=500, varThreshold=50, detectShadows=True
-    )
-
-    segments = []
-    current_start = None
-    frame_idx = 0
-    motion_frames = 0
-    no_motion_frames = 0
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        if frame_idx % FRAME_SKIP == 0:
-            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-            blur = cv2.GaussianBlur(gray, (5, 5), 0)
+def _curate_video(
+    file_path: str, engine: VideoEngine = "ffmpeg", detection: MotionDetection = "fast"
+) -> str | None:
+    """Keep only the parts of the video with motion. Returns the new file, or None if there
+    is less than a second of motion.
 
-            fg_mask = bg_subtractor.apply(blur)
-
-            # Clean up noise
-            fg_mask = cv2.threshold(fg_mask, 200, 255, cv2.THRESH_BINARY)[1]
-            kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
-            fg_mask = cv2.dilate(fg_mask, kernel, iterations=2)
-
-            contours, _ = cv2.findContours(fg_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-
-            motion_detected = any(cv2.contourArea(cnt) >= MIN_MOTION_AREA for cnt in contours)
-
-            time_sec = frame_idx / fps
-
-            if motion_detected:
-                motion_frames += 1
-                no_motion_frames = 0
-
-                if current_start is None:
-                    current_start = time_sec
+    The ``ffmpeg`` engine analyses the source as-is and cuts it in a single ffmpeg pass. The
+    original ``moviepy`` engine first re-encodes to constant frame rate, then re-encodes
+    again through moviepy; it is kept for comparison. A video analysed before, by content,
+    isn't decoded for motion again.
+    """
+    if engine == "moviepy":
+        _normalize_to_constant_frame_rate(file_path)
 
-            else:
-                no_motion_frames += 1
-                motion_frames = 0
+    profile = cached_motion_profile(file_path, detection)
+    segments = segments_from_profile(profile)
+    if not _enough_motion(segments):
+        return None
 
-                if current_start is not None and no_motion_frames >= NO_MOTION_FRAMES_REQUIRED:
-                    end_time = time_sec - (NO_MOTION_FRAMES_REQUIRED / fps)
-                    segments.append((current_start, end_time))
-                    current_start = None
+    if engine == "moviepy":
+        return _cut_with_moviepy(file_path, segments)
+    return cut_segments(file_path, segments, probe(file_path), profile.fps)
 
-        frame_idx += 1
 
-    cap.release()
+def _curate_streamed_video(url: str, file_path: str) -> str | None:
+    """``_curate_video`` with the ffmpeg engine, but detecting motion while downloading
+    ``url`` to ``file_path``."""
+    segments, fps = stream_motion_segments(url, file_path)
+    if not _enough_motion(segments):
+        return None
+    return cut_segments(file_path, segments, probe(file_path), fps)
 
-    if current_start is not None:
-        segments.append((current_start, frame_idx / fps))
 
-    # --------- MERGE CLOSE SEGMENTS ----------
-    merged: list[list[float]] = []
-    for start, end in segments:
-        if not merged:
-            merged.append([start, end])
-        else:
-            prev_start, prev_end = merged[-1]
-            if start - prev_end <= MERGE_GAP_SECONDS:
-                merged[-1][1] = end
-            else:
-                merged.append([start, end])
+def _enough_motion(segments: list[Segment]) -> bool:
+    return sum(end - start for start, end in segments) >= 1
 
-    # --------- CALCULATE OUTPUT DURATION ----------
-    output_duration_seconds = sum(end - start for start, end in merged)
-    if output_duration_seconds < 1:
-        return None
 
-    # --------- CUT VIDEO ---------------------
+def _cut_with_moviepy(file_path: str, segments: list[Segment]) -> str | None:
     video = VideoFileClip(file_path)
-    clips = [video.subclipped(s, min(e, video.duration)) for s, e in merged]
+    clips = [video.subclipped(s, min(e, video.duration)) for s, e in segments]
 
     if clips:
         final = concatenate_videoclips(clips, method="compose")
-        fd, output_path = tempfile.mkstemp(suffix=".mp4")
+        fd, output_path = tempfile.mkstemp(
+            suffix=".mp4", dir=os.path.dirname(os.path.abspath(file_path))
+        )
         os.close(fd)
         logger = None if os.getenv("APP_ENV") == "prod" else "bar"
         final.write_videofile(
@@ -153,45 +197,77 @@ def _curate_video(file_path: str) -> str | None:
 async def download_video_to_tempdir(
     url: str,
     timeout: float = 30.0,
-    max_size_mb: Optional[int] = 500,
+    max_size_mb: Optional[int] = MAX_VIDEO_SIZE_MB,
+    client: httpx.AsyncClient | None = None,
+    workspace: Workspace | None = None,
 ) -> tuple[str, str, str]:
     """
-    Downloads a video file from a URL to the system temp directory.
+    Downloads a video file from a URL to a workspace or the system temp directory.
 
     Args:
         url: Video URL
         timeout: Request timeout in seconds
         max_size_mb: Optional max allowed file size (MB)
+        client: Optional shared client; a short-lived one is used if omitted
+        workspace: Optional job workspace, where the file gets a name of its own
 
     Returns:
         (local file path, file name, content type)
     """
 
+    file_path = _download_path(url, workspace)
+    content_type = await _download(url, file_path, client, timeout, max_size_mb)
+    return (file_path, os.path.basename(file_path), content_type)
+
+
+async def _download(
+    url: str,
+    file_path: str,
+    client: httpx.AsyncClient | None,
+    timeout: float = 30.0,
+    max_size_mb: int | None = MAX_VIDEO_SIZE_MB,
+) -> str:
+    if client is None:
+        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as new_client:
+            return await _stream_to_file(new_client, url, file_path, timeout, max_size_mb)
+    return await _stream_to_file(client, url, file_path, timeout, max_size_mb)
+
+
+def _download_path(url: str, workspace: Workspace | None) -> str:
+    """Where the video at ``url`` is downloaded to, named after the URL's file name."""
     parsed = urlparse(url)
     filename = unquote(parsed.path.split("/")[-1])
     if not filename:
         raise ValueError("Could not determine filename from URL")
 
-    temp_dir = tempfile.gettempdir()
-    file_path = os.path.join(temp_dir, filename)
-    content_type = ""
-
-    async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
-        async with client.stream("GET", url) as response:
-            response.raise_for_status()
+    if workspace is not None:
+        return workspace.file(filename)
+    return os.path.join(tempfile.gettempdir(), filename)
 
-            content_type = response.headers.get("Content-Type", "")
-            content_length = response.headers.get("Content-Length")
-            if content_length and max_size_mb:
-                size_mb = int(content_length) / (1024 * 1024)
-                if size_mb > max_size_mb:
-                    raise ValueError(f"Video too large ({size_mb:.2f} MB > {max_size_mb} MB)")
 
-            with open(file_path, "wb") as f:
-                async for chunk in response.aiter_bytes(chunk_size=8192):
-                    f.write(chunk)
-
-    return (file_path, filename, content_type)
+async def _stream_to_file(
+    client: httpx.AsyncClient,
+    url: str,
+    file_path: str,
+    timeout: float,
+    max_size_mb: Optional[int],
+) -> str:
+    """Stream the body at ``url`` into ``file_path``. Returns the response content type."""
+    async with client.stream("GET", url, timeout=timeout, follow_redirects=True) as response:
+        response.raise_for_status()
+
+        content_type: str = response.headers.get("Content-Type", "")
+        content_length = response.headers.get("Content-Length")
+        if content_length and max_size_mb:
+            size_mb = int(content_length) / (1024 * 1024)
+            if size_mb > max_size_mb:
+                raise ValueError(f"Video too large ({size_mb:.2f} MB > {max_size_mb} MB)")
+
+        with open(file_path, "wb") as f:
+            async for chunk in response.aiter_bytes(chunk_size=8192):
+                f.write(chunk)
+
+    return content_type
 
 
 def _copy_to_temp(input_path: str) -> str:
@@ -1,63 +1,253 @@
 import asyncio
+import time
+from collections import Counter, OrderedDict, defaultdict
+from dataclasses import dataclass
 from datetime import date, datetime, timedelta, timezone
 
 import httpx
+import numpy as np
+from bov_data import DB, Geocode, Sighting, Weather
 
+_GEOCODE_CACHE_SIZE = 256
+# zips don't move, but an unknown zip may just be a transient gap in the geocoder's data
+_GEOCODE_NEGATIVE_TTL = timedelta(days=7)
 
-async def _geocode_zip(client: httpx.AsyncClient, zip_code: str) -> tuple[float, float]:
-    """Convert a US zip code to lat/lon using Open-Meteo's geocoding API."""
+_geocode_cache: OrderedDict[str, Geocode] = OrderedDict()
+_geocode_stats: Counter[str] = Counter()
+
+
+async def _geocode_zip(
+    client: httpx.AsyncClient, zip_code: str, db: DB | None = None
+) -> tuple[float, float]:
+    """Convert a US zip code to lat/lon, checking the in-process and persistent caches first."""
+    geocode = _geocode_cache.get(zip_code)
+    if geocode is not None and _is_fresh(geocode):
+        _geocode_cache.move_to_end(zip_code)
+        _geocode_stats["memory_hits"] += 1
+    else:
+        geocode = await db.get_geocode(zip_code) if db is not None else None
+        if geocode is not None and _is_fresh(geocode):
+            _geocode_stats["store_hits"] += 1
+        else:
+            _geocode_stats["misses"] += 1
+            geocode = await _lookup_zip(client, zip_code)
+            if db is not None:
+                await db.save_geocode(geocode)
+        _remember_geocode(geocode)
+
+    if geocode.latitude is None or geocode.longitude is None:
+        _geocode_stats["negatives"] += 1
+        raise ValueError(f"Could not geocode zip code: {zip_code}")
+    return geocode.latitude, geocode.longitude
+
+
+async def _lookup_zip(client: httpx.AsyncClient, zip_code: str) -> Geocode:
+    """Resolve a zip code with Open-Meteo's geocoding API."""
     response = await client.get(
         "https://geocoding-api.open-meteo.com/v1/search",
         params={"name": zip_code, "count": 1, "format": "json", "language": "en"},
     )
     response.raise_for_status()
     results = response.json().get("results", [])
+    resolved_at = datetime.now(timezone.utc)
     if not results:
-        raise ValueError(f"Could not geocode zip code: {zip_code}")
-    return results[0]["latitude"], results[0]["longitude"]
+        return Geocode(zip_code=zip_code, resolved_at=resolved_at)
+    return Geocode(
+        zip_code=zip_code,
+        latitude=results[0]["latitude"],
+        longitude=results[0]["longitude"],
+        resolved_at=resolved_at,
+    )
 
 
-def _parse_hourly_data(data: dict, hour: int) -> dict:
-    """Extract weather for a specific hour from Open-Meteo hourly response."""
-    hourly = data["hourly"]
-    times = hourly["time"]
+def _is_fresh(geocode: Geocode) -> bool:
+    if geocode.found:
+        return True
+    if geocode.resolved_at is None:
+        return False
+    return datetime.now(timezone.utc) - geocode.resolved_at < _GEOCODE_NEGATIVE_TTL
+
+
+def _remember_geocode(geocode: Geocode) -> None:
+    _geocode_cache[geocode.zip_code] = geocode
+    _geocode_cache.move_to_end(geocode.zip_code)
+    while len(_geocode_cache) > _GEOCODE_CACHE_SIZE:
+        _geocode_cache.popitem(last=False)
 
-    # Find the index matching the target hour
-    idx = next(
-        i for i, t in enumerate(times) if datetime.strptime(t, "%Y-%m-%dT%H:%M").hour == hour
-    )
 
+def geocode_cache_stats() -> dict:
+    """Geocode lookup counters since process start, with the combined cache hit rate."""
+    hits = _geocode_stats["memory_hits"] + _geocode_stats["store_hits"]
+    lookups = hits + _geocode_stats["misses"]
     return {
-        "temperature_f": hourly["temperature_2m"][idx],
-        "was_cloudy": hourly["cloud_cover"][idx] > 50,
-        "was_precipitating": hourly["precipitation"][idx] > 0,
+        "memory_hits": _geocode_stats["memory_hits"],
+        "store_hits": _geocode_stats["store_hits"],
+        "misses": _geocode_stats["misses"],
+        "negatives": _geocode_stats["negatives"],
+        "hit_rate": hits / lookups if lookups else 0.0,
     }
 
 
 _HOURLY_PARAMS = "temperature_2m,cloud_cover,precipitation"
-_UNIT_PARAMS: dict[str, str] = {"temperature_unit": "fahrenheit", "precipitation_unit": "inch"}
+# Hourly series are always requested in GMT so every timestamp maps to a UTC epoch hour.
+_UNIT_PARAMS: dict[str, str] = {
+    "temperature_unit": "fahrenheit",
+    "precipitation_unit": "inch",
+    "timezone": "GMT",
+}
 
 
-async def _get_historical_weather(
-    client: httpx.AsyncClient, lat: float, lon: float, dt: datetime
-) -> dict:
-    date_str = dt.strftime("%Y-%m-%d")
+def _as_utc(dt: datetime) -> datetime:
+    """Convert to UTC. Naive datetimes are taken to already be in UTC."""
+    return dt.astimezone(timezone.utc) if dt.tzinfo is not None else dt.replace(tzinfo=timezone.utc)
+
+
+def _epoch_hour(dt: datetime) -> int:
+    return int(_as_utc(dt).timestamp()) // 3600
+
+
+@dataclass(frozen=True)
+class _HourlySeries:
+    """An Open-Meteo hourly payload parsed once into arrays indexed by UTC epoch hour.
+
+    Position ``i`` holds the hour ``first_hour + i``, so a lookup is a subtraction and a
+    bounds check. A series may span any number of contiguous days.
+    """
+
+    first_hour: int
+    temperature_f: np.ndarray
+    cloud_cover: np.ndarray
+    precipitation: np.ndarray
+    complete: np.ndarray
+
+    @classmethod
+    def from_payload(cls, hourly: dict) -> "_HourlySeries":
+        hours = np.array(hourly["time"], dtype="datetime64[h]").astype(np.int64)
+        if len(hours) and not np.array_equal(hours, np.arange(hours[0], hours[0] + len(hours))):
+            raise ValueError("Open-Meteo hourly series is not contiguous")
+
+        temperature_f = np.array(hourly["temperature_2m"], dtype=float)
+        cloud_cover = np.array(hourly["cloud_cover"], dtype=float)
+        precipitation = np.array(hourly["precipitation"], dtype=float)
+        return cls(
+            first_hour=int(hours[0]) if len(hours) else 0,
+            temperature_f=temperature_f,
+            cloud_cover=cloud_cover,
+            precipitation=precipitation,
+            # the archive reports hours it doesn't have yet as null
+            complete=~(np.isnan(temperature_f) | np.isnan(cloud_cover) | np.isnan(precipitation)),
+        )
+
+    def at(self, dt: datetime) -> dict | None:
+        """Weather for the hour containing ``dt``, or None if the series has no data for it."""
+        i = _epoch_hour(dt) - self.first_hour
+        if not 0 <= i < len(self.complete) or not self.complete[i]:
+            return None
+        return {
+            "temperature_f": float(self.temperature_f[i]),
+            "was_cloudy": bool(self.cloud_cover[i] > 50),
+            "was_precipitating": bool(self.precipitation[i] > 0),
+        }
+
+    def index(self, epoch_hours: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """Vectorized lookup. Returns positions (clipped into range) and which of them hold data."""
+        if len(self.complete) == 0:
+            return np.zeros_like(epoch_hours), np.zeros(len(epoch_hours), dtype=bool)
+        positions = epoch_hours - self.first_hour
+        in_range = (positions >= 0) & (positions < len(self.complete))
+        positions = np.clip(positions, 0, len(self.complete) - 1)
+        return positions, in_range & self.complete[positions]
+
+
+_HOURLY_CACHE_SIZE = 512
+_FORECAST_TTL_SECONDS = 15 * 60
+# the archive lags real time by a few days and back-fills recent hours as they settle
+_ARCHIVE_SETTLE_DAYS = 5
+_RECENT_ARCHIVE_TTL_SECONDS = 60 * 60
+
+
+@dataclass
+class _HourlyEntry:
+    series: _HourlySeries
+    expires_at: float | None
+
+
+_HourlyKey = tuple[float, float, date]
+
+_hourly_cache: OrderedDict[_HourlyKey, _HourlyEntry] = OrderedDict()
+_hourly_inflight: dict[_HourlyKey, asyncio.Task[_HourlySeries]] = {}
+
+
+async def _get_hourly(
+    client: httpx.AsyncClient, lat: float, lon: float, day: date, shared: bool = True
+) -> _HourlySeries:
+    """Return the hourly series for one UTC day at a location.
+
+    Series are cached per (lat, lon, day) so every sighting at a feeder on the same day
+    shares one API call. Concurrent callers for a key that is still being fetched await
+    the same in-flight request instead of issuing their own. That request runs on the
+    client of whoever started it, so a ``client`` that is closed when its caller returns
+    must not be ``shared``: its requests are still cached, but others don't wait on them.
+    """
+    key = (round(lat, 4), round(lon, 4), day)
+    entry = _hourly_cache.get(key)
+    if entry is not None and (entry.expires_at is None or entry.expires_at > time.monotonic()):
+        _hourly_cache.move_to_end(key)
+        return entry.series
+
+    if not shared:
+        return await _fetch_and_cache_hourly(client, key)
+
+    task = _hourly_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_fetch_and_cache_hourly(client, key))
+        _hourly_inflight[key] = task
+        task.add_done_callback(lambda _: _hourly_inflight.pop(key, None))
+
+    # shield so one caller's cancellation doesn't fail everyone sharing the request
+    return await asyncio.shield(task)
+
+
+async def _fetch_and_cache_hourly(client: httpx.AsyncClient, key: _HourlyKey) -> _HourlySeries:
+    lat, lon, day = key
+    today = _utc_today()
+    if day == today:
+        series = await _get_today_hourly(client, lat, lon)
+        ttl: float | None = _FORECAST_TTL_SECONDS
+    else:
+        series = await _get_historical_hourly(client, lat, lon, day)
+        recent = (today - day).days <= _ARCHIVE_SETTLE_DAYS
+        ttl = _RECENT_ARCHIVE_TTL_SECONDS if recent else None
+
+    expires_at = time.monotonic() + ttl if ttl is not None else None
+    _hourly_cache[key] = _HourlyEntry(series=series, expires_at=expires_at)
+    _hourly_cache.move_to_end(key)
+    while len(_hourly_cache) > _HOURLY_CACHE_SIZE:
+        _hourly_cache.popitem(last=False)
+    return series
+
+
+def _utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+async def _get_historical_hourly(
+    client: httpx.AsyncClient, lat: float, lon: float, start: date, end: date | None = None
+) -> _HourlySeries:
     params: dict[str, str] = {
         "latitude": str(lat),
         "longitude": str(lon),
-        "start_date": date_str,
-        "end_date": date_str,
+        "start_date": start.strftime("%Y-%m-%d"),
+        "end_date": (end or start).strftime("%Y-%m-%d"),
         "hourly": _HOURLY_PARAMS,
         **_UNIT_PARAMS,
     }
     response = await client.get("https://archive-api.open-meteo.com/v1/archive", params=params)
     response.raise_for_status()
-    return _parse_hourly_data(response.json(), dt.hour)
+    return _HourlySeries.from_payload(response.json()["hourly"])
 
 
-async def _get_today_weather(
-    client: httpx.AsyncClient, lat: float, lon: float, dt: datetime
-) -> dict:
+async def _get_today_hourly(client: httpx.AsyncClient, lat: float, lon: float) -> _HourlySeries:
     params: dict[str, str] = {
         "latitude": str(lat),
         "longitude": str(lon),
@@ -67,19 +257,31 @@ async def _get_today_weather(
     }
     response = await client.get("https://api.open-meteo.com/v1/forecast", params=params)
     response.raise_for_status()
-    return _parse_hourly_data(response.json(), dt.hour)
+    return _HourlySeries.from_payload(response.json()["hourly"])
 
 
-async def get_weather(location_zip: str, dt: datetime) -> dict:
+async def get_weather(
+    location_zip: str,
+    dt: datetime,
+    client: httpx.AsyncClient | None = None,
+    db: DB | None = None,
+    coordinates: tuple[float, float] | None = None,
+) -> dict:
     """
     Retrieve weather from Open-Meteo for a specific datetime.
 
     Uses the forecast endpoint for today's date and the archive endpoint
-    for past dates. Geocodes zip codes to lat/lon automatically.
+    for past dates. Geocodes zip codes to lat/lon automatically unless
+    coordinates are already known.
 
     Args:
         location (str): US ZIP code or "lat,lon".
-        dt (datetime): The datetime you want weather for.
+        dt (datetime): The datetime you want weather for. Naive datetimes are taken as UTC.
+        client (httpx.AsyncClient): Optional shared client; a short-lived one is used if omitted.
+            Concurrent calls for the same day and place may wait on a request made with
+            another call's client, so it should outlive them, like a runtime-owned client.
+        db (DB): Optional persistent geocode store backing the in-process cache.
+        coordinates (tuple): Optional (lat, lon) that skips geocoding entirely.
 
     Returns:
         dict with:
@@ -87,11 +289,184 @@ async def get_weather(location_zip: str, dt: datetime) -> dict:
             - was_cloudy (bool)
             - was_precipitating (bool)
     """
-    async with httpx.AsyncClient() as client:
-        lat, lon = await _geocode_zip(client, location_zip)
-        if dt.date() == date.today():
-            return await _get_today_weather(client, lat, lon, dt)
-        return await _get_historical_weather(client, lat, lon, dt)
+    if client is None:
+        async with httpx.AsyncClient() as new_client:
+            return await _fetch_weather(new_client, location_zip, dt, db, coordinates, shared=False)
+    return await _fetch_weather(client, location_zip, dt, db, coordinates)
+
+
+async def _fetch_weather(
+    client: httpx.AsyncClient,
+    location_zip: str,
+    dt: datetime,
+    db: DB | None,
+    coordinates: tuple[float, float] | None,
+    shared: bool = True,
+) -> dict:
+    if coordinates is not None:
+        lat, lon = coordinates
+    else:
+        lat, lon = await _geocode_zip(client, location_zip, db)
+    series = await _get_hourly(client, lat, lon, _as_utc(dt).date(), shared)
+    weather = series.at(dt)
+    if weather is None:
+        raise ValueError(f"No hourly weather available for {_as_utc(dt).isoformat()}")
+    return weather
+
+
+_BACKFILL_MAX_GAP_DAYS = 3
+_BACKFILL_MAX_RANGE_DAYS = 366
+_BACKFILL_CONCURRENCY = 4
+
+
+async def backfill_weather(
+    sightings: list[Sighting],
+    client: httpx.AsyncClient | None = None,
+    db: DB | None = None,
+) -> list[Sighting]:
+    """
+    Set ``weather`` on many past sightings with one archive call per location and date range.
+
+    Sightings are grouped by location, their dates are split into contiguous ranges, and
+    each range is fetched once. Hourly values are joined back to the sightings with a
+    vectorized lookup on UTC hour. Sightings from today go through the regular forecast
+    path. Sightings whose location can't be geocoded, whose range or forecast can't be
+    fetched, or whose hour has no data are logged and left untouched; the rest are still
+    returned.
+
+    Args:
+        sightings (list[Sighting]): Sightings with ``created_at`` set.
+        client (httpx.AsyncClient): Optional shared client; a short-lived one is used if omitted.
+        db (DB): Optional persistent geocode store backing the in-process cache.
+
+    Returns:
+        The sightings whose ``weather`` was set.
+    """
+    if client is None:
+        async with httpx.AsyncClient(timeout=60.0) as new_client:
+            return await _backfill_weather(new_client, sightings, db, shared=False)
+    return await _backfill_weather(client, sightings, db)
+
+
+async def _backfill_weather(
+    client: httpx.AsyncClient, sightings: list[Sighting], db: DB | None, shared: bool = True
+) -> list[Sighting]:
+    today = _utc_today()
+    by_location: dict[tuple[float, float], list[Sighting]] = defaultdict(list)
+    todays: list[Sighting] = []
+
+    for sighting in sightings:
+        if sighting.created_at is None:
+            continue
+        if _sighting_utc(sighting).date() >= today:
+            todays.append(sighting)
+            continue
+        try:
+            location = await _sighting_coordinates(client, sighting, db)
+        except Exception as e:  # noqa: BLE001 - one sighting doesn't stop the others
+            print(f"skipping sighting {sighting.bb_id}: {e!r}")
+            continue
+        by_location[location].append(sighting)
+
+    semaphore = asyncio.Semaphore(_BACKFILL_CONCURRENCY)
+
+    async def _fill_range(lat: float, lon: float, group: list[Sighting]) -> list[Sighting]:
+        days = [_sighting_utc(s).date() for s in group]
+        try:
+            async with semaphore:
+                series = await _get_historical_hourly(client, lat, lon, min(days), max(days))
+        except Exception as e:  # noqa: BLE001 - one range doesn't stop the others
+            print(f"skipping {len(group)} sightings from {min(days)} to {max(days)}: {e!r}")
+            return []
+        return _join_hourly(series, group)
+
+    jobs = [
+        _fill_range(lat, lon, group)
+        for (lat, lon), located in by_location.items()
+        for group in _contiguous_ranges(located)
+    ]
+    updated = [s for filled in await asyncio.gather(*jobs) for s in filled]
+
+    for sighting in todays:
+        assert sighting.created_at is not None
+        try:
+            weather = await _fetch_weather(
+                client,
+                sighting.location_zip,
+                sighting.created_at,
+                db,
+                await _sighting_coordinates(client, sighting, db),
+                shared,
+            )
+        except Exception as e:  # noqa: BLE001 - one sighting doesn't stop the others
+            print(f"skipping sighting {sighting.bb_id}: {e!r}")
+            continue
+        sighting.weather = Weather(**weather)
+        updated.append(sighting)
+
+    return updated
+
+
+async def _sighting_coordinates(
+    client: httpx.AsyncClient, sighting: Sighting, db: DB | None
+) -> tuple[float, float]:
+    if sighting.latitude is not None and sighting.longitude is not None:
+        return sighting.latitude, sighting.longitude
+    return await _geocode_zip(client, sighting.location_zip, db)
+
+
+def _sighting_utc(sighting: Sighting) -> datetime:
+    assert sighting.created_at is not None, "sighting must have a created_at"
+    return _as_utc(sighting.created_at)
+
+
+def _contiguous_ranges(sightings: list[Sighting]) -> list[list[Sighting]]:
+    """Split sightings at one location into groups whose dates form short contiguous ranges.
+
+    Small gaps are bridged because fetching a few extra days is cheaper than another call.
+    """
+    ordered = sorted(sightings, key=_sighting_utc)
+    groups: list[list[Sighting]] = []
+    range_start: date | None = None
+    previous: date | None = None
+
+    for sighting in ordered:
+        day = _sighting_utc(sighting).date()
+        if (
+            range_start is None
+            or previous is None
+            or (day - previous).days > _BACKFILL_MAX_GAP_DAYS
+            or (day - range_start).days >= _BACKFILL_MAX_RANGE_DAYS
+        ):
+            groups.append([])
+            range_start = day
+        groups[-1].append(sighting)
+        previous = day
+
+    return groups
+
+
+def _join_hourly(series: _HourlySeries, sightings: list[Sighting]) -> list[Sighting]:
+    """Set weather on each sighting from the hour it falls in. Returns the ones that matched."""
+    hours = np.array([_epoch_hour(_sighting_utc(s)) for s in sightings], dtype=np.int64)
+    positions, matched = series.index(hours)
+    if not matched.any():
+        return []
+    temperature_f = series.temperature_f[positions]
+    was_cloudy = series.cloud_cover[positions] > 50
+    was_precipitating = series.precipitation[positions] > 0
+
+    updated = []
+    for i, sighting in enumerate(sightings):
+        if not matched[i]:
+            continue
+        sighting.weather = Weather(
+            temperature_f=float(temperature_f[i]),
+            was_cloudy=bool(was_cloudy[i]),
+            was_precipitating=bool(was_precipitating[i]),
+        )
+        updated.append(sighting)
+    return updated
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+"""Per-job temp directories for downloaded and rendered media.
+
+Every job (a sighting import, a backpost) gets a directory of its own, so files with the
+same name never collide, and the directory is removed with everything in it when the job
+ends, whichever way it ends. Cloud Functions' ``/tmp`` is held in RAM, so jobs also
+reserve space from a shared budget up front and wait while it is used up.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+
+from bov_data import get_runtime
+
+# temp space shared by all jobs of this instance, unless WORKSPACE_BUDGET_MB says otherwise
+WORKSPACE_BUDGET_BYTES = 1024 * 1024 * 1024
+
+
+@dataclass
+class WorkspaceStats:
+    opened: int = 0
+    closed: int = 0
+    # jobs that had to wait for others to free their reservation first
+    waited: int = 0
+    reserved_bytes: int = 0
+    # files that closed workspaces removed along the way or still held at the end
+    bytes_written: int = 0
+    # largest workspace at the end of its job
+    peak_workspace_bytes: int = 0
+
+
+class Workspace:
+    """A directory that exists until its job ends."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.removed_bytes = 0
+        self._names: set[str] = set()
+
+    def file(self, name: str) -> str:
+        """A path for ``name`` in this workspace, not handed out before."""
+        stem, ext = os.path.splitext(os.path.basename(name) or "file")
+        candidate, n = stem + ext, 1
+        while candidate in self._names:
+            candidate, n = f"{stem}-{n}{ext}", n + 1
+        self._names.add(candidate)
+        return os.path.join(self.path, candidate)
+
+    def remove(self, path: str) -> None:
+        """Delete a file before the job ends, still counting what it took."""
+        try:
+            self.removed_bytes += os.path.getsize(path)
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def size(self) -> int:
+        """Bytes currently in the workspace."""
+        total = 0
+        for directory, _, files in os.walk(self.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+        return total
+
+
+class WorkspaceManager:
+    def __init__(self, root: str | None = None, budget_bytes: int | None = None):
+        self.root = root
+        budget_mb = os.getenv("WORKSPACE_BUDGET_MB")
+        self.budget_bytes = budget_bytes or (
+            int(budget_mb) * 1024 * 1024 if budget_mb else WORKSPACE_BUDGET_BYTES
+        )
+        self.stats = WorkspaceStats()
+        self._open: set[str] = set()
+        self._budget: tuple[asyncio.AbstractEventLoop, asyncio.Condition] | None = None
+
+    @asynccontextmanager
+    async def workspace(self, name: str, reserve_bytes: int = 0) -> AsyncIterator[Workspace]:
+        """A fresh directory for one job, removed on exit.
+
+        Waits until ``reserve_bytes`` fit in the budget. A job bigger than the whole budget
+        still runs, but only once nothing else holds a reservation; one that reserves
+        nothing never waits.
+        """
+        budget = self._condition()
+        async with budget:
+            if not self._fits(reserve_bytes):
+                self.stats.waited += 1
+                await budget.wait_for(lambda: self._fits(reserve_bytes))
+            self.stats.reserved_bytes += reserve_bytes
+
+        path = tempfile.mkdtemp(prefix=f"curator-{name}-", dir=self.root)
+        self._open.add(path)
+        self.stats.opened += 1
+        workspace = Workspace(path)
+        try:
+            yield workspace
+        finally:
+            left = workspace.size()
+            self.stats.bytes_written += workspace.removed_bytes + left
+            self.stats.peak_workspace_bytes = max(self.stats.peak_workspace_bytes, left)
+            shutil.rmtree(path, ignore_errors=True)
+            self._open.discard(path)
+            self.stats.closed += 1
+            async with budget:
+                self.stats.reserved_bytes -= reserve_bytes
+                budget.notify_all()
+
+    def close(self) -> None:
+        """Remove the directories of jobs that are still open."""
+        for path in list(self._open):
+            shutil.rmtree(path, ignore_errors=True)
+        self._open.clear()
+
+    def _fits(self, reserve_bytes: int) -> bool:
+        reserved = self.stats.reserved_bytes
+        return reserve_bytes == 0 or reserved == 0 or reserved + reserve_bytes <= self.budget_bytes
+
+    def _condition(self) -> asyncio.Condition:
+        # asyncio primitives belong to one loop; scripts and tests may use several
+        loop = asyncio.get_running_loop()
+        if self._budget is None or self._budget[0] is not loop:
+            self._budget = (loop, asyncio.Condition())
+        return self._budget[1]
+
+
+def workspaces() -> WorkspaceManager:
+    """The process-wide workspace manager."""
+    return get_runtime().client("workspaces", WorkspaceManager)
@@ -0,0 +1,330 @@
+import asyncio
+import base64
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import cv2
+import httpx
+import numpy as np
+import pytest
+
+from curator.image_dedup import (
+    cluster_near_duplicates,
+    collapse_near_duplicates,
+    estimate_image_tokens,
+    hamming_distances,
+    perceptual_hash,
+)
+from curator.image_fetch import FetchReport, fetch_images
+from curator.image_payload import build_image_inputs
+from curator.image_quality import score_images
+from curator.images import _curate_and_dedup, _parse_selection, curate_images
+
+_IMAGES = Path(__file__).parent / "images"
+
+
+def _load(name: str) -> np.ndarray:
+    image = cv2.imread(str(_IMAGES / name))
+    assert image is not None
+    return image
+
+
+def _near_duplicate(image: np.ndarray) -> np.ndarray:
+    """The same frame with sensor noise, slightly brighter and re-encoded, like a burst shot."""
+    rng = np.random.default_rng(0)
+    noisy = np.clip(image.astype(np.int16) + rng.normal(0, 6, image.shape), 0, 255)
+    brighter = cv2.convertScaleAbs(noisy.astype(np.uint8), alpha=1.05, beta=5)
+    _, encoded = cv2.imencode(".jpg", brighter, [cv2.IMWRITE_JPEG_QUALITY, 50])
+    return cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+
+@pytest.mark.parametrize("method", ["dhash", "phash"])
+def test_perceptual_hash_separates_near_duplicates_from_new_frames(method):
+    """Near-duplicate frames hash within the threshold, different frames well outside it."""
+    frontal = _load("body-frontal.jpg")
+    other = _load("body-75-percent.jpg")
+
+    distances = hamming_distances(
+        [
+            perceptual_hash(frontal, method),
+            perceptual_hash(_near_duplicate(frontal), method),
+            perceptual_hash(other, method),
+        ]
+    )
+
+    assert distances[0, 1] <= 4
+    assert distances[0, 2] > 10
+
+
+def test_cluster_near_duplicates_preserves_order():
+    """Each hash joins the first cluster whose representative is close enough."""
+    hashes = [0b0000, 0b1111 << 60, 0b0001, (0b1111 << 60) | 0b11, 0xFFFF]
+
+    assert cluster_near_duplicates(hashes, max_distance=2) == [[0, 2], [1, 3], [4]]
+
+
+def test_collapse_near_duplicates_reports_savings():
+    """Duplicates are dropped, undecodable images are kept, and savings are reported."""
+    frontal = _load("body-frontal.jpg")
+    urls = ["a.jpg", "b.jpg", "c.jpg", "d.jpg"]
+    images = [frontal, _near_duplicate(frontal), _load("body-75-percent.jpg"), None]
+
+    kept, report = collapse_near_duplicates(urls, images)
+
+    assert kept == ["a.jpg", "c.jpg", "d.jpg"]
+    assert report.total == 4
+    assert report.images_saved == 1
+    assert report.tokens_saved == estimate_image_tokens(640, 853)
+
+
+def test_estimate_image_tokens():
+    """Token estimates follow OpenAI's scale-then-tile accounting."""
+    assert estimate_image_tokens(512, 512) == 70 + 140
+    assert estimate_image_tokens(640, 853) == 70 + 140 * 4
+    # 4000x3000 scales to 2048x1536, then to 1024x768: 2x2 tiles
+    assert estimate_image_tokens(4000, 3000) == 70 + 140 * 4
+
+
+def test_curate_images_only_sends_distinct_frames_to_model():
+    """The model call only receives one image per near-duplicate cluster."""
+    frontal = _load("body-frontal.jpg")
+    images = [frontal, _near_duplicate(frontal), _near_duplicate(frontal)]
+    urls = ["https://example.com/1.jpg", "https://example.com/2.jpg", "https://example.com/3.jpg"]
+
+    with (
+        patch("curator.images.fetch_images", new=AsyncMock(return_value=(images, FetchReport(3)))),
+        patch(
+            "curator.images._curate_and_dedup",
+            new=AsyncMock(return_value=["https://example.com/1.jpg"]),
+        ) as mock_curate,
+    ):
+        result = asyncio.run(curate_images(urls))
+
+    assert result == ["https://example.com/1.jpg"]
+    assert mock_curate.call_args[0][0] == ["https://example.com/1.jpg"]
+
+
+def _feeder_scene(subject_at: tuple[int, int] | None) -> np.ndarray:
+    """A plain textured feeder, optionally with a crisp high-contrast "bird" in front of it."""
+    rng = np.random.default_rng(1)
+    background = np.tile(np.linspace(50, 110, 400), (400, 1)) + rng.normal(0, 4, (400, 400))
+    scene = np.clip(background, 0, 255).astype(np.uint8)
+    if subject_at is not None:
+        y, x = subject_at
+        scene[y : y + 120, x : x + 120] = (np.indices((120, 120)) // 4).sum(axis=0) % 2 * 80 + 170
+    return cv2.cvtColor(scene, cv2.COLOR_GRAY2BGR)
+
+
+def test_score_images_rejects_blurry_and_overexposed_frames():
+    """Obvious blur and blown-out exposure are rejected; real sighting frames are not."""
+    frontal = _load("body-frontal.jpg")
+    blurry = cv2.GaussianBlur(frontal, (21, 21), 0)
+    blown_out = cv2.convertScaleAbs(frontal, alpha=1.0, beta=150)
+
+    scores = score_images([frontal, blurry, blown_out, _load("body-75-percent.jpg")])
+
+    assert [(s.verdict, s.reason) for s in scores[1:3]] == [
+        ("reject", "blurry"),
+        ("reject", "exposure"),
+    ]
+    assert scores[0].verdict != "reject"
+    assert scores[3].verdict != "reject"
+
+
+def test_score_images_rates_blurry_sightings_below_sharp_ones():
+    """A soft bird in front of the feeder's sharp pine needles still scores as blurry."""
+    names = ["body-frontal", "body-75-percent", "body-frontal-blurry", "body-80-percent-blurry"]
+    scores = score_images([_load(f"{name}.jpg") for name in names])
+
+    frontal, three_quarters, frontal_blurry, blurry = (s.sharpness for s in scores)
+    assert max(frontal_blurry, blurry) < min(frontal, three_quarters)
+    assert [s.verdict for s in scores[2:]] == ["reject", "reject"]
+
+
+def test_score_images_accepts_only_against_an_empty_feeder():
+    """A crisp subject in front of a known empty feeder is accepted and an empty feeder is
+    rejected; against the batch median, which may hold a bird, frames stay uncertain."""
+    frames = [_feeder_scene((20, 20)), _feeder_scene((250, 250)), _feeder_scene((20, 250))]
+    empty = _feeder_scene(None)
+
+    assert [s.verdict for s in score_images(frames, background=empty)] == ["accept"] * 3
+    assert [s.verdict for s in score_images(frames)] == ["uncertain"] * 3
+
+    scores = score_images([empty], background=empty)
+    assert (scores[0].verdict, scores[0].reason) == ("reject", "no foreground")
+
+
+def test_curate_images_drops_rejects_before_model():
+    """Rejected frames never reach the model, and burst duplicates keep the sharpest frame."""
+    frontal = _load("body-frontal.jpg")
+    softer = cv2.GaussianBlur(frontal, (3, 3), 0)
+    images = [softer, frontal, cv2.GaussianBlur(frontal, (21, 21), 0)]
+    urls = ["https://example.com/1.jpg", "https://example.com/2.jpg", "https://example.com/3.jpg"]
+
+    with (
+        patch("curator.images.fetch_images", new=AsyncMock(return_value=(images, FetchReport(3)))),
+        patch(
+            "curator.images._curate_and_dedup",
+            new=AsyncMock(return_value=["https://example.com/2.jpg"]),
+        ) as mock_curate,
+    ):
+        asyncio.run(curate_images(urls))
+
+    assert mock_curate.call_args[0][0] == ["https://example.com/2.jpg"]
+
+
+def test_curate_images_skips_model_when_all_frames_accepted():
+    """Confident local accepts against an empty-feeder frame are returned without an OpenAI
+    call; without that frame the model still decides."""
+    images = [_feeder_scene((20, 20)), _feeder_scene((250, 250)), _feeder_scene((20, 250))]
+    urls = ["https://example.com/1.jpg", "https://example.com/2.jpg", "https://example.com/3.jpg"]
+
+    with (
+        patch("curator.images.fetch_images", new=AsyncMock(return_value=(images, FetchReport(3)))),
+        patch("curator.images._curate_and_dedup", new=AsyncMock(return_value=urls)) as mock_curate,
+    ):
+        result = asyncio.run(curate_images(urls, background=_feeder_scene(None)))
+        mock_curate.assert_not_called()
+        asyncio.run(curate_images(urls))
+        mock_curate.assert_called_once()
+
+    assert result and set(result) <= set(urls)
+
+
+def _image_client(bodies: dict[str, bytes]) -> httpx.AsyncClient:
+    def handler(request: httpx.Request) -> httpx.Response:
+        body = bodies.get(request.url.path)
+        return httpx.Response(200, content=body) if body else httpx.Response(404)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+
+def test_fetch_images_decodes_once_into_shared_read_only_arrays():
+    """Every image is downloaded and decoded; failures are None, buffers are read-only."""
+    jpeg = (_IMAGES / "body-frontal.jpg").read_bytes()
+    client = _image_client({"/a.jpg": jpeg, "/b.jpg": jpeg, "/garbage.jpg": b"not an image"})
+    urls = [
+        f"https://example.com/{name}" for name in ("a.jpg", "missing.jpg", "garbage.jpg", "b.jpg")
+    ]
+
+    images, report = asyncio.run(fetch_images(urls, client))
+
+    assert [image is not None for image in images] == [True, False, False, True]
+    assert images[0].shape == (853, 640, 3)
+    assert not images[0].flags.writeable
+    assert report.decoded == 2
+    assert report.downloaded_bytes == 2 * len(jpeg) + len(b"not an image")
+
+
+def test_fetch_images_respects_memory_cap():
+    """Frames that would push the sighting past its memory cap are left undecoded."""
+    jpeg = (_IMAGES / "body-frontal.jpg").read_bytes()
+    client = _image_client({f"/{i}.jpg": jpeg for i in range(4)})
+    urls = [f"https://example.com/{i}.jpg" for i in range(4)]
+    frame_bytes = 853 * 640 * 3
+
+    with patch("curator.image_fetch.cv2.imdecode", wraps=cv2.imdecode) as imdecode:
+        images, report = asyncio.run(fetch_images(urls, client, max_bytes=2 * frame_bytes))
+
+    assert sum(image is not None for image in images) == 2
+    assert report.over_budget == 2
+    assert report.decoded_bytes == 2 * frame_bytes
+    # the budget is reserved from the headers, so the other two are never decoded
+    assert imdecode.call_count == 2
+
+
+def _decode_data_url(data_url: str) -> np.ndarray:
+    header, data = data_url.split(",", 1)
+    assert header == "data:image/jpeg;base64"
+    return cv2.imdecode(np.frombuffer(base64.b64decode(data), np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_build_image_inputs_inline_downscales_and_falls_back_to_urls():
+    """Decoded frames are sent downscaled inline; undecoded ones by url, after them."""
+    urls = ["https://example.com/1.jpg", "https://example.com/2.jpg", "https://example.com/3.jpg"]
+    images = [_load("body-frontal.jpg"), None, _load("body-75-percent.jpg")]
+
+    inputs = build_image_inputs(urls, images, "inline", max_edge=512)
+
+    assert len(inputs.content) == 3
+    assert [_decode_data_url(c["image_url"]).shape[:2] for c in inputs.content[:2]] == [
+        (512, 384),
+        (512, 384),
+    ]
+    assert inputs.content[2]["image_url"] == "https://example.com/2.jpg"
+    assert "Images 2 are attached separately" in inputs.note
+    assert inputs.estimated_tokens == 2 * estimate_image_tokens(384, 512)
+
+
+def test_build_image_inputs_contact_sheet_tiles_frames_into_one_image():
+    """All decoded frames share one labelled contact sheet, far cheaper than separate urls."""
+    urls = [f"https://example.com/{i}.jpg" for i in range(5)]
+    images = [_load("body-frontal.jpg")] * 5
+
+    sheet_inputs = build_image_inputs(urls, list(images), "contact_sheet")
+    url_inputs = build_image_inputs(urls, list(images), "url")
+
+    assert len(sheet_inputs.content) == 1
+    # 5 frames make a 3x2 grid of 384px cells
+    assert _decode_data_url(sheet_inputs.content[0]["image_url"]).shape == (768, 1152, 3)
+    assert "contact sheet" in sheet_inputs.note
+    assert [c["image_url"] for c in url_inputs.content] == urls
+    assert sheet_inputs.estimated_tokens < url_inputs.estimated_tokens / 3
+
+
+_URLS = ["https://example.com/1.jpg", "https://example.com/2.jpg", "https://example.com/3.jpg"]
+
+
+def _openai(*delays: float, output_text: str = '{"keep": [3, 1, 9]}') -> MagicMock:
+    """AsyncOpenAI mock whose nth responses.create call answers after delays[n] seconds."""
+    calls = iter(delays)
+
+    async def create(**_kwargs):
+        await asyncio.sleep(next(calls))
+        return MagicMock(output_text=output_text)
+
+    client = MagicMock()
+    client.responses.create = AsyncMock(side_effect=create)
+    return client
+
+
+def test_curate_and_dedup_maps_structured_selection_to_urls():
+    """The model answers with image numbers; they map back to urls in list order."""
+    client = _openai(0.0)
+
+    result = asyncio.run(_curate_and_dedup(_URLS, client))
+
+    assert result == ["https://example.com/1.jpg", "https://example.com/3.jpg"]
+    kwargs = client.responses.create.call_args.kwargs
+    assert kwargs["text"]["format"]["type"] == "json_schema"
+
+
+def test_curate_and_dedup_keeps_local_selection_after_deadline():
+    """A model that misses the deadline doesn't hold the sighting up."""
+    client = _openai(5.0)
+
+    result = asyncio.run(_curate_and_dedup(_URLS, client, timeout=0.05))
+
+    assert result == _URLS
+
+
+@pytest.mark.parametrize("output_text", ["not json", '{"drop": [1]}', '{"keep": 2}', "[1, 3]"])
+def test_parse_selection_keeps_local_selection_for_unreadable_answers(output_text):
+    """An answer that isn't the expected JSON keeps every locally curated image."""
+    assert _parse_selection(output_text, _URLS) == _URLS
+
+
+def test_curate_and_dedup_hedges_slow_requests():
+    """A second request is sent when the first is slow, and the first answer wins."""
+    client = _openai(5.0, 0.0, output_text='{"keep": [2]}')
+
+    async def _run():
+        start = asyncio.get_running_loop().time()
+        result = await _curate_and_dedup(_URLS, client, hedge_after=0.05)
+        return result, asyncio.get_running_loop().time() - start
+
+    result, elapsed = asyncio.run(_run())
+
+    assert result == ["https://example.com/2.jpg"]
+    assert client.responses.create.await_count == 2
+    assert elapsed < 1.0
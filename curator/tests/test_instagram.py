@@ -0,0 +1,378 @@
+import asyncio
+import json
+import time
+from collections import Counter
+
+import httpx
+import pytest
+
+from curator import instagram, rate_limits
+from curator.instagram import _post_carousel, _post_sighting
+from curator.rate_limits import GraphApiScheduler
+
+_IG_USER = "1789"
+_SPAM_ERROR = {"error": {"code": 4, "error_subcode": 2207051, "message": "spam"}}
+
+
+class _FakeGraphApi:
+    """Just enough of the Graph API to post media: containers, status, publish, permalink."""
+
+    def __init__(
+        self,
+        delay: float = 0.0,
+        fail_image: str | None = None,
+        spam_images: bool = False,
+        drop_upload_at: int | None = None,
+        processing_checks: int = 0,
+        rate_limited_calls: int = 0,
+    ):
+        self.delay = delay
+        self.fail_image = fail_image
+        # publishing image posts fails with the spam error
+        self.spam_images = spam_images
+        # the connection drops once this many bytes of an upload have arrived, once
+        self.drop_upload_at = drop_upload_at
+        self.uploads: dict[str, bytearray] = {}
+        self.upload_offsets: list[int] = []
+        # status checks that find a container still processing
+        self.processing_checks = processing_checks
+        self.status_checks: Counter[str] = Counter()
+        # Graph API calls rejected for rate limiting before any goes through
+        self.rate_limited_calls = rate_limited_calls
+        self.requests: list[httpx.Request] = []
+        self.containers: dict[str, dict] = {}
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(transport=httpx.MockTransport(self.handle))
+
+    async def handle(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delay)
+            await request.aread()
+            return self._respond(request)
+        finally:
+            self.in_flight -= 1
+
+    def _respond(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path.rsplit("/", 2)[-2:]
+        if self.rate_limited_calls and request.url.host == "graph.facebook.com":
+            self.rate_limited_calls -= 1
+            return httpx.Response(400, json={"error": {"code": 17, "message": "limit"}})
+        if request.method == "POST" and path == [_IG_USER, "media"]:
+            payload = json.loads(request.content)
+            if self.fail_image and payload.get("image_url") == self.fail_image:
+                return httpx.Response(400, json={"error": {"message": "bad image"}})
+            container_id = f"c{len(self.containers)}"
+            self.containers[container_id] = payload
+            if payload.get("upload_type") == "resumable":
+                uri = f"https://rupload.facebook.com/ig-api-upload/v21.0/{container_id}"
+                return httpx.Response(200, json={"id": container_id, "uri": uri})
+            return httpx.Response(200, json={"id": container_id})
+        if request.url.host == "rupload.facebook.com":
+            return self._upload(path[-1], request)
+        if request.method == "POST" and path == [_IG_USER, "media_publish"]:
+            creation_id = json.loads(request.content)["creation_id"]
+            if self.spam_images and "media_type" not in self.containers[creation_id]:
+                return httpx.Response(400, json=_SPAM_ERROR)
+            return httpx.Response(200, json={"id": f"m-{creation_id}"})
+        media_id = path[-1]
+        if request.url.params.get("fields") == "status_code":
+            if "ids" in request.url.params:
+                ids = request.url.params["ids"].split(",")
+                return httpx.Response(200, json={i: self._status(i) for i in ids})
+            return httpx.Response(200, json=self._status(media_id))
+        if request.url.params.get("fields") == "video_status":
+            received = len(self.uploads.get(media_id, b""))
+            phase = {"status": "in_progress", "bytes_transferred": received}
+            return httpx.Response(200, json={"video_status": {"uploading_phase": phase}})
+        return httpx.Response(200, json={"permalink": f"https://www.instagram.com/p/{media_id}/"})
+
+    def _status(self, container_id: str) -> dict:
+        self.status_checks[container_id] += 1
+        if self.status_checks[container_id] <= self.processing_checks:
+            return {"id": container_id, "status_code": "IN_PROGRESS"}
+        return {"id": container_id, "status_code": "FINISHED"}
+
+    def _upload(self, container_id: str, request: httpx.Request) -> httpx.Response:
+        offset = int(request.headers["offset"])
+        assert int(request.headers["file_size"]) >= offset + len(request.content)
+        self.upload_offsets.append(offset)
+        received = self.uploads.setdefault(container_id, bytearray())
+        assert offset <= len(received), "upload skipped bytes"
+        del received[offset:]
+        received += request.content
+        if self.drop_upload_at is not None and len(received) > self.drop_upload_at:
+            del received[self.drop_upload_at :]
+            self.drop_upload_at = None
+            raise httpx.ReadError("connection reset by peer")
+        return httpx.Response(200, json={"success": True})
+
+    def created(self, **fields) -> list[str]:
+        return [
+            container_id
+            for container_id, payload in self.containers.items()
+            if all(payload.get(key) == value for key, value in fields.items())
+        ]
+
+
+@pytest.fixture(autouse=True)
+def no_waiting(monkeypatch):
+    monkeypatch.setattr(instagram, "_POLL_FIRST_INTERVAL_SECONDS", 0.01)
+    monkeypatch.setattr(instagram, "_UPLOAD_RETRY_SECONDS", 0)
+    monkeypatch.setattr(instagram, "_processing_seconds", {})
+    monkeypatch.delenv("INSTAGRAM_CALLS_PER_HOUR", raising=False)
+    monkeypatch.delenv("INSTAGRAM_PUBLISHES_PER_DAY", raising=False)
+    scheduler = GraphApiScheduler()
+    monkeypatch.setattr(instagram, "graph_api_scheduler", lambda: scheduler)
+
+
+def test_carousel_children_are_created_concurrently_in_order():
+    """Children are created a few at a time and the parent lists them in image order."""
+    api = _FakeGraphApi(delay=0.05)
+    urls = [f"https://example.com/{i}.jpg" for i in range(8)]
+
+    async def _run():
+        async with api.client() as client:
+            return await _post_carousel(client, _IG_USER, "token", urls, "caption")
+
+    media_id = asyncio.run(_run())
+
+    children = api.created(is_carousel_item=True)
+    (parent,) = api.created(media_type="CAROUSEL")
+    assert media_id == f"m-{parent}"
+    assert api.containers[parent]["children"] == ",".join(
+        sorted(children, key=lambda child: urls.index(api.containers[child]["image_url"]))
+    )
+    assert 1 < api.max_in_flight <= instagram._MAX_CONCURRENT_CHILDREN
+
+
+def test_carousel_child_failure_stops_creating_children():
+    """After a child fails no further children and no parent are created."""
+    urls = [f"https://example.com/{i}.jpg" for i in range(10)]
+    api = _FakeGraphApi(delay=0.05, fail_image=urls[1])
+
+    async def _run():
+        async with api.client() as client:
+            await _post_carousel(client, _IG_USER, "token", urls, "caption")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(_run())
+
+    assert not api.created(media_type="CAROUSEL")
+    # only the creations already started when the failure came back
+    assert len(api.requests) <= 2 * instagram._MAX_CONCURRENT_CHILDREN
+
+
+@pytest.fixture
+def video(tmp_path) -> str:
+    path = tmp_path / "reel.mp4"
+    path.write_bytes(bytes(range(250)) * 4)
+    return str(path)
+
+
+def _post(api: _FakeGraphApi, image_urls: list[str], video_path: str | None):
+    async def _run():
+        async with api.client() as client:
+            return await _post_sighting(
+                client, _IG_USER, "token", image_urls, video_path, "caption"
+            )
+
+    return asyncio.run(_run())
+
+
+def test_image_and_video_are_posted_concurrently(video):
+    """The reel doesn't wait for the image post; both permalinks come back."""
+    api = _FakeGraphApi(delay=0.02)
+
+    image_permalink, video_permalink = _post(api, ["https://example.com/0.jpg"], video)
+
+    (image,) = api.created(image_url="https://example.com/0.jpg")
+    (reel,) = api.created(media_type="REELS")
+    assert image_permalink == f"https://www.instagram.com/p/m-{image}/"
+    assert video_permalink == f"https://www.instagram.com/p/m-{reel}/"
+    assert api.uploads[reel] == bytes(range(250)) * 4
+    assert api.max_in_flight == 2
+
+
+def test_spam_error_on_one_post_keeps_the_other(video):
+    api = _FakeGraphApi(spam_images=True)
+
+    assert _post(api, ["https://example.com/0.jpg"], video) == (
+        None,
+        f"https://www.instagram.com/p/m-{api.created(media_type='REELS')[0]}/",
+    )
+
+
+def test_failed_post_is_raised_after_the_other_finishes(video):
+    """A failing image post doesn't stop the reel from being published."""
+    api = _FakeGraphApi(fail_image="https://example.com/0.jpg")
+
+    with pytest.raises(httpx.HTTPStatusError):
+        _post(api, ["https://example.com/0.jpg"], video)
+
+    (reel,) = api.created(media_type="REELS")
+    assert any(request.url.path.endswith("media_publish") for request in api.requests)
+    assert reel in api.uploads
+
+
+def _upload(api: _FakeGraphApi, video_path: str) -> str:
+    async def _run():
+        async with api.client() as client:
+            return await instagram._upload_video_container(
+                client, _IG_USER, "token", video_path, media_type="REELS"
+            )
+
+    return asyncio.run(_run())
+
+
+def test_video_upload_is_sent_in_chunks(video, monkeypatch):
+    monkeypatch.setattr(instagram, "UPLOAD_CHUNK_BYTES", 300)
+    monkeypatch.setattr(instagram, "_UPLOAD_READ_BYTES", 64)
+    api = _FakeGraphApi()
+    before = instagram.upload_stats().uploads
+
+    container_id = _upload(api, video)
+
+    assert api.upload_offsets == [0, 300, 600, 900]
+    assert api.uploads[container_id] == bytes(range(250)) * 4
+    assert instagram.upload_stats().uploads == before + 1
+    assert instagram.upload_stats().bytes_per_second > 0
+
+
+def test_video_upload_resumes_where_the_connection_dropped(video, monkeypatch):
+    """After a dropped connection the upload continues from the bytes Instagram received."""
+    monkeypatch.setattr(instagram, "UPLOAD_CHUNK_BYTES", 400)
+    api = _FakeGraphApi(drop_upload_at=550)
+    resumes = instagram.upload_stats().resumes
+
+    container_id = _upload(api, video)
+
+    assert api.upload_offsets == [0, 400, 550, 950]
+    assert api.uploads[container_id] == bytes(range(250)) * 4
+    assert instagram.upload_stats().resumes == resumes + 1
+
+
+def test_upload_chunk_size_from_env(monkeypatch):
+    monkeypatch.setenv("INSTAGRAM_UPLOAD_CHUNK_MB", "0.5")
+
+    assert instagram._upload_chunk_bytes() == 512 * 1024
+
+
+def _wait_for(api: _FakeGraphApi, container_ids: list[str], timeout: float = 5.0):
+    async def _run():
+        async with api.client() as client:
+            poller = instagram._container_poller(client)
+            start = time.perf_counter()
+            await asyncio.gather(
+                *(
+                    poller.wait(_IG_USER, "token", container_id, timeout=timeout)
+                    for container_id in container_ids
+                )
+            )
+            return poller.requests, time.perf_counter() - start
+
+    return asyncio.run(_run())
+
+
+def test_container_status_is_checked_right_away():
+    """A container that is already done costs one request and no waiting."""
+    requests, seconds = _wait_for(_FakeGraphApi(), ["c0"])
+
+    assert requests == 1
+    assert seconds < 0.1
+
+
+def test_containers_in_flight_are_checked_together():
+    """Containers waiting at the same time share each status request."""
+    api = _FakeGraphApi(processing_checks=3)
+
+    requests, _ = _wait_for(api, ["c0", "c1", "c2"])
+
+    assert api.status_checks == {"c0": 4, "c1": 4, "c2": 4}
+    assert requests == 4
+
+
+def test_container_poll_waits_grow_and_follow_observed_processing_times():
+    waiter = instagram._Waiter(_IG_USER, "token", "video", None, 0.0, 0.0, 1.0)  # type: ignore[arg-type]
+
+    assert [instagram._next_wait(waiter, 0.0) for _ in range(4)] == [1.0, 1.5, 2.25, 3.375]
+
+    instagram._observe_processing("video", 30.0)
+    waiter = instagram._Waiter(_IG_USER, "token", "video", None, 0.0, 0.0, 1.0)  # type: ignore[arg-type]
+    # no point looking much before videos have been finishing
+    assert instagram._next_wait(waiter, 0.0) == instagram._POLL_MAX_INTERVAL_SECONDS
+    assert instagram._next_wait(waiter, 25.0) == 5.0
+    assert instagram._next_wait(waiter, 29.5) == 1.0
+
+
+def test_container_poll_gives_up_at_the_deadline():
+    api = _FakeGraphApi(processing_checks=1000)
+
+    with pytest.raises(TimeoutError, match="did not finish processing"):
+        _wait_for(api, ["c0"], timeout=0.2)
+
+
+def test_unexpected_status_responses_fail_the_waiting_posts(monkeypatch):
+    """A status response that isn't what the poller expects fails the posts waiting on it
+    right away instead of leaving them to their deadline."""
+    api = _FakeGraphApi()
+    monkeypatch.setattr(api, "_status", lambda container_id: ["not", "a", "dict"])
+
+    start = time.perf_counter()
+    with pytest.raises(AttributeError):
+        _wait_for(api, ["c0"], timeout=5)
+
+    assert time.perf_counter() - start < 1
+
+
+def test_poller_failures_fail_the_waiting_posts(monkeypatch):
+    def _broken(account: str) -> float:
+        raise RuntimeError("scheduler broke")
+
+    monkeypatch.setattr(instagram.graph_api_scheduler(), "paused_seconds", _broken)
+
+    start = time.perf_counter()
+    with pytest.raises(RuntimeError, match="scheduler broke"):
+        _wait_for(_FakeGraphApi(), ["c0", "c1"], timeout=5)
+
+    assert time.perf_counter() - start < 1
+
+
+def test_container_status_checks_are_not_held_back_by_the_budget():
+    """A spent call budget doesn't slow polling down towards the processing deadline."""
+    scheduler = instagram.graph_api_scheduler()
+    scheduler.calls_per_hour, scheduler.call_burst = 1, 1
+    asyncio.run(scheduler.acquire(_IG_USER))
+    api = _FakeGraphApi(processing_checks=3)
+
+    requests, seconds = _wait_for(api, ["c0"], timeout=2)
+
+    assert requests == 4
+    assert seconds < 1
+
+
+def test_rate_limit_pause_does_not_count_against_the_processing_deadline(monkeypatch):
+    monkeypatch.setattr(rate_limits, "_DEFAULT_PAUSE_SECONDS", 0.4)
+    api = _FakeGraphApi(rate_limited_calls=1)
+
+    requests, seconds = _wait_for(api, ["c0"], timeout=0.3)
+
+    assert requests == 2
+    assert seconds >= 0.4
+
+
+def test_rate_limited_calls_wait_and_go_again(monkeypatch):
+    """A post that runs into the rate limit is held back, not failed."""
+    monkeypatch.setattr(rate_limits, "_DEFAULT_PAUSE_SECONDS", 0.05)
+    api = _FakeGraphApi(rate_limited_calls=2)
+
+    image_permalink, _ = _post(api, ["https://example.com/0.jpg"], None)
+
+    (image,) = api.created(image_url="https://example.com/0.jpg")
+    assert image_permalink == f"https://www.instagram.com/p/m-{image}/"
+    assert instagram.graph_api_scheduler().stats.rate_limited == 2
@@ -4,11 +4,19 @@ from datetime import UTC, datetime, timedelta
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from bov_data import BirdFeed, Media, Sighting
+import sentry_sdk
+from bov_data import BirdFeed, Media, Sighting, shutdown_runtime
 
 from curator.main import _is_too_many_squirrels, import_sighting
 
 
+@pytest.fixture(autouse=True)
+def fresh_runtime():
+    """Start each test with a new runtime so clients cached by one test don't leak into the next."""
+    yield
+    shutdown_runtime()
+
+
 @pytest.fixture
 def sample_sighting():
     return Sighting(
@@ -128,6 +136,35 @@ def test_import_sighting_posts_to_instagram(
     )
 
 
+@patch("curator.main.post_sighting", new_callable=AsyncMock, return_value=(None, None))
+@patch("curator.main.curate_videos", return_value=None)
+@patch("curator.main.curate_images", return_value=[])
+@patch(
+    "curator.main.get_weather",
+    return_value={
+        "temperature_f": 72.0,
+        "was_cloudy": False,
+        "was_precipitating": False,
+    },
+)
+def test_import_sighting_reuses_clients_across_requests(
+    mock_weather, _mock_images, _mock_videos, _mock_post, sample_sighting_json
+):
+    """Test that a warm instance reuses its db and http clients for every request."""
+    mock_db = _make_mock_db()
+    mock_db.exists_sighting = AsyncMock(return_value=False)
+    mock_db.create_sighting = AsyncMock(return_value="sighting_789")
+
+    with patch("curator.main.MongoClient", return_value=mock_db) as mock_mongo_client:
+        import_sighting(_make_request(sample_sighting_json))
+        import_sighting(_make_request(sample_sighting_json))
+
+    mock_mongo_client.assert_called_once()
+    first_client = mock_weather.call_args_list[0].kwargs["client"]
+    second_client = mock_weather.call_args_list[1].kwargs["client"]
+    assert first_client is second_client
+
+
 def test_import_sighting_duplicate(sample_sighting_json):
     """Test that duplicate sightings are rejected."""
     mock_db = _make_mock_db()
@@ -157,6 +194,24 @@ def test_import_sighting_empty_json():
     assert result == "request missing json body"
 
 
+def test_import_sighting_scopes_sentry_context_to_the_import(sample_sighting_json):
+    """The sighting context is set on the loop thread, on a scope of the import's own, so it
+    doesn't stay on the request thread's scope for whatever that reports next."""
+    contexts = []
+
+    async def _main(sighting):
+        event = sentry_sdk.get_isolation_scope().apply_to_event({}, {})
+        contexts.append(event.get("contexts", {}).get("sighting"))
+        return "imported"
+
+    with patch("curator.main.main", side_effect=_main), sentry_sdk.isolation_scope() as scope:
+        assert import_sighting(_make_request(sample_sighting_json)) == "imported"
+        request_event = scope.apply_to_event({}, {})
+
+    assert contexts == [sample_sighting_json]
+    assert "sighting" not in request_event.get("contexts", {})
+
+
 @patch(
     "curator.main.post_sighting",
     new_callable=AsyncMock,
@@ -0,0 +1,110 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+
+from curator import rate_limits
+from curator.rate_limits import GraphApiScheduler
+
+_ACCOUNT = "1789"
+
+
+def _response(status: int = 200, body: dict | None = None, **headers: dict) -> httpx.Response:
+    return httpx.Response(
+        status,
+        json=body or {},
+        headers={name.replace("_", "-"): json.dumps(value) for name, value in headers.items()},
+    )
+
+
+@pytest.fixture(autouse=True)
+def no_budget_from_env(monkeypatch):
+    monkeypatch.delenv("INSTAGRAM_CALLS_PER_HOUR", raising=False)
+    monkeypatch.delenv("INSTAGRAM_PUBLISHES_PER_DAY", raising=False)
+
+
+def test_calls_go_straight_out_without_a_budget():
+    """Only usage Meta reports holds calls back, unless the process keeps a budget."""
+    scheduler = GraphApiScheduler()
+
+    async def _run():
+        start = time.perf_counter()
+        await asyncio.gather(*(scheduler.acquire(_ACCOUNT, publish=True) for _ in range(100)))
+        return time.perf_counter() - start
+
+    assert asyncio.run(_run()) < 0.5
+    assert scheduler.stats.waited == 0
+    assert scheduler.utilisation(_ACCOUNT)["calls"] is None
+    assert scheduler.utilisation(_ACCOUNT)["publishes"] is None
+
+
+def test_calls_beyond_the_burst_are_paced():
+    """The first calls go straight out, later ones at the configured rate."""
+    scheduler = GraphApiScheduler(calls_per_hour=20 * 3600, call_burst=2)
+
+    async def _run():
+        start = time.perf_counter()
+        await asyncio.gather(*(scheduler.acquire(_ACCOUNT) for _ in range(5)))
+        return time.perf_counter() - start
+
+    seconds = asyncio.run(_run())
+
+    assert seconds == pytest.approx(3 / 20, abs=0.05)
+    assert scheduler.stats.calls == 5
+    assert scheduler.stats.waited == 3
+    assert scheduler.utilisation(_ACCOUNT)["calls"] > 0.5
+
+
+def test_waiting_publish_does_not_hold_up_other_calls():
+    scheduler = GraphApiScheduler(calls_per_hour=3600, publishes_per_day=1, call_burst=10)
+
+    async def _run():
+        await scheduler.acquire(_ACCOUNT, publish=True)
+        second_publish = asyncio.create_task(scheduler.acquire(_ACCOUNT, publish=True))
+        await asyncio.wait_for(scheduler.acquire(_ACCOUNT), 1)
+        assert not second_publish.done()
+        second_publish.cancel()
+
+    asyncio.run(_run())
+    assert scheduler.utilisation(_ACCOUNT)["publishes"] == pytest.approx(1.0, abs=0.01)
+
+
+def test_reported_usage_slows_and_then_stops_calls(monkeypatch):
+    monkeypatch.setattr(rate_limits, "_MAX_CALL_SPACING_SECONDS", 1.0)
+    scheduler = GraphApiScheduler()
+
+    scheduler.observe(_ACCOUNT, _response(x_app_usage={"call_count": 85, "total_time": 10}))
+    assert scheduler.utilisation(_ACCOUNT)["reported_usage_percent"] == pytest.approx(85)
+    assert scheduler.utilisation(_ACCOUNT)["paused_seconds"] == 0
+
+    async def _run():
+        start = time.perf_counter()
+        await asyncio.gather(*(scheduler.acquire(_ACCOUNT) for _ in range(3)))
+        return time.perf_counter() - start
+
+    # half way from slowing down to stopping, calls go out half the longest spacing apart
+    assert asyncio.run(_run()) == pytest.approx(2 * 0.5, abs=0.1)
+
+    buc = {"17841": [{"type": "instagram", "call_count": 30, "estimated_time_to_regain_access": 2}]}
+    scheduler.observe(_ACCOUNT, _response(x_business_use_case_usage=buc))
+    assert scheduler.utilisation(_ACCOUNT)["paused_seconds"] == pytest.approx(120, abs=1)
+
+
+@pytest.mark.parametrize(
+    "status, error, limited",
+    [
+        (400, {"code": 17, "message": "User request limit reached"}, True),
+        (400, {"code": 4, "message": "Application request limit reached"}, True),
+        (400, {"code": 4, "error_subcode": 2207051, "message": "spam"}, False),
+        (400, {"code": 100, "message": "Invalid parameter"}, False),
+        (429, {}, True),
+    ],
+)
+def test_rate_limit_errors_pause_the_account(status, error, limited):
+    scheduler = GraphApiScheduler()
+
+    assert scheduler.observe(_ACCOUNT, _response(status, {"error": error})) == limited
+    assert (scheduler.utilisation(_ACCOUNT)["paused_seconds"] > 0) == limited
+    assert scheduler.stats.rate_limited == int(limited)
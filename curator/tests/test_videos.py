@@ -0,0 +1,564 @@
+import asyncio
+import functools
+import http.server
+import math
+import os
+import shutil
+import subprocess
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+import cv2
+import numpy as np
+import pytest
+
+from curator import video_stream
+from curator.motion import (
+    ACTIVITY_PREROLL_SECONDS,
+    FAST_STILL_STEP,
+    MIN_MOTION_AREA,
+    MotionProfile,
+    active_spans,
+    detect_motion_segments,
+    motion_profile,
+    segments_from_profile,
+)
+from curator.motion_cache import cached_motion_profile
+from curator.video_ffmpeg import (
+    EncoderSettings,
+    _framecrc_packet,
+    cut_segments,
+    encoder_from_env,
+    ffmpeg_exe,
+    plan_chunks,
+    plan_cut,
+    probe,
+)
+from curator.video_pool import VideoPool, _kill
+from curator.video_stream import stream_motion_segments
+from curator.videos import _curate_video, curate_videos
+from curator.workspace import WorkspaceManager
+
+
+def test_video_pool_runs_job_in_worker_process():
+    """Results come back from a separate process along with its CPU time."""
+    pool = VideoPool(workers=1)
+
+    result = asyncio.run(pool.run(math.factorial, 20000))
+
+    assert result == math.factorial(20000)
+    assert pool.stats.completed == 1
+    assert pool.stats.last_cpu_seconds > 0
+    assert pool.running == 0
+
+
+def test_video_pool_reraises_job_errors():
+    """An exception raised by the job is raised to the caller."""
+    pool = VideoPool(workers=1)
+
+    with pytest.raises(ValueError, match="math domain error"):
+        asyncio.run(pool.run(math.sqrt, -1))
+
+    assert pool.stats.failed == 1
+
+
+def test_video_pool_kills_jobs_past_deadline():
+    """A job that overruns its timeout is killed rather than left running."""
+    pool = VideoPool(workers=1)
+
+    start = time.perf_counter()
+    with pytest.raises(TimeoutError):
+        asyncio.run(pool.run(time.sleep, 10, timeout=0.5))
+
+    assert time.perf_counter() - start < 5
+    assert pool.stats.timed_out == 1
+    assert pool.running == 0
+
+
+def _sleep_in_subprocess(pid_path: str) -> None:
+    child = subprocess.Popen(["sleep", "30"])
+    with open(pid_path, "w") as f:
+        f.write(str(child.pid))
+    child.wait()
+
+
+def test_video_pool_kills_subprocesses_of_jobs_past_deadline(tmp_path):
+    """Killing a job also kills the subprocesses it started, such as ffmpeg."""
+    pool = VideoPool(workers=1)
+    pid_path = str(tmp_path / "pid")
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(pool.run(_sleep_in_subprocess, pid_path, timeout=1))
+
+    with open(pid_path) as f:
+        child = int(f.read())
+    deadline = time.monotonic() + 5
+    while _is_running(child) and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert not _is_running(child)
+
+
+def _is_running(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # a killed child whose parent is gone lingers as a zombie until init reaps it
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except FileNotFoundError:
+        return False
+
+
+def test_kill_falls_back_to_the_worker_before_it_leads_a_group():
+    """A worker killed before it calls setpgrp has no process group, so it is killed alone."""
+    child = subprocess.Popen(["sleep", "30"])
+    process = MagicMock(pid=child.pid, exitcode=None, kill=child.kill)
+
+    _kill(process)
+
+    assert child.wait(timeout=5) == -9
+
+
+def test_video_pool_queues_beyond_worker_count_and_cancels():
+    """Jobs past the worker count wait in the queue; cancelling kills the running job."""
+    pool = VideoPool(workers=1)
+
+    async def _run():
+        first = asyncio.create_task(pool.run(time.sleep, 10))
+        second = asyncio.create_task(pool.run(time.sleep, 10))
+        await asyncio.sleep(0.5)
+        depth = pool.queue_depth, pool.running
+        for task in (first, second):
+            task.cancel()
+        await asyncio.gather(first, second, return_exceptions=True)
+        return depth
+
+    assert asyncio.run(_run()) == (1, 1)
+    assert pool.stats.cancelled == 2
+    assert pool.running == 0
+    assert pool.queue_depth == 0
+
+
+@pytest.fixture(scope="module", autouse=True)
+def motion_cache_dir(tmp_path_factory):
+    """Profiles cached by an earlier run must not answer for this one. Set before the first
+    ``VideoPool`` starts, so its workers see it too."""
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        directory = tmp_path_factory.mktemp("motion-cache")
+        monkeypatch.setenv("MOTION_CACHE_DIR", str(directory))
+        yield directory
+
+
+@pytest.fixture(scope="module")
+def motion_clip(tmp_path_factory) -> str:
+    """Six seconds of a static feeder with a bright "bird" moving through it from 2s to 4s,
+    as H.264 with a keyframe every second and a silent audio track."""
+    directory = tmp_path_factory.mktemp("videos")
+    raw, path = str(directory / "raw.mp4"), str(directory / "clip.mp4")
+    writer = cv2.VideoWriter(raw, cv2.VideoWriter_fourcc(*"mp4v"), 30, (640, 480))
+    rng = np.random.default_rng(0)
+    feeder = np.full((480, 640, 3), 90, np.uint8)
+    for i in range(180):
+        frame = feeder.copy()
+        if 60 <= i < 120:
+            x = 50 + (i - 60) * 6
+            cv2.rectangle(frame, (x, 100), (x + 120, 220), (220, 220, 230), -1)
+        noise = rng.integers(-3, 4, frame.shape)
+        writer.write(np.clip(frame.astype(np.int16) + noise, 0, 255).astype(np.uint8))
+    writer.release()
+    subprocess.run(
+        [
+            ffmpeg_exe(),
+            "-y",
+            "-loglevel",
+            "error",
+            "-i",
+            raw,
+            "-f",
+            "lavfi",
+            "-i",
+            "anullsrc=r=44100:cl=mono",
+            "-shortest",
+            "-c:v",
+            "libx264",
+            "-g",
+            "30",
+            "-c:a",
+            "aac",
+            path,
+        ],
+        check=True,
+    )
+    return path
+
+
+def _duration(path: str) -> float:
+    capture = cv2.VideoCapture(path)
+    duration = capture.get(cv2.CAP_PROP_FRAME_COUNT) / capture.get(cv2.CAP_PROP_FPS)
+    capture.release()
+    return duration
+
+
+def test_detect_motion_segments_uses_frame_timestamps(motion_clip):
+    """The moving subject is found where it is in the clip."""
+    segments, fps = detect_motion_segments(motion_clip, "full")
+
+    assert fps == 30.0
+    assert len(segments) == 1
+    start, end = segments[0]
+    assert start == pytest.approx(2.0, abs=0.1)
+    assert end == pytest.approx(4.0, abs=0.1)
+
+
+def test_fast_detection_matches_full_detection(motion_clip):
+    """Downscaled, adaptively sampled detection finds the same segments within one step."""
+    full, _ = detect_motion_segments(motion_clip, "full")
+    fast, _ = detect_motion_segments(motion_clip, "fast")
+
+    assert len(fast) == len(full)
+    for (fast_start, fast_end), (full_start, full_end) in zip(fast, full):
+        assert full_start - FAST_STILL_STEP / 30 <= fast_start <= full_start
+        assert fast_end == pytest.approx(full_end, abs=2 / 30)
+
+
+@pytest.mark.parametrize("detection", ["full", "fast", "packets"])
+def test_segments_from_profile_redo_detection_for_other_thresholds(motion_clip, detection):
+    """The profile gives the detected segments back, and others for other thresholds."""
+    profile = motion_profile(motion_clip, detection)
+
+    assert segments_from_profile(profile) == detect_motion_segments(motion_clip, detection)[0]
+    assert segments_from_profile(profile, min_area=10**9) == []
+    lower = segments_from_profile(profile, min_area=MIN_MOTION_AREA / 2)
+    assert sum(end - start for start, end in lower) >= sum(
+        end - start for start, end in segments_from_profile(profile)
+    )
+
+
+def test_segments_from_profile_merges_with_given_gap():
+    """Runs are segmented separately, then merged as close as ``merge_gap`` says."""
+    times = np.arange(100) / 10
+    areas = np.where(((times >= 1) & (times < 2)) | ((times >= 3) & (times < 4)), 9000.0, 0.0)
+    profile = MotionProfile(10.0, times, areas, np.array([0]))
+
+    assert segments_from_profile(profile) == pytest.approx([(1.0, 3.9)])
+    assert segments_from_profile(profile, merge_gap=0.5) == pytest.approx([(1.0, 1.9), (3.0, 3.9)])
+    # a run that ends in motion closes its segment after its last frame
+    split = MotionProfile(10.0, times, areas, np.array([0, 15]))
+    assert segments_from_profile(split, merge_gap=-1) == pytest.approx(
+        [(1.0, 1.5), (1.5, 1.9), (3.0, 3.9)]
+    )
+
+
+def test_cached_motion_profile_decodes_a_video_once(motion_clip, motion_cache_dir, tmp_path):
+    """The same bytes under another name come from the cache, the strategy is part of the key,
+    and an unreadable entry is analysed again."""
+    copy = tmp_path / "copy.mp4"
+    shutil.copy(motion_clip, copy)
+    first = cached_motion_profile(motion_clip, "full")
+
+    with patch("curator.motion_cache.motion_profile", wraps=motion_profile) as detect:
+        again = cached_motion_profile(str(copy), "full")
+        assert not detect.called
+        cached_motion_profile(str(copy), "fast")
+        assert detect.call_count == 1
+        for entry in motion_cache_dir.glob("*-full-*.npz"):
+            entry.write_bytes(b"not a zip")
+        cached_motion_profile(str(copy), "full")
+        assert detect.call_count == 2
+
+    assert again.fps == first.fps
+    np.testing.assert_array_equal(again.times, first.times)
+    np.testing.assert_array_equal(again.areas, first.areas)
+    np.testing.assert_array_equal(again.runs, first.runs)
+
+
+def test_probe_finds_keyframes_and_audio(motion_clip):
+    video_probe = probe(motion_clip)
+
+    assert video_probe.keyframes == pytest.approx([0, 1, 2, 3, 4, 5])
+    assert video_probe.has_audio
+
+
+def test_plan_cut_stream_copies_only_when_starts_snap_to_keyframes():
+    """Starts move back onto a nearby keyframe; one start without a keyframe forces an encode."""
+    keyframes = [0.0, 2.0, 4.0, 6.0]
+
+    assert plan_cut([(2.3, 3.0), (6.0, 7.0)], keyframes) == ([(2.0, 3.0), (6.0, 7.0)], True)
+    assert plan_cut([(2.3, 3.0), (5.0, 5.5)], keyframes) == ([(2.3, 3.0), (5.0, 5.5)], False)
+
+
+@pytest.mark.parametrize(
+    "start, expected_duration",
+    [
+        (2.5, 2.0),  # snapped back to the keyframe at 2s and stream-copied
+        (2.7, 1.3),  # too far from a keyframe, trimmed and re-encoded
+    ],
+)
+def test_cut_segments_single_pass(motion_clip, start, expected_duration):
+    """Segments are cut in one ffmpeg pass, by stream copy when a keyframe is close enough."""
+    output = cut_segments(motion_clip, [(start, 4.0)], probe(motion_clip), 30.0)
+
+    try:
+        assert _duration(output) == pytest.approx(expected_duration, abs=0.1)
+    finally:
+        os.unlink(output)
+
+
+def test_curate_video_ffmpeg_engine(motion_clip, tmp_path):
+    """The default engine returns just the motion, without touching the source file."""
+    source = tmp_path / "source.mp4"
+    shutil.copy(motion_clip, source)
+    before = source.read_bytes()
+
+    output = _curate_video(str(source))
+
+    assert output is not None
+    try:
+        # fast detection may start the segment up to one sampling step early
+        assert _duration(output) == pytest.approx(2.0, abs=0.25)
+        assert source.read_bytes() == before
+    finally:
+        os.unlink(output)
+
+
+@pytest.fixture(scope="module")
+def video_server(motion_clip):
+    """Serves the clip with ``+faststart`` (index first), and looped to twice its length
+    with the index at the end, too big for ffmpeg to buffer while reading from a pipe."""
+    directory = os.path.dirname(motion_clip)
+    for name, args in [
+        ("faststart.mp4", ["-i", motion_clip, "-movflags", "+faststart"]),
+        ("looped.mp4", ["-stream_loop", "1", "-i", motion_clip]),
+        # a second video stream, like cover art, adds a stream to ffmpeg's log
+        (
+            "two-streams.mp4",
+            ["-i", motion_clip, "-i", motion_clip, "-map", "0:v", "-map", "1:v"]
+            + ["-movflags", "+faststart"],
+        ),
+    ]:
+        subprocess.run(
+            [ffmpeg_exe(), "-y", "-loglevel", "error", *args, "-c", "copy"]
+            + [os.path.join(directory, name)],
+            check=True,
+        )
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(
+        ("127.0.0.1", 0), functools.partial(Handler, directory=directory)
+    )
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+@pytest.mark.parametrize(
+    "name, streamed",
+    [("faststart.mp4", True), ("looped.mp4", False), ("two-streams.mp4", True)],
+)
+def test_stream_motion_segments_matches_file_detection(video_server, tmp_path, name, streamed):
+    """Motion found while downloading matches detection on the downloaded file; a video that
+    can't be decoded from a pipe falls back to analysing the file."""
+    file_path = str(tmp_path / name)
+
+    with patch(
+        "curator.video_stream.cached_motion_profile", wraps=cached_motion_profile
+    ) as fallback:
+        segments, fps = stream_motion_segments(f"{video_server}/{name}", file_path)
+    expected, expected_fps = detect_motion_segments(file_path, "fast")
+
+    assert fallback.called != streamed
+    assert fps == expected_fps
+    assert len(segments) == len(expected)
+    for (start, end), (expected_start, expected_end) in zip(segments, expected):
+        # either may start up to one sampling step early
+        assert start == pytest.approx(expected_start, abs=FAST_STILL_STEP / 30)
+        assert end == pytest.approx(expected_end, abs=2 / 30)
+
+
+def test_stream_sizes_read_from_the_output_section():
+    """Extra input streams, such as cover art, don't hide the size of the decoded frames."""
+    header = """Input #0, mov,mp4,m4a,3gp,3g2,mj2, from 'pipe:0':
+  Stream #0:0[0x1](und): Video: h264 (High) (avc1 / 0x31637661), yuv420p, 1920x1080, 2400 kb/s, 25 fps, 25 tbr
+  Stream #0:1[0x2](und): Video: mjpeg (Baseline), yuvj420p, 600x600, 90k tbr (attached pic)
+Stream mapping:
+  Stream #0:0 -> #0:0 (h264 (native) -> rawvideo (native))
+Output #0, rawvideo, to 'pipe:1':
+  Stream #0:0(und): Video: rawvideo (Y800 / 0x30303859), gray, 320x180, q=2-31, 30 fps
+"""
+
+    assert video_stream._stream_sizes(header) == (1920, (320, 180), 25.0)
+    assert video_stream._stream_sizes(header.partition("Output #0")[0]) is None
+
+
+def test_streamed_motion_profile_is_cached(video_server, tmp_path):
+    """A video analysed while downloading isn't decoded again when curated from the file."""
+    file_path = str(tmp_path / "faststart.mp4")
+    segments, fps = stream_motion_segments(f"{video_server}/faststart.mp4", file_path)
+
+    with patch("curator.motion_cache.motion_profile") as decode:
+        profile = cached_motion_profile(file_path)
+
+    decode.assert_not_called()
+    assert profile.fps == fps
+    assert segments_from_profile(profile) == segments
+
+
+def test_curate_videos_streaming(video_server):
+    """With ``VIDEO_STREAMING`` the worker downloads and analyses the video in one go."""
+    with patch.dict(os.environ, {"VIDEO_STREAMING": "true"}):
+        output = asyncio.run(
+            curate_videos([f"{video_server}/faststart.mp4"], pool=VideoPool(workers=1))
+        )
+
+    assert output is not None
+    try:
+        assert _duration(output) == pytest.approx(2.0, abs=0.25)
+    finally:
+        os.unlink(output)
+
+
+def test_curate_videos_leaves_out_videos_that_fail(video_server):
+    """A video that can't be downloaded doesn't cost the sighting its other videos."""
+    output = asyncio.run(
+        curate_videos(
+            [f"{video_server}/missing.mp4", f"{video_server}/faststart.mp4"],
+            pool=VideoPool(workers=1),
+        )
+    )
+
+    assert output is not None
+    try:
+        assert _duration(output) == pytest.approx(2.0, abs=0.25)
+    finally:
+        os.unlink(output)
+
+
+def test_curate_videos_keeps_the_first_clip_when_the_join_fails(video_server, tmp_path):
+    """A join that fails falls back to the first clip; the other clips are removed."""
+    urls = [f"{video_server}/faststart.mp4", f"{video_server}/looped.mp4"]
+    manager = WorkspaceManager(root=str(tmp_path))
+
+    async def _run():
+        async with manager.workspace("sighting") as workspace:
+            with patch("curator.videos.join_clips", side_effect=RuntimeError("ffmpeg failed")):
+                output = await curate_videos(urls, pool=VideoPool(workers=1), workspace=workspace)
+            assert output is not None
+            assert os.listdir(workspace.path) == [os.path.basename(output)]
+            assert _duration(output) == pytest.approx(2.0, abs=0.25)
+
+    asyncio.run(_run())
+
+
+@pytest.mark.parametrize(
+    "line, expected",
+    [
+        ("0,          0,          0,      512,    18311, 0x4a1b2c3d", (0.0, 18311, True)),
+        ("0,        512,        512,      512,      913, 0x1f2e3d4c, F=0x0", (1.0, 913, False)),
+        (
+            "0,       1024,       1024,      512,    17002, 0x5e6f7a8b, S=1, 0x00ab12cd",
+            (2.0, 17002, True),
+        ),
+        (
+            "0,       1536,       1536,      512,      850, 0x9a8b7c6d, F=0x0, S=1, 0x00ab12cd",
+            (3.0, 850, False),
+        ),
+    ],
+)
+def test_framecrc_packet_finds_flags_by_prefix(line, expected):
+    """Flags are found by their F= prefix, so side data on a keyframe doesn't trip it up."""
+    assert _framecrc_packet(line, 1 / 512) == expected
+
+
+def test_active_spans_flags_windows_with_larger_packets():
+    """Windows between keyframes whose frames are bigger than the quiet ones are decoded,
+    starting a little early; keyframe sizes don't count."""
+    packets = [
+        (i / 30, 5000 if i % 30 == 0 else 300 if 60 <= i < 120 else 100, i % 30 == 0)
+        for i in range(180)
+    ]
+
+    assert active_spans(packets) == pytest.approx([(2.0 - ACTIVITY_PREROLL_SECONDS, 119 / 30)])
+
+
+def test_packet_detection_matches_full_detection(motion_clip):
+    """Decoding only where the bitrate rises finds the same motion as the fast detector."""
+    full, _ = detect_motion_segments(motion_clip, "full")
+    packets, _ = detect_motion_segments(motion_clip, "packets")
+
+    assert len(packets) == len(full)
+    for (start, end), (full_start, full_end) in zip(packets, full):
+        assert full_start - FAST_STILL_STEP / 30 <= start <= full_start + 1 / 30
+        assert end == pytest.approx(full_end, abs=2 / 30)
+
+
+def test_plan_chunks_splits_segments_evenly_across_workers():
+    """Long segments are split so each worker gets about the same amount to encode."""
+    assert plan_chunks([(0.0, 8.0), (10.0, 12.0)], workers=5) == [
+        (0.0, 2.0),
+        (2.0, 4.0),
+        (4.0, 6.0),
+        (6.0, 8.0),
+        (10.0, 12.0),
+    ]
+    # never below the minimum chunk length
+    assert plan_chunks([(0.0, 3.0)], workers=8) == [(0.0, 1.5), (1.5, 3.0)]
+
+
+def test_encoder_from_env(monkeypatch):
+    monkeypatch.setenv("VIDEO_PRESET", "veryfast")
+    monkeypatch.setenv("VIDEO_CRF", "28")
+    monkeypatch.setenv("VIDEO_ENCODE_WORKERS", "3")
+
+    assert encoder_from_env() == EncoderSettings(preset="veryfast", crf=28, workers=3)
+
+
+def test_encoder_defaults_share_the_cores_with_other_pool_jobs(monkeypatch):
+    """On 4 cores the pool runs 2 jobs, so each job encodes with 2 workers of 1 thread,
+    or with 2 threads in a single pass."""
+    monkeypatch.delenv("VIDEO_ENCODE_WORKERS", raising=False)
+    monkeypatch.delenv("VIDEO_ENCODE_THREADS", raising=False)
+    monkeypatch.delenv("VIDEO_WORKERS", raising=False)
+    monkeypatch.setattr(os, "cpu_count", lambda: 4)
+
+    encoder = encoder_from_env()
+
+    assert encoder.workers == 2
+    assert encoder.threads_per_worker() == 1
+    assert encoder.single_pass_threads() == 2
+
+
+def test_cut_segments_parallel_chunks(motion_clip):
+    """Chunks encoded side by side join into one clip of the right length, with audio."""
+    encoder = EncoderSettings(preset="ultrafast", workers=2)
+    # 0.7s is too far from a keyframe to stream-copy
+    output = cut_segments(motion_clip, [(0.7, 5.7)], probe(motion_clip), 30.0, encoder)
+
+    try:
+        assert _duration(output) == pytest.approx(5.0, abs=0.1)
+        assert probe(output).has_audio
+    finally:
+        os.unlink(output)
+
+
+def test_curate_videos_joins_every_video(motion_clip, video_server, tmp_path):
+    """Each video of a sighting is curated and their motion joined into one clip, inside
+    the job's workspace; the downloaded sources don't stay around until the job ends."""
+    urls = [f"{video_server}/faststart.mp4", f"{video_server}/looped.mp4"]
+    manager = WorkspaceManager(root=str(tmp_path))
+
+    async def _run():
+        async with manager.workspace("sighting") as workspace:
+            output = await curate_videos(urls, pool=VideoPool(workers=2), workspace=workspace)
+            assert output is not None
+            assert os.listdir(workspace.path) == [os.path.basename(output)]
+            # two seconds of motion in the first, and twice that in the looped one
+            assert _duration(output) == pytest.approx(6.0, abs=0.5)
+            assert probe(output).has_audio
+
+    asyncio.run(_run())
+
+    assert os.listdir(tmp_path) == []
+    # both downloads count, though they were deleted before the job ended
+    assert manager.stats.bytes_written > 3 * os.path.getsize(motion_clip)
@@ -0,0 +1,376 @@
+import asyncio
+from datetime import UTC, date, datetime, timedelta, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import pytest
+from bov_data import BirdFeed, Geocode, Sighting
+
+from curator import weather
+from curator.weather import _geocode_zip, geocode_cache_stats
+
+_GEOCODE_URL = "https://geocoding-api.open-meteo.com/v1/search"
+
+
+def _clear_caches():
+    weather._geocode_cache.clear()
+    weather._geocode_stats.clear()
+    weather._hourly_cache.clear()
+    weather._hourly_inflight.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_weather_caches():
+    _clear_caches()
+    yield
+    _clear_caches()
+
+
+def _geocode_client(results: list[dict]) -> tuple[httpx.AsyncClient, list[httpx.Request]]:
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={"results": results})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requests
+
+
+def _make_store(geocode=None):
+    store = MagicMock()
+    store.get_geocode = AsyncMock(return_value=geocode)
+    store.save_geocode = AsyncMock()
+    return store
+
+
+def test_geocode_zip_caches_in_process():
+    """Repeat lookups for the same zip are served from memory."""
+    client, requests = _geocode_client([{"latitude": 39.9, "longitude": -105.1}])
+
+    async def _run():
+        first = await _geocode_zip(client, "80027")
+        second = await _geocode_zip(client, "80027")
+        return first, second
+
+    first, second = asyncio.run(_run())
+
+    assert first == second == (39.9, -105.1)
+    assert len(requests) == 1
+    assert str(requests[0].url).startswith(_GEOCODE_URL)
+    stats = geocode_cache_stats()
+    assert stats["memory_hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["hit_rate"] == 0.5
+
+
+def test_geocode_zip_reads_and_writes_persistent_store():
+    """A store hit skips the API; a miss is written back to the store."""
+    client, requests = _geocode_client([{"latitude": 1.0, "longitude": 2.0}])
+    stored = Geocode(zip_code="80027", latitude=39.9, longitude=-105.1)
+    store = _make_store(stored)
+
+    assert asyncio.run(_geocode_zip(client, "80027", store)) == (39.9, -105.1)
+    assert requests == []
+
+    store = _make_store(None)
+    assert asyncio.run(_geocode_zip(client, "10001", store)) == (1.0, 2.0)
+    store.save_geocode.assert_awaited_once()
+    assert store.save_geocode.call_args[0][0].zip_code == "10001"
+
+
+def test_geocode_zip_negative_caching():
+    """Unknown zips are remembered so the API isn't asked again."""
+    client, requests = _geocode_client([])
+
+    async def _run():
+        for _ in range(2):
+            with pytest.raises(ValueError, match="Could not geocode"):
+                await _geocode_zip(client, "00000")
+
+    asyncio.run(_run())
+
+    assert len(requests) == 1
+    assert geocode_cache_stats()["negatives"] == 2
+
+
+def test_geocode_zip_expired_negative_is_retried():
+    """A stale negative entry from the store triggers a fresh lookup."""
+    client, requests = _geocode_client([{"latitude": 39.9, "longitude": -105.1}])
+    stale = Geocode(zip_code="80027", resolved_at=datetime.now(UTC) - timedelta(days=30))
+
+    result = asyncio.run(_geocode_zip(client, "80027", _make_store(stale)))
+
+    assert result == (39.9, -105.1)
+    assert len(requests) == 1
+
+
+def _hourly_series(day: str) -> dict:
+    return {
+        "time": [f"{day}T{h:02d}:00" for h in range(24)],
+        "temperature_2m": [float(h) for h in range(24)],
+        "cloud_cover": [0] * 24,
+        "precipitation": [0.0] * 24,
+    }
+
+
+def _weather_client(delay: float = 0.0) -> tuple[httpx.AsyncClient, list[httpx.Request]]:
+    requests: list[httpx.Request] = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        await asyncio.sleep(delay)
+        day = request.url.params.get("start_date", datetime.now(UTC).date().isoformat())
+        return httpx.Response(200, json={"hourly": _hourly_series(day)})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requests
+
+
+def test_get_weather_skips_geocoding_with_coordinates():
+    """Known coordinates go straight to the weather API."""
+    client, requests = _weather_client()
+    dt = datetime(2024, 1, 1, 14, tzinfo=UTC)
+
+    result = asyncio.run(
+        weather.get_weather("80027", dt, client=client, coordinates=(39.9, -105.1))
+    )
+
+    assert result["temperature_f"] == 14.0
+    assert len(requests) == 1
+    assert requests[0].url.host == "archive-api.open-meteo.com"
+
+
+def test_get_weather_reuses_day_series():
+    """Sightings on the same day at the same feeder share one archive request."""
+    client, requests = _weather_client()
+    coordinates = (39.9, -105.1)
+
+    async def _run():
+        morning = await weather.get_weather(
+            "80027", datetime(2024, 1, 1, 8, tzinfo=UTC), client=client, coordinates=coordinates
+        )
+        evening = await weather.get_weather(
+            "80027", datetime(2024, 1, 1, 20, tzinfo=UTC), client=client, coordinates=coordinates
+        )
+        return morning, evening
+
+    morning, evening = asyncio.run(_run())
+
+    assert morning["temperature_f"] == 8.0
+    assert evening["temperature_f"] == 20.0
+    assert len(requests) == 1
+
+
+def test_get_weather_coalesces_concurrent_requests():
+    """Concurrent lookups for the same day wait on a single in-flight request."""
+    client, requests = _weather_client(delay=0.05)
+    coordinates = (39.9, -105.1)
+
+    async def _run():
+        return await asyncio.gather(
+            *(
+                weather.get_weather(
+                    "80027",
+                    datetime(2024, 1, 1, hour, tzinfo=UTC),
+                    client=client,
+                    coordinates=coordinates,
+                )
+                for hour in range(10)
+            )
+        )
+
+    results = asyncio.run(_run())
+
+    assert [r["temperature_f"] for r in results] == [float(h) for h in range(10)]
+    assert len(requests) == 1
+    assert weather._hourly_inflight == {}
+
+
+def test_get_hourly_doesnt_share_requests_on_caller_scoped_clients():
+    """A request on a client closed when its caller returns is neither joined nor joins."""
+    shared, shared_requests = _weather_client(delay=0.05)
+    scoped, scoped_requests = _weather_client(delay=0.05)
+    day = date(2024, 1, 1)
+
+    async def _run():
+        return await asyncio.gather(
+            weather._get_hourly(shared, 39.9, -105.1, day),
+            weather._get_hourly(scoped, 39.9, -105.1, day, shared=False),
+            weather._get_hourly(scoped, 39.9, -105.1, day, shared=False),
+        )
+
+    asyncio.run(_run())
+
+    assert (len(shared_requests), len(scoped_requests)) == (1, 2)
+
+
+def test_get_weather_today_entries_expire():
+    """Forecast series for today are refetched once their TTL has passed."""
+    client, requests = _weather_client()
+    now = datetime.now(UTC)
+    dt = datetime(now.year, now.month, now.day, 0, tzinfo=UTC)
+
+    asyncio.run(weather.get_weather("80027", dt, client=client, coordinates=(39.9, -105.1)))
+    for entry in weather._hourly_cache.values():
+        entry.expires_at = 0.0
+    asyncio.run(weather.get_weather("80027", dt, client=client, coordinates=(39.9, -105.1)))
+
+    assert len(requests) == 2
+    assert requests[0].url.host == "api.open-meteo.com"
+
+
+def _archive_response(request: httpx.Request) -> httpx.Response:
+    """Every hour in the requested range; temperature = day * 100 + hour."""
+    start = date.fromisoformat(request.url.params["start_date"])
+    end = date.fromisoformat(request.url.params["end_date"])
+    times, temps = [], []
+    day = start
+    while day <= end:
+        for h in range(24):
+            times.append(f"{day.isoformat()}T{h:02d}:00")
+            temps.append(day.day * 100 + h)
+        day += timedelta(days=1)
+    hourly = {
+        "time": times,
+        "temperature_2m": temps,
+        "cloud_cover": [80] * len(times),
+        "precipitation": [0.0] * len(times),
+    }
+    return httpx.Response(200, json={"hourly": hourly})
+
+
+def _range_client() -> tuple[httpx.AsyncClient, list[httpx.Request]]:
+    """Archive mock that serves every hour in the requested range."""
+    requests: list[httpx.Request] = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return _archive_response(request)
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), requests
+
+
+def _located_sighting(bb_id: str, created_at: datetime, lat: float = 39.9) -> Sighting:
+    return Sighting(
+        bb_id=bb_id,
+        user_id="user_456",
+        bird_feed=BirdFeed(brand="Test Brand", product="Test Product"),
+        location_zip="80027",
+        species=["Blue Jay"],
+        created_at=created_at,
+        latitude=lat,
+        longitude=-105.1,
+    )
+
+
+def test_backfill_weather_one_call_per_location_and_range():
+    """Sightings are grouped by location and contiguous dates, one archive call per group."""
+    client, requests = _range_client()
+    sightings = [
+        _located_sighting("a", datetime(2024, 1, 1, 8, tzinfo=UTC)),
+        _located_sighting("b", datetime(2024, 1, 2, 9, tzinfo=UTC)),
+        _located_sighting("c", datetime(2024, 1, 3, 10, tzinfo=UTC)),
+        _located_sighting("d", datetime(2024, 2, 20, 11, tzinfo=UTC)),
+        _located_sighting("e", datetime(2024, 1, 2, 12, tzinfo=UTC), lat=40.5),
+    ]
+
+    updated = asyncio.run(weather.backfill_weather(sightings, client=client))
+
+    assert len(updated) == 5
+    assert len(requests) == 3
+    ranges = sorted(
+        (r.url.params["latitude"], r.url.params["start_date"], r.url.params["end_date"])
+        for r in requests
+    )
+    assert ranges == [
+        ("39.9", "2024-01-01", "2024-01-03"),
+        ("39.9", "2024-02-20", "2024-02-20"),
+        ("40.5", "2024-01-02", "2024-01-02"),
+    ]
+    temps = {s.bb_id: s.weather.temperature_f for s in sightings}
+    assert temps == {"a": 108.0, "b": 209.0, "c": 310.0, "d": 2011.0, "e": 212.0}
+    assert all(s.weather.was_cloudy for s in sightings)
+
+
+def test_backfill_weather_joins_on_utc_hour():
+    """Sightings with a non-UTC offset are matched to the UTC hour the archive reports."""
+    client, _ = _range_client()
+    mountain = timezone(timedelta(hours=-7))
+    sighting = _located_sighting("a", datetime(2024, 1, 1, 20, tzinfo=mountain))
+
+    asyncio.run(weather.backfill_weather([sighting], client=client))
+
+    # 20:00 at UTC-7 is 03:00 UTC on Jan 2
+    assert sighting.weather.temperature_f == 203.0
+
+
+def test_backfill_weather_skips_ranges_without_hours():
+    """An archive response with no hours leaves its sightings untouched."""
+    empty = {"time": [], "temperature_2m": [], "cloud_cover": [], "precipitation": []}
+    client = httpx.AsyncClient(
+        transport=httpx.MockTransport(lambda request: httpx.Response(200, json={"hourly": empty}))
+    )
+    sighting = _located_sighting("a", datetime(2024, 1, 1, 8, tzinfo=UTC))
+
+    updated = asyncio.run(weather.backfill_weather([sighting], client=client))
+
+    assert updated == []
+    assert sighting.weather is None
+
+
+def test_backfill_weather_keeps_what_it_could_fetch():
+    """A failed range or forecast skips its sightings, not the whole backfill."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if request.url.params["latitude"] == "40.5" or request.url.host == "api.open-meteo.com":
+            return httpx.Response(500)
+        return _archive_response(request)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    sightings = [
+        _located_sighting("a", datetime(2024, 1, 1, 8, tzinfo=UTC)),
+        _located_sighting("b", datetime(2024, 1, 2, 9, tzinfo=UTC), lat=40.5),
+        _located_sighting("today", datetime.now(UTC)),
+    ]
+
+    updated = asyncio.run(weather.backfill_weather(sightings, client=client))
+
+    assert [s.bb_id for s in updated] == ["a"]
+    assert sightings[1].weather is None
+    assert sightings[2].weather is None
+
+
+def test_hourly_series_lookup_by_utc_hour():
+    """Lookups use the UTC hour regardless of the datetime's offset, across day boundaries."""
+    payload = {
+        "time": [f"2024-01-0{d}T{h:02d}:00" for d in (1, 2) for h in range(24)],
+        "temperature_2m": [float(d * 100 + h) for d in (1, 2) for h in range(24)],
+        "cloud_cover": [0] * 48,
+        "precipitation": [None] * 24 + [0.1] * 24,
+    }
+    series = weather._HourlySeries.from_payload(payload)
+    mountain = timezone(timedelta(hours=-7))
+
+    # 20:00 at UTC-7 on Jan 1 is 03:00 UTC on Jan 2
+    assert series.at(datetime(2024, 1, 1, 20, 30, tzinfo=mountain)) == {
+        "temperature_f": 203.0,
+        "was_cloudy": False,
+        "was_precipitating": True,
+    }
+    # naive datetimes are treated as UTC
+    assert series.at(datetime(2024, 1, 2, 5))["temperature_f"] == 205.0
+    # null hours and hours outside the series have no weather
+    assert series.at(datetime(2024, 1, 1, 5, tzinfo=UTC)) is None
+    assert series.at(datetime(2024, 1, 3, 0, tzinfo=UTC)) is None
+
+
+def test_get_weather_requests_gmt_series():
+    """Every request pins the response timezone so hours line up with UTC."""
+    client, requests = _weather_client()
+
+    asyncio.run(
+        weather.get_weather(
+            "80027", datetime(2024, 1, 1, 14, tzinfo=UTC), client=client, coordinates=(1.0, 2.0)
+        )
+    )
+
+    assert requests[0].url.params["timezone"] == "GMT"
@@ -0,0 +1,92 @@
+import asyncio
+import os
+from pathlib import Path
+
+import pytest
+
+from curator.videos import MAX_CONCURRENT_VIDEOS, MAX_VIDEO_SIZE_MB, workspace_reserve_bytes
+from curator.workspace import WorkspaceManager
+
+
+def test_workspace_files_are_unique_and_removed(tmp_path):
+    """Jobs get directories of their own, even for the same file name, and nothing is left
+    once they end; what they wrote is counted."""
+    manager = WorkspaceManager(root=str(tmp_path))
+
+    async def _run():
+        async with manager.workspace("a") as first, manager.workspace("b") as second:
+            paths = [first.file("clip.mp4"), first.file("clip.mp4"), second.file("clip.mp4")]
+            for path in paths:
+                Path(path).write_bytes(b"x" * 100)
+            first.remove(paths[0])
+            return paths
+
+    paths = asyncio.run(_run())
+
+    assert len(set(paths)) == 3
+    assert os.listdir(tmp_path) == []
+    assert manager.stats.bytes_written == 300
+    assert manager.stats.opened == manager.stats.closed == 2
+
+
+def test_workspace_removed_when_job_fails(tmp_path):
+    manager = WorkspaceManager(root=str(tmp_path))
+
+    async def _run():
+        async with manager.workspace("job") as workspace:
+            Path(workspace.file("partial.mp4")).touch()
+            raise RuntimeError("download failed")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(_run())
+
+    assert os.listdir(tmp_path) == []
+    assert manager.stats.reserved_bytes == 0
+
+
+def test_workspace_budget_applies_backpressure(tmp_path):
+    """A job whose reservation doesn't fit waits for running jobs to finish."""
+    manager = WorkspaceManager(root=str(tmp_path), budget_bytes=100)
+    order = []
+
+    async def job(name: str, hold: float):
+        async with manager.workspace(name, reserve_bytes=60):
+            order.append(f"{name} start")
+            await asyncio.sleep(hold)
+            order.append(f"{name} end")
+
+    async def _run():
+        await asyncio.gather(job("first", 0.1), job("second", 0))
+
+    asyncio.run(_run())
+
+    assert order == ["first start", "first end", "second start", "second end"]
+    assert manager.stats.waited == 1
+
+
+def test_jobs_without_a_reservation_never_wait(tmp_path):
+    """Sightings without videos need no temp space, so a full budget doesn't hold them up."""
+    manager = WorkspaceManager(root=str(tmp_path), budget_bytes=100)
+    order = []
+
+    async def job(name: str, reserve_bytes: int, hold: float):
+        async with manager.workspace(name, reserve_bytes):
+            order.append(f"{name} start")
+            await asyncio.sleep(hold)
+            order.append(f"{name} end")
+
+    async def _run():
+        await asyncio.gather(job("video", 200, 0.1), job("images", 0, 0))
+
+    asyncio.run(_run())
+
+    assert order == ["video start", "images start", "images end", "video end"]
+    assert manager.stats.waited == 0
+
+
+def test_sighting_reservation_covers_the_videos_on_disk_at_once():
+    size = MAX_VIDEO_SIZE_MB * 1024 * 1024
+
+    assert workspace_reserve_bytes([]) == 0
+    assert workspace_reserve_bytes(["a.mp4"]) == size
+    assert workspace_reserve_bytes(["a.mp4", "b.mp4", "c.mp4"]) == MAX_CONCURRENT_VIDEOS * size
@@ -1,9 +1,23 @@
 """Birds of Vinca Data Access Layer."""
 
-from bov_data.data import BirdBuddy, BirdFeed, Media, Sighting, User, Weather
+from bov_data.data import BirdBuddy, BirdFeed, Geocode, Media, Sighting, User, Weather
 from bov_data.db import DB
 from bov_data.mongo import MongoClient
+from bov_data.runtime import Runtime, get_runtime, shutdown_runtime
 
 __version__ = "0.1.0"
 
-__all__ = ["BirdBuddy", "BirdFeed", "DB", "MongoClient", "Media", "Sighting", "User", "Weather"]
+__all__ = [
+    "BirdBuddy",
+    "BirdFeed",
+    "DB",
+    "Geocode",
+    "MongoClient",
+    "Media",
+    "Runtime",
+    "Sighting",
+    "User",
+    "Weather",
+    "get_runtime",
+    "shutdown_runtime",
+]
@@ -17,6 +17,10 @@ class BirdBuddy:
     location_zip: str
     feed: BirdFeed
     last_polled_at: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    # the zip the coordinates were resolved for
+    coordinates_zip: Optional[str] = None
 
     def __post_init__(self) -> None:
         if isinstance(self.feed, dict):
@@ -24,6 +28,15 @@ class BirdBuddy:
         if isinstance(self.last_polled_at, str):
             self.last_polled_at = datetime.fromisoformat(self.last_polled_at)
 
+    @property
+    def located(self) -> bool:
+        """Whether the coordinates are known and belong to the current ``location_zip``."""
+        return (
+            self.latitude is not None
+            and self.longitude is not None
+            and self.coordinates_zip == self.location_zip
+        )
+
 
 @dataclass
 class User:
@@ -40,6 +53,24 @@ class User:
             self.created_at = datetime.fromisoformat(self.created_at)
 
 
+@dataclass
+class Geocode:
+    """A resolved zip code. Unknown zips are stored without coordinates as a negative entry."""
+
+    zip_code: str
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
+    resolved_at: Optional[datetime] = None
+
+    def __post_init__(self) -> None:
+        if isinstance(self.resolved_at, str):
+            self.resolved_at = datetime.fromisoformat(self.resolved_at)
+
+    @property
+    def found(self) -> bool:
+        return self.latitude is not None and self.longitude is not None
+
+
 @dataclass
 class Weather:
     temperature_f: float
@@ -66,6 +97,8 @@ class Sighting:
     media: Optional[Media] = None
     weather: Optional[Weather] = None
     created_at: Optional[datetime] = None
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
     def __post_init__(self) -> None:
         if isinstance(self.bird_feed, dict):
@@ -1,7 +1,7 @@
 from datetime import datetime
 from typing import Optional, Protocol
 
-from bov_data.data import BirdBuddy, Sighting, User
+from bov_data.data import BirdBuddy, Geocode, Sighting, User, Weather
 
 
 class DB(Protocol):
@@ -13,6 +13,14 @@ class DB(Protocol):
 
     async def create_sighting(self, sighting: Sighting) -> str: ...
 
+    async def fetch_sightings(self, without_weather: bool = False) -> list[Sighting]: ...
+
+    async def update_sightings_weather(self, weather_by_id: dict[str, Weather]) -> int: ...
+
     async def exists_sighting(self, id: str) -> bool: ...
 
     async def has_squirrel_sighting_since(self, date: datetime) -> bool: ...
+
+    async def get_geocode(self, zip_code: str) -> Optional[Geocode]: ...
+
+    async def save_geocode(self, geocode: Geocode) -> None: ...
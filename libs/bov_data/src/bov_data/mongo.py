@@ -6,7 +6,7 @@ import pymongo
 from bson.objectid import ObjectId
 from pymongo.asynchronous.database import AsyncDatabase
 
-from bov_data.data import BirdBuddy, Sighting, User
+from bov_data.data import BirdBuddy, Geocode, Sighting, User, Weather
 from bov_data.db import DB
 
 
@@ -34,6 +34,17 @@ class MongoClient(DB):
         if bird_buddy is None:
             return
 
+        if not bird_buddy.located:
+            # resolve the feeder location once per zip so sightings can skip geocoding entirely
+            geocode = await self.get_geocode(bird_buddy.location_zip)
+            if geocode is not None and geocode.found:
+                bird_buddy.latitude = geocode.latitude
+                bird_buddy.longitude = geocode.longitude
+                bird_buddy.coordinates_zip = geocode.zip_code
+            else:
+                # coordinates of an earlier zip would look weather up for the wrong place
+                bird_buddy.latitude = bird_buddy.longitude = bird_buddy.coordinates_zip = None
+
         await self._db.users.update_one(
             {"_id": ObjectId(id)}, {"$set": {"bird_buddy": asdict(bird_buddy)}}
         )
@@ -45,6 +56,24 @@ class MongoClient(DB):
         sighting._id = str(result.inserted_id)
         return str(result.inserted_id)
 
+    async def fetch_sightings(self, without_weather: bool = False) -> list[Sighting]:
+        query = {"weather": None} if without_weather else {}
+        docs = await self._db.sightings.find(query).to_list()
+        return [Sighting(**_id_to_str(doc)) for doc in docs]
+
+    async def update_sightings_weather(self, weather_by_id: dict[str, Weather]) -> int:
+        if not weather_by_id:
+            return 0
+
+        result = await self._db.sightings.bulk_write(
+            [
+                pymongo.UpdateOne({"_id": ObjectId(id)}, {"$set": {"weather": asdict(weather)}})
+                for id, weather in weather_by_id.items()
+            ],
+            ordered=False,
+        )
+        return result.modified_count
+
     async def exists_sighting(self, bb_id: str) -> bool:
         doc = await self._db.sightings.find_one({"bb_id": bb_id})
         return doc is not None
@@ -57,3 +86,12 @@ class MongoClient(DB):
             }
         )
         return doc is not None
+
+    async def get_geocode(self, zip_code: str) -> Optional[Geocode]:
+        doc = await self._db.geocodes.find_one({"zip_code": zip_code}, {"_id": 0})
+        return Geocode(**doc) if doc is not None else None
+
+    async def save_geocode(self, geocode: Geocode) -> None:
+        await self._db.geocodes.update_one(
+            {"zip_code": geocode.zip_code}, {"$set": asdict(geocode)}, upsert=True
+        )
@@ -0,0 +1,121 @@
+import asyncio
+import atexit
+import contextlib
+import inspect
+import threading
+from collections.abc import Callable, Coroutine
+from typing import Any, Optional, TypeVar, cast
+
+T = TypeVar("T")
+
+
+class Runtime:
+    """One event loop and a registry of long-lived clients for the life of a process.
+
+    Cloud Functions keep an instance warm between requests. Running every request through
+    ``asyncio.run`` throws away the loop along with every connection pool and TLS session
+    bound to it. The runtime instead runs a single loop on a background thread, executes
+    each request's coroutine on it, and hands out clients that are created once and reused.
+    """
+
+    def __init__(self, setup: Optional[Callable[[], None]] = None) -> None:
+        self._loop = asyncio.new_event_loop()
+        self._clients: dict[str, Any] = {}
+        self._slots: dict[str, str] = {}
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(
+            target=self._loop.run_forever, name="bov-runtime", daemon=True
+        )
+        self._thread.start()
+
+        if setup is not None:
+            self.run(_call_on_loop(setup))
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        return self._loop
+
+    def run(self, coro: Coroutine[Any, Any, T], timeout: Optional[float] = None) -> T:
+        """Run a coroutine on the runtime loop and block the calling thread for its result."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        return future.result(timeout)
+
+    def client(self, name: str, factory: Callable[[], T], slot: Optional[str] = None) -> T:
+        """Return the client registered under ``name``, creating it with ``factory`` once.
+
+        Clients named after credentials that can change share a ``slot``: asking for a new
+        name in a slot closes and forgets the client registered there under the old one.
+        """
+        stale = None
+        with self._lock:
+            if slot is not None:
+                previous = self._slots.get(slot)
+                if previous is not None and previous != name:
+                    stale = self._clients.pop(previous, None)
+                self._slots[slot] = name
+            if name not in self._clients:
+                self._clients[name] = factory()
+            client = self._clients[name]
+
+        if stale is not None:
+            asyncio.run_coroutine_threadsafe(_close_clients([stale]), self._loop)
+        return cast(T, client)
+
+    def close(self) -> None:
+        """Close every registered client and stop the loop."""
+        if self._loop.is_closed():
+            return
+
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+            self._slots.clear()
+
+        self.run(_close_clients(clients))
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+
+async def _call_on_loop(fn: Callable[[], None]) -> None:
+    fn()
+
+
+async def _close_clients(clients: list[Any]) -> None:
+    for client in clients:
+        close = getattr(client, "aclose", None) or getattr(client, "close", None)
+        if close is None:
+            continue
+        with contextlib.suppress(Exception):
+            result = close()
+            if inspect.isawaitable(result):
+                await result
+
+
+_runtime: Optional[Runtime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime(setup: Optional[Callable[[], None]] = None) -> Runtime:
+    """Return the process-wide runtime, starting it on first use.
+
+    ``setup`` runs once on the runtime loop when it is created, e.g. to install
+    loop-level instrumentation. It is ignored once the runtime exists.
+    """
+    global _runtime
+    with _runtime_lock:
+        if _runtime is None:
+            _runtime = Runtime(setup)
+        return _runtime
+
+
+def shutdown_runtime() -> None:
+    """Close the process-wide runtime. The next ``get_runtime`` call starts a fresh one."""
+    global _runtime
+    with _runtime_lock:
+        runtime, _runtime = _runtime, None
+    if runtime is not None:
+        runtime.close()
+
+
+atexit.register(shutdown_runtime)
@@ -0,0 +1,78 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bov_data import BirdBuddy, BirdFeed, MongoClient
+
+
+@pytest.fixture
+def db():
+    """A ``MongoClient`` over mocked collections, with a geocode stored for 80027 only."""
+    client = MongoClient.__new__(MongoClient)
+    client._db = MagicMock()
+    client._db.users.update_one = AsyncMock()
+
+    async def _find_geocode(query: dict, projection: dict) -> dict | None:
+        if query["zip_code"] == "80027":
+            return {"zip_code": "80027", "latitude": 39.95, "longitude": -105.16}
+        return None
+
+    client._db.geocodes.find_one = AsyncMock(side_effect=_find_geocode)
+    return client
+
+
+def _bird_buddy(location_zip: str, **coordinates) -> BirdBuddy:
+    return BirdBuddy(
+        user="user",
+        password="password",
+        location_zip=location_zip,
+        feed=BirdFeed("b", "p"),
+        **coordinates,
+    )
+
+
+def _stored(db: MongoClient) -> dict:
+    return db._db.users.update_one.call_args.args[1]["$set"]["bird_buddy"]
+
+
+def test_update_user_resolves_coordinates_for_the_zip(db):
+    asyncio.run(db.update_user("0" * 24, _bird_buddy("80027")))
+
+    stored = _stored(db)
+    assert (stored["latitude"], stored["longitude"], stored["coordinates_zip"]) == (
+        39.95,
+        -105.16,
+        "80027",
+    )
+
+
+def test_update_user_keeps_coordinates_of_the_current_zip(db):
+    bird_buddy = _bird_buddy("80027", latitude=1.0, longitude=2.0, coordinates_zip="80027")
+
+    asyncio.run(db.update_user("0" * 24, bird_buddy))
+
+    db._db.geocodes.find_one.assert_not_called()
+    assert (_stored(db)["latitude"], _stored(db)["longitude"]) == (1.0, 2.0)
+
+
+def test_update_user_re_resolves_coordinates_when_the_zip_changes(db):
+    moved = _bird_buddy("80027", latitude=1.0, longitude=2.0, coordinates_zip="10001")
+
+    asyncio.run(db.update_user("0" * 24, moved))
+
+    assert (_stored(db)["latitude"], _stored(db)["coordinates_zip"]) == (39.95, "80027")
+
+
+def test_update_user_drops_coordinates_of_an_old_zip_it_cannot_resolve(db):
+    moved = _bird_buddy("99999", latitude=1.0, longitude=2.0, coordinates_zip="80027")
+
+    asyncio.run(db.update_user("0" * 24, moved))
+
+    stored = _stored(db)
+    assert (stored["latitude"], stored["longitude"], stored["coordinates_zip"]) == (
+        None,
+        None,
+        None,
+    )
+    assert not moved.located
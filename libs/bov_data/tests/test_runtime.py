@@ -0,0 +1,97 @@
+import asyncio
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from bov_data import Runtime, get_runtime, shutdown_runtime
+
+
+@pytest.fixture
+def runtime():
+    rt = Runtime()
+    yield rt
+    rt.close()
+
+
+async def _current_loop() -> asyncio.AbstractEventLoop:
+    return asyncio.get_running_loop()
+
+
+def test_run_reuses_one_loop(runtime):
+    """Every coroutine runs on the same long-lived loop."""
+    first = runtime.run(_current_loop())
+    second = runtime.run(_current_loop())
+
+    assert first is second
+    assert first is runtime.loop
+
+
+def test_run_propagates_exceptions(runtime):
+    """Exceptions raised by the coroutine surface in the calling thread."""
+
+    async def _fail() -> None:
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError, match="boom"):
+        runtime.run(_fail())
+
+
+def test_client_created_once(runtime):
+    """A client factory is only called the first time its name is requested."""
+    factory = MagicMock(return_value=object())
+
+    first = runtime.client("http", factory)
+    second = runtime.client("http", factory)
+
+    assert first is second
+    factory.assert_called_once()
+
+
+def test_client_replaced_in_its_slot_is_closed(runtime):
+    """A new name in a slot closes the client registered there under the old name."""
+    old = MagicMock(spec=["aclose"], aclose=AsyncMock())
+    runtime.client("bb:user:old", lambda: old, slot="bb:user")
+    new = runtime.client("bb:user:new", object, slot="bb:user")
+
+    runtime.run(asyncio.sleep(0))
+
+    old.aclose.assert_awaited_once()
+    assert runtime.client("bb:user:new", object, slot="bb:user") is new
+    assert runtime.client("bb:user:old", lambda: "fresh", slot="bb:user") == "fresh"
+
+
+def test_setup_runs_on_loop():
+    """The setup hook runs once, inside the runtime loop."""
+    loops = []
+    rt = Runtime(setup=lambda: loops.append(asyncio.get_running_loop()))
+    try:
+        assert loops == [rt.loop]
+    finally:
+        rt.close()
+
+
+def test_close_closes_clients():
+    """Closing the runtime awaits async closers and calls sync ones."""
+    rt = Runtime()
+    async_client = MagicMock(spec=["aclose"], aclose=AsyncMock())
+    sync_client = MagicMock(spec=["close"])
+    rt.client("async", lambda: async_client)
+    rt.client("sync", lambda: sync_client)
+
+    rt.close()
+
+    async_client.aclose.assert_awaited_once()
+    sync_client.close.assert_called_once()
+    assert rt.loop.is_closed()
+
+
+def test_shutdown_runtime_starts_fresh():
+    """After shutdown the next get_runtime call returns a new runtime."""
+    first = get_runtime()
+    shutdown_runtime()
+    second = get_runtime()
+    try:
+        assert first is not second
+        assert first.loop.is_closed()
+    finally:
+        shutdown_runtime()
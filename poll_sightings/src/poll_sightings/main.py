@@ -1,4 +1,6 @@
 import asyncio
+import functools
+import hashlib
 import os
 import traceback
 from datetime import datetime, timedelta, timezone
@@ -13,7 +15,7 @@ import google.api_core.exceptions
 import sentry_sdk
 from birdbuddy.client import BirdBuddy as BirdBuddyClient
 from birdbuddy.client import FeedNodeType, PostcardSighting
-from bov_data import DB, Media, MongoClient, Sighting, User
+from bov_data import DB, Media, MongoClient, Runtime, Sighting, User, get_runtime
 from dotenv import load_dotenv
 from flask import Request
 from google.cloud import tasks_v2
@@ -46,13 +48,11 @@ if os.getenv("APP_ENV") == "prod":
 
 def _species_from_postcard(bb_sighting: PostcardSighting) -> list[str]:
     return list(
-        set(
-            [
-                report_sighting.species.name
-                for report_sighting in bb_sighting.report.sightings
-                if report_sighting.is_recognized
-            ]
-        )
+        {
+            report_sighting.species.name
+            for report_sighting in bb_sighting.report.sightings
+            if report_sighting.is_recognized
+        }
     )
 
 
@@ -70,13 +70,15 @@ async def _poll_feed(bb: BirdBuddyClient, since: datetime) -> list[dict]:
         if isinstance(bb_sighting, Exception):
             print(f"skipping postcard {bb_card.node_id}: {bb_sighting}")
             continue
-        results.append({
-            "bb_id": f"postcard-{bb_card.data['id']}",
-            "created_at": bb_card.created_at,
-            "species": _species_from_postcard(bb_sighting),
-            "image_urls": [media.content_url for media in bb_sighting.medias],
-            "video_urls": [video.content_url for video in bb_sighting.video_media],
-        })
+        results.append(
+            {
+                "bb_id": f"postcard-{bb_card.data['id']}",
+                "created_at": bb_card.created_at,
+                "species": _species_from_postcard(bb_sighting),
+                "image_urls": [media.content_url for media in bb_sighting.medias],
+                "video_urls": [video.content_url for video in bb_sighting.video_media],
+            }
+        )
     return results
 
 
@@ -133,15 +135,15 @@ async def _fetch_bb_items(bb: BirdBuddyClient, since: datetime) -> list[dict]:
     raise RuntimeError("MAX_RETRIES reached polling Bird Buddy")
 
 
-async def _dispatch_import_sighting(sighting: Sighting) -> None:
+async def _dispatch_import_sighting(
+    client: tasks_v2.CloudTasksAsyncClient, sighting: Sighting
+) -> None:
     PROJECT_ID = "birds-of-vinca"
     LOCATION_ID = "us-west3"
     QUEUE_ID = "sightings"
     SERVICE_ACCOUNT = "cloud-task-invoker@birds-of-vinca.iam.gserviceaccount.com"
     TARGET_URL = "https://us-west3-birds-of-vinca.cloudfunctions.net/import-sighting"
 
-    client = tasks_v2.CloudTasksAsyncClient()
-
     http_request = HttpRequest(
         http_method="POST",
         url=TARGET_URL,
@@ -163,16 +165,34 @@ async def _dispatch_import_sighting(sighting: Sighting) -> None:
         pass
 
 
-async def main() -> None:
-    enable_asyncio_integration()
+def _password_key(password: str) -> str:
+    """Tells passwords apart in a client name without putting the password in it."""
+    return hashlib.sha256(password.encode()).hexdigest()[:16]
 
-    db: DB = MongoClient(os.environ["MONGODB_URI"])
+
+def _runtime() -> Runtime:
+    return get_runtime(setup=enable_asyncio_integration)
+
+
+async def main() -> None:
+    runtime = _runtime()
+    db: DB = runtime.client("mongo", lambda: MongoClient(os.environ["MONGODB_URI"]))
+    tasks: tasks_v2.CloudTasksAsyncClient = runtime.client(
+        "cloud_tasks", tasks_v2.CloudTasksAsyncClient
+    )
     users = await db.fetch_users()
 
     for user in users:
         assert user._id is not None
         assert user.bird_buddy is not None
-        bb = BirdBuddyClient(user.bird_buddy.user, user.bird_buddy.password)
+        bird_buddy = user.bird_buddy
+        # keep one Bird Buddy session per account so warm instances skip the login round trip;
+        # changed credentials get a session of their own, replacing the user's old one
+        bb: BirdBuddyClient = runtime.client(
+            f"bird_buddy:{bird_buddy.user}:{_password_key(bird_buddy.password)}",
+            functools.partial(BirdBuddyClient, bird_buddy.user, bird_buddy.password),
+            slot=f"bird_buddy:{user._id}",
+        )
         since = _last_updated_at(user)
         bb_items = await _fetch_bb_items(bb, since)
 
@@ -186,9 +206,11 @@ async def main() -> None:
                     species=bb_item["species"],
                     media=Media(images=bb_item["image_urls"], videos=bb_item["video_urls"]),
                     created_at=bb_item["created_at"],
+                    latitude=user.bird_buddy.latitude if user.bird_buddy.located else None,
+                    longitude=user.bird_buddy.longitude if user.bird_buddy.located else None,
                 )
 
-                await _dispatch_import_sighting(sighting)
+                await _dispatch_import_sighting(tasks, sighting)
 
                 assert sighting.created_at is not None
                 since = sighting.created_at
@@ -199,10 +221,10 @@ async def main() -> None:
 
 @functions_framework.http
 def poll_sightings(request: Request) -> str:
-    asyncio.run(main())
+    _runtime().run(main())
     return "OK"
 
 
 if __name__ == "__main__":
     load_dotenv()
-    asyncio.run(main())
+    _runtime().run(main())
@@ -40,6 +40,9 @@ def main() -> None:
     db.sightings.create_index([("created_at", DESCENDING)])
     print("created index on sightings.created_at")
 
+    db.geocodes.create_index([("zip_code", ASCENDING)], unique=True)
+    print("created index on geocodes.zip_code")
+
     mongo.close()
 
 
@@ -1,9 +1,10 @@
 from datetime import UTC, datetime, timedelta
-from unittest.mock import AsyncMock, MagicMock
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 from bov_data import BirdBuddy, BirdFeed, User
 
+from poll_sightings import main as poll_main
 from poll_sightings.main import _fetch_bb_items, _poll_collections, _poll_feed
 
 # test update last database fetch timestamp
@@ -377,3 +378,71 @@ async def test_fetch_bb_items_sorted_by_created_at(
     assert result[0]["created_at"] == oldest
     assert result[1]["created_at"] == middle
     assert result[2]["created_at"] == newest
+
+
+# --- main tests ---
+
+
+@pytest.mark.parametrize(
+    "coordinates_zip, expected",
+    [("80027", (39.95, -105.16)), ("10001", (None, None))],
+)
+@pytest.mark.asyncio
+async def test_main_copies_coordinates_of_the_current_zip(mock_user, coordinates_zip, expected):
+    """Sightings only get the feeder's coordinates while they belong to its zip."""
+    bird_buddy = mock_user.bird_buddy
+    bird_buddy.latitude, bird_buddy.longitude = 39.95, -105.16
+    bird_buddy.coordinates_zip = coordinates_zip
+    db = MagicMock()
+    db.fetch_users = AsyncMock(return_value=[mock_user])
+    db.update_user = AsyncMock()
+    runtime = MagicMock()
+    runtime.client.side_effect = lambda name, factory, slot=None: (
+        db if name == "mongo" else MagicMock()
+    )
+    item = {
+        "bb_id": "postcard_1",
+        "species": ["Blue Jay"],
+        "image_urls": [],
+        "video_urls": [],
+        "created_at": datetime.now(UTC),
+    }
+
+    with (
+        patch.object(poll_main, "_runtime", return_value=runtime),
+        patch.object(poll_main, "_fetch_bb_items", AsyncMock(return_value=[item])),
+        patch.object(poll_main, "_dispatch_import_sighting", AsyncMock()) as dispatch,
+    ):
+        await poll_main.main()
+
+    sighting = dispatch.call_args.args[1]
+    assert (sighting.latitude, sighting.longitude) == expected
+    db.update_user.assert_awaited_once_with("user_123", bird_buddy=bird_buddy)
+
+
+@pytest.mark.asyncio
+async def test_main_logs_in_again_after_a_password_change(mock_user):
+    """Bird Buddy sessions are kept per account and password, in one slot per user so a
+    changed password replaces the old session."""
+    db = MagicMock()
+    db.fetch_users = AsyncMock(return_value=[mock_user])
+    db.update_user = AsyncMock()
+    runtime = MagicMock()
+    runtime.client.side_effect = lambda name, factory, slot=None: (
+        db if name == "mongo" else MagicMock()
+    )
+
+    names = []
+    with (
+        patch.object(poll_main, "_runtime", return_value=runtime),
+        patch.object(poll_main, "_fetch_bb_items", AsyncMock(return_value=[])),
+    ):
+        for password in ("old", "new", "new"):
+            mock_user.bird_buddy.password = password
+            await poll_main.main()
+            names.append(runtime.client.call_args_list[-1].args[0])
+
+    assert names[0] != names[1] == names[2]
+    assert all(name.startswith("bird_buddy:test_user:") and "new" not in name for name in names)
+    slots = {call.kwargs.get("slot") for call in runtime.client.call_args_list}
+    assert slots == {None, "bird_buddy:user_123"}